@@ -7,7 +7,10 @@ def create_app():
     Returns:
         Flask application instance
     """
+    from .utils.upload_buffer import SpooledUploadRequest
+
     app = Flask(__name__)
+    app.request_class = SpooledUploadRequest
     CORS(app)
     
     # Import และลงทะเบียน blueprints
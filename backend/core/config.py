@@ -1,6 +1,6 @@
 # app/core/config.py
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class AppConfig(BaseSettings):
     """
@@ -8,10 +8,40 @@ class AppConfig(BaseSettings):
     การใช้ pydantic_settings ช่วยให้เราสามารถตรวจสอบและจัดการค่าต่างๆ ได้อย่างมีประสิทธิภาพ
     """
     
+    # Vector Store Configuration
+    VECTOR_STORE_BACKEND: str = "milvus"  # milvus หรือ local (ค้นหาใน process โดยไม่ต้องมี Milvus server)
+    LOCAL_VECTOR_STORE_DIR: str = ".cache/vectors"  # ที่เก็บข้อมูลของ local vector store
+    
     # Milvus Configuration
     MILVUS_HOST: str = "localhost"
     MILVUS_PORT: int = 19530
     DEFAULT_VECTOR_DIM: int = 384
+    MILVUS_CONNECTION_POOL_SIZE: int = 4  # จำนวน connection aliases ที่กระจายคำขอพร้อมกัน
+    MILVUS_INSERT_MAX_ROWS: int = 5000  # จำนวนแถวสูงสุดต่อการ insert หนึ่งครั้ง
+    MILVUS_INSERT_MAX_BYTES: int = 16 * 1024 * 1024  # ขนาดข้อมูลสูงสุดต่อการ insert หนึ่งครั้ง
+    MILVUS_INSERT_CONCURRENCY: int = 4  # จำนวนการ insert ที่ส่งพร้อมกันสูงสุด
+    MILVUS_EXECUTOR_WORKERS: int = 16  # จำนวน threads ที่เรียก Milvus (search, query, delete ฯลฯ) พร้อมกันสูงสุด
+    MILVUS_TIMEOUT_SECONDS: float = 30.0  # timeout ของการเรียก Milvus แต่ละครั้ง (0 = ไม่จำกัด)
+    MILVUS_MEMORY_BUDGET_BYTES: int = 0  # หน่วยความจำสูงสุดของ collections ที่ load พร้อมกัน (0 = ไม่จำกัด ไม่ release อัตโนมัติ)
+    MILVUS_MEMORY_OVERHEAD: float = 1.5  # ตัวคูณขนาด vectors (แถว x มิติ x 4 bytes) เผื่อ index และ scalar fields
+    MILVUS_PRELOAD_COLLECTIONS: List[str] = []  # collections ที่ load ไว้ตั้งแต่เริ่ม service
+    MILVUS_PARTITION_LAYOUT: str = "none"  # none, partition (หนึ่ง partition ต่อเอกสาร) หรือ partition_key
+    MILVUS_PARTITION_GROUP_SEPARATOR: Optional[str] = None  # เช่น "/" ให้ "exam1/student42" อยู่ใน partition ของ exam1
+    MILVUS_PARTITION_KEY_PARTITIONS: int = 64  # จำนวน partitions ของ collection แบบ partition_key
+    MILVUS_INDEX_PROFILE: str = "auto"  # auto, flat, ivf หรือ hnsw
+    MILVUS_INDEX_PROFILES: Dict[str, str] = {}  # profile ของแต่ละ collection เช่น {"student_documents": "hnsw"}
+    MILVUS_FLAT_MAX_ROWS: int = 20000  # profile auto ใช้ FLAT เมื่อจำนวนแถวไม่เกินค่านี้
+    MILVUS_IVF_MIN_NLIST: int = 16  # nlist ต่ำสุดของ IVF (nlist = 4 * sqrt(จำนวนแถว))
+    MILVUS_HNSW_M: int = 16  # จำนวนเพื่อนบ้านต่อ node ของ HNSW
+    MILVUS_HNSW_EF_CONSTRUCTION: int = 200  # ขนาด candidate list ตอนสร้าง HNSW
+    MILVUS_SEARCH_NPROBE: int = 16  # จำนวน clusters ที่ค้นหาใน IVF
+    MILVUS_SEARCH_EF: int = 64  # ขนาด candidate list ตอนค้นหาใน HNSW (ไม่น้อยกว่า limit)
+    MILVUS_SCALAR_INDEX_TYPE: Optional[str] = None  # index ของ file_id (None = INVERTED บน Milvus 2.4+ หรือ Trie บน 2.3)
+    MILVUS_METADATA_INDEX_PATHS: Dict[str, str] = {"page": "double", "section": "varchar", "question_number": "double"}  # path ใน metadata และชนิดข้อมูล (Milvus 2.5+)
+    MILVUS_SEARCH_PARAMS: Dict[str, Dict[str, Any]] = {}  # search params ของแต่ละ collection เช่น {"teacher_documents": {"nprobe": 32}}
+    MILVUS_VECTOR_STORAGE: str = "float"  # float, float16 (Milvus 2.4+) หรือ binary ของ collections ที่สร้างใหม่
+    MILVUS_RERANK_FACTOR: int = 4  # collection ที่บีบอัดค้นหารอบแรก limit x ค่านี้ แล้ว re-score ด้วย vectors float32 (0 = ไม่ re-score)
+    FULL_VECTOR_STORE_PATH: str = ".cache/full_vectors.sqlite3"  # vectors float32 ของ collections ที่บีบอัด
     
     # Flask Configuration
     FLASK_APP: str = "app"
@@ -32,6 +62,61 @@ class AppConfig(BaseSettings):
     PROMETHEUS_PORT: int = 8000
     SERVICE_NAME: str = "milvus-service"
     
+    # Model Loading Configuration
+    MODEL_WARMUP_ON_STARTUP: bool = True  # โหลดโมเดลและรัน inference ทดสอบใน background เมื่อเริ่ม server
+    LLM_MODEL_PATH: str = "models/llama-3.2-typhoon2-3b-instruct-q4_k_m.gguf"  # โมเดล GGUF ที่ใช้ประเมินคำตอบ
+    LLM_WARMUP_ENABLED: bool = True  # warmup โมเดล GGUF ด้วย (ข้ามถ้าไม่มีไฟล์โมเดล เช่น pods ที่ให้บริการเฉพาะการค้นหา)
+    
+    # Embedding Backend Configuration
+    EMBEDDING_BACKEND: str = "torch"  # torch, onnx หรือ onnx-int8 (ONNX Runtime บน CPU)
+    EMBEDDING_ONNX_DIR: str = ".cache/onnx"  # ที่เก็บโมเดลที่ export เป็น ONNX แล้ว
+    EMBEDDING_ONNX_THREADS: int = 0  # จำนวน threads ของ ONNX Runtime (0 = ค่าเริ่มต้นของ runtime)
+    
+    # PDF Processing Configuration
+    PDF_EMBEDDING_BATCH_SIZE: int = 64  # จำนวน chunks ต่อ batch ในโหมด streaming
+    PDF_PARALLEL_PAGE_THRESHOLD: int = 50  # จำนวนหน้าขั้นต่ำที่จะอ่าน PDF แบบหลาย process
+    PDF_PARALLEL_WORKERS: int = 0  # จำนวน worker processes (0 = ตามจำนวน CPU cores)
+    CHUNK_MAX_TOKENS: int = 256  # จำนวน tokens สูงสุดต่อ chunk (ไม่เกิน max_seq_length ของโมเดล)
+    CHUNK_OVERLAP_TOKENS: int = 32  # จำนวน tokens ที่ chunks ติดกันซ้อนทับกัน
+    INGESTION_QUEUE_SIZE: int = 4  # จำนวน batch สูงสุดที่ค้างระหว่างขั้นตอนของ ingestion pipeline
+    
+    # Ingestion Jobs Configuration
+    INGESTION_JOBS_DIR: str = ".cache/jobs"  # คิวถาวรและไฟล์ที่รอประมวลผล
+    INGESTION_JOB_WORKERS: int = 2
+    INGESTION_JOB_LEASE_SECONDS: float = 300.0  # เวลาที่งาน running ไม่มีการอัพเดทก่อนถูกรันใหม่
+    
+    # Bulk Ingestion Configuration
+    BULK_INGEST_WORKERS: int = 4  # จำนวนไฟล์ที่ประมวลผลพร้อมกันใน /bulk
+    BULK_MAX_FILES: int = 500  # จำนวนไฟล์สูงสุดต่อคำขอ
+    BULK_MAX_FILE_BYTES: int = 100 * 1024 * 1024  # ขนาดสูงสุดของแต่ละไฟล์ใน zip หลังแตกไฟล์
+    BULK_SPOOL_MEMORY_BYTES: int = 2 * 1024 * 1024  # ไฟล์ที่รอคิวและใหญ่กว่านี้จะถูกพักไว้บนดิสก์
+    
+    # Upload Configuration
+    UPLOAD_MEMORY_THRESHOLD_BYTES: int = 16 * 1024 * 1024  # ไฟล์ที่ใหญ่กว่านี้จะถูกพักไว้ในไฟล์ชั่วคราว
+    UPLOAD_REQUEST_MEMORY_BYTES: int = 64 * 1024 * 1024  # ขนาดรวมของไฟล์ในหน่วยความจำต่อคำขอ (เช่น /bulk ที่มีหลายไฟล์)
+    
+    # Ingestion Cache Configuration
+    INGESTION_CACHE_ENABLED: bool = True
+    INGESTION_CACHE_DIR: str = ".cache/ingestion"
+    INGESTION_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # 1 GB
+    
+    # Embedding Cache Configuration
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: Optional[str] = ".cache/embeddings"  # None = ใช้เฉพาะหน่วยความจำ
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000
+    EMBEDDING_CACHE_DISK_CAPACITY: int = 200000  # จำนวนแถวของเมทริกซ์บนดิสก์
+    
+    # Keyword Search Configuration
+    KEYWORD_INDEX_ENABLED: bool = True  # สร้าง BM25 index คู่กับ vectors ระหว่างนำเข้าเอกสาร
+    KEYWORD_INDEX_PATH: str = ".cache/keyword_index.sqlite3"
+    HYBRID_SEARCH_ENABLED: bool = True  # ค้นหาเนื้อหาอ้างอิงด้วย vector + BM25 แล้วรวมอันดับด้วย RRF
+    HYBRID_CANDIDATES: int = 20  # จำนวนผลลัพธ์จากแต่ละวิธีก่อนรวมอันดับ
+    HYBRID_RRF_K: int = 60  # ค่าคงที่ k ของ reciprocal rank fusion
+    
+    # Embedding Worker Configuration
+    EMBEDDING_BATCH_MAX_SIZE: int = 64  # จำนวนข้อความสูงสุดต่อ batch ของโมเดล
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0  # เวลารอรวมคำขอที่เข้ามาพร้อมกัน
+    
     class Config:
         """
         การตั้งค่าพิเศษสำหรับ pydantic BaseSettings
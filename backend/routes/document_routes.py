@@ -1,33 +1,76 @@
 # routes/document_routes.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, url_for
+import json
+import os
 import traceback
 from services.milvus_service import MilvusService
 from services.pdf_service import PDFProcessingService
-import tempfile
-import os
+from services.ingestion_pipeline import IngestionPipeline
+from services.keyword_index import KeywordIndex
+from services.ingestion_jobs import IngestionJobManager
+from services.bulk_ingestion import BulkIngestionError, BulkIngestionService
+from services.model_registry import model_registry
+from utils.ingestion_cache import IngestionCache
+from utils.upload_buffer import buffer_upload
+from core.config import config
 
 # สร้าง Blueprint สำหรับจัดการเอกสาร
 document_bp = Blueprint('document', __name__)
 
-# สร้างตัวแปรสำหรับเก็บ service instances
+# สร้างตัวแปรสำหรับเก็บ service instances (ถูกสร้างใน init_routes ไม่ใช่ตอน import
+# เพื่อให้การ import ไม่สร้างโฟลเดอร์ cache หรือเปิดฐานข้อมูล SQLite)
 milvus_service = None
-pdf_service = PDFProcessingService()
+pdf_service = None
+ingestion_cache = None
+keyword_index = None
+job_manager = None
+bulk_service = None
 
 def init_routes(ms: MilvusService):
     """
     ฟังก์ชันสำหรับเริ่มต้นค่า routes โดยรับ dependencies ที่จำเป็น
+    และเริ่ม background workers สำหรับงานนำเข้าเอกสารแบบ asynchronous
     
     Args:
         ms: Instance ของ MilvusService ที่จะใช้ในการจัดการ vectors
     """
-    global milvus_service
+    global milvus_service, pdf_service, ingestion_cache, keyword_index, job_manager, bulk_service
     milvus_service = ms
+    if pdf_service is None:
+        pdf_service = PDFProcessingService()  # โมเดลจะถูกโหลดเมื่อใช้งานครั้งแรกหรือระหว่าง warmup
+        model_registry.register_warmup(pdf_service.model_name, pdf_service.warmup)
+        ingestion_cache = (
+            IngestionCache(
+                config.INGESTION_CACHE_DIR,
+                config.INGESTION_CACHE_MAX_BYTES,
+                namespace=pdf_service.processing_signature
+            )
+            if config.INGESTION_CACHE_ENABLED else None
+        )
+        keyword_index = KeywordIndex(config.KEYWORD_INDEX_PATH) if config.KEYWORD_INDEX_ENABLED else None
+    job_manager = IngestionJobManager(
+        IngestionPipeline(pdf_service, milvus_service, keyword_index=keyword_index),
+        jobs_dir=config.INGESTION_JOBS_DIR,
+        workers=config.INGESTION_JOB_WORKERS,
+        ingestion_cache=ingestion_cache,
+        lease_seconds=config.INGESTION_JOB_LEASE_SECONDS
+    )
+    job_manager.start()
+    bulk_service = BulkIngestionService(
+        IngestionPipeline(pdf_service, milvus_service, keyword_index=keyword_index),
+        workers=config.BULK_INGEST_WORKERS,
+        ingestion_cache=ingestion_cache,
+        max_files=config.BULK_MAX_FILES,
+        max_file_bytes=config.BULK_MAX_FILE_BYTES,
+        spool_memory_bytes=config.BULK_SPOOL_MEMORY_BYTES
+    )
 
 @document_bp.route('/process', methods=['POST'])
 async def process_document():
     """
-    Endpoint สำหรับประมวลผลเอกสาร PDF
+    Endpoint สำหรับประมวลผลเอกสาร PDF และเพิ่ม vectors ลง teacher_documents หรือ student_documents
     มีการตรวจสอบความถูกต้องของข้อมูลอย่างละเอียด
+    ส่ง incremental=true เพื่อนำเข้าเอกสารเวอร์ชันใหม่ของ document_id เดิม โดยประมวลผลเฉพาะ chunks ที่เปลี่ยน
     """
     # 1. ตรวจสอบว่ามีไฟล์ถูกส่งมาหรือไม่
     if 'file' not in request.files:
@@ -73,40 +116,84 @@ async def process_document():
             "details": "file_type ต้องเป็น 'teacher' หรือ 'student'"
         }), 400
 
+    incremental = request.form.get('incremental', '').lower() in ('1', 'true', 'yes')
+
     try:
-        # บันทึกไฟล์ชั่วคราวพร้อมบันทึก log
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            print(f"กำลังบันทึกไฟล์ชั่วคราวที่: {temp_file.name}")
-            file.save(temp_file.name)
-            
-            # ตรวจสอบขนาดไฟล์
-            file_size = os.path.getsize(temp_file.name)
-            print(f"ขนาดไฟล์ที่บันทึก: {file_size} bytes")
-            
-            if file_size == 0:
-                os.unlink(temp_file.name)  # ลบไฟล์ที่ว่างเปล่า
+        # อ่านไฟล์ในหน่วยความจำ (ไฟล์ใหญ่กว่า UPLOAD_MEMORY_THRESHOLD_BYTES จะถูกพักในไฟล์ชั่วคราวที่ถูกลบเสมอ)
+        with buffer_upload(file) as upload:
+            print(f"ขนาดไฟล์ที่อัพโหลด: {upload.size} bytes")
+
+            if upload.size == 0:
                 return jsonify({
                     "status": "error",
                     "message": "ไฟล์ว่างเปล่า",
                     "details": "ไฟล์ที่อัพโหลดมีขนาดเป็น 0"
                 }), 400
 
-            # ประมวลผลไฟล์
-            result = await pdf_service.process_pdf_file(temp_file.name)
-            
-            # ลบไฟล์ชั่วคราว
-            os.unlink(temp_file.name)
-            
-            return jsonify({
-                "status": "success",
-                "message": "ประมวลผลไฟล์เสร็จสิ้น",
-                "data": {
-                    "document_id": document_id,
-                    "file_type": file_type,
-                    "file_name": file.filename,
-                    "chunk_count": len(result['chunks'])
+            # โหมด asynchronous: เพิ่มงานเข้าคิวแล้วคืน job id ทันที
+            if request.form.get('async', '').lower() in ('1', 'true', 'yes'):
+                job_id = job_manager.submit(
+                    upload.source,
+                    document_id,
+                    file_type,
+                    file_name=file.filename,
+                    content_hash=upload.content_hash,
+                    incremental=incremental
+                )
+                return jsonify({
+                    "status": "accepted",
+                    "message": "เพิ่มงานประมวลผลเข้าคิวแล้ว",
+                    "data": {
+                        "job_id": job_id,
+                        "document_id": document_id,
+                        "file_type": file_type,
+                        "file_name": file.filename,
+                        "status_url": url_for('document.get_job', job_id=job_id)
+                    }
+                }), 202
+
+            pipeline = IngestionPipeline(pdf_service, milvus_service, keyword_index=keyword_index)
+            if incremental:
+                # เทียบกับเวอร์ชันที่เก็บไว้ แล้วเพิ่ม/ลบเฉพาะ chunks ที่เปลี่ยน
+                result = await pipeline.reingest(upload.source, document_id, file_type)
+                result["cache_hit"] = False
+            else:
+                # ประมวลผลไฟล์และเพิ่ม vectors ลง Milvus (ใช้ผลจาก cache ถ้าเคยประมวลผลไฟล์เดียวกันแล้ว)
+                result = await pipeline.ingest(
+                    upload.source,
+                    document_id,
+                    file_type,
+                    ingestion_cache=ingestion_cache,
+                    content_hash=upload.content_hash
+                )
+
+        versioning = {
+            key: result[key]
+            for key in ("version", "unchanged_count", "relocated_count", "embedded_count", "deleted_count")
+            if key in result
+        }
+
+        return jsonify({
+            "status": "success",
+            "message": "ประมวลผลไฟล์เสร็จสิ้น",
+            "data": {
+                "document_id": document_id,
+                "file_type": file_type,
+                "file_name": file.filename,
+                "collection": result["collection"],
+                "page_count": result["page_count"],
+                "chunk_count": result["chunk_count"],
+                "vector_count": result["vector_count"],
+                "content_hash": upload.content_hash,
+                "cache_hit": result["cache_hit"],
+                **versioning,
+                "timings": {
+                    "upload_read": round(upload.read_seconds, 4),
+                    "upload_disk_io": round(upload.disk_seconds, 4),
+                    **result["timings"]
                 }
-            })
+            }
+        })
 
     except Exception as e:
         print(f"เกิดข้อผิดพลาด: {str(e)}")
@@ -114,4 +201,95 @@ async def process_document():
             "status": "error",
             "message": f"เกิดข้อผิดพลาดในการประมวลผลไฟล์: {str(e)}",
             "details": traceback.format_exc()
-        }), 500
\ No newline at end of file
+        }), 500
+
+@document_bp.route('/bulk', methods=['POST'])
+def bulk_process_documents():
+    """
+    Endpoint สำหรับนำเข้าเอกสาร PDF หลายไฟล์ในคำขอเดียว รองรับสองรูปแบบ
+    1. multipart: ไฟล์หลายไฟล์ใน field "files" และ field "manifest" เป็น JSON list ของ
+       {"file": ชื่อไฟล์, "document_id": ..., "file_type": "teacher" | "student", "incremental": bool}
+       ถ้าไม่ส่ง manifest จะใช้ชื่อไฟล์ (ไม่รวมนามสกุล) เป็น document_id และ field "file_type" กับทุกไฟล์
+       ชื่อไฟล์ในคำขอต้องไม่ซ้ำกัน (ตอบ 400 ถ้าซ้ำ)
+    2. zip: ไฟล์ zip ใน field "archive" ที่มี manifest.json รูปแบบเดียวกันและไฟล์ PDF ตามที่ระบุ
+
+    ผลลัพธ์เป็น NDJSON (หนึ่ง JSON ต่อบรรทัด) ของแต่ละไฟล์ตามลำดับที่ประมวลผลเสร็จ
+    และบรรทัดสุดท้ายเป็นสรุปผลของทั้งคำขอ
+    """
+    # ไฟล์ในคำขอถูกปิดเมื่อ view คืนค่า จึงต้องคัดลอกไปพักไว้ก่อนเริ่ม streaming
+    spools = []
+
+    def close_spools():
+        for spool in spools:
+            spool.close()
+
+    try:
+        if 'archive' in request.files:
+            archive = request.files['archive']
+            if not archive.filename.lower().endswith('.zip'):
+                raise BulkIngestionError("archive ต้องเป็นไฟล์ .zip")
+            spools.append(bulk_service.spool(archive.stream))
+            entries = bulk_service.entries_from_zip(spools[0])
+        else:
+            files = bulk_service.by_file_name(
+                (f for f in request.files.getlist('files') if f.filename), lambda f: f.filename
+            )
+            if not files:
+                raise BulkIngestionError("ไม่พบไฟล์ใน field 'files' หรือ 'archive'")
+
+            if request.form.get('manifest'):
+                try:
+                    manifest = json.loads(request.form['manifest'])
+                except ValueError:
+                    raise BulkIngestionError("manifest ไม่ใช่ JSON ที่ถูกต้อง")
+            else:
+                manifest = [
+                    {
+                        "file": name,
+                        "document_id": os.path.splitext(name)[0],
+                        "file_type": request.form.get('file_type')
+                    }
+                    for name in files
+                ]
+
+            entries = bulk_service.entries_from_uploads(manifest, files, spools)
+    except BulkIngestionError as e:
+        close_spools()
+        return jsonify({
+            "status": "error",
+            "message": "คำขอแบบ bulk ไม่ถูกต้อง",
+            "details": str(e)
+        }), 400
+    except Exception:
+        close_spools()
+        raise
+
+    def generate():
+        try:
+            for result in bulk_service.iter_results(entries):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            close_spools()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@document_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Endpoint สำหรับตรวจสอบสถานะ ความคืบหน้า และผลลัพธ์ของงานนำเข้าเอกสาร
+    
+    Args:
+        job_id: ID ของงานที่ได้จาก /process ในโหมด async
+    """
+    job = job_manager.get(job_id) if job_manager else None
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "ไม่พบงานที่ระบุ",
+            "details": f"job_id: {job_id}"
+        }), 404
+
+    return jsonify({
+        "status": "success",
+        "data": job
+    })
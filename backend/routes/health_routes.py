@@ -3,6 +3,8 @@ from flask import Blueprint, jsonify
 from datetime import datetime
 import redis
 from services.milvus_service import MilvusService
+from services.model_registry import model_registry
+from core.config import config
 from pymilvus import connections
 
 # Create a Blueprint for health check routes
@@ -43,8 +45,9 @@ def readiness_check():
     """
     Comprehensive readiness check that verifies all service dependencies.
     
-    This endpoint checks the connection status of both Milvus and Redis
-    to ensure the service is fully operational.
+    This endpoint checks the connection status of both Milvus and Redis,
+    and that the models have finished warming up, to ensure the service
+    is fully operational.
     
     Returns:
         JSON response with detailed status of each component
@@ -58,8 +61,9 @@ def readiness_check():
     try:
         # Check Milvus connection
         if milvus_service:
-            connections.get_connection_addr('default')
-            status["checks"]["milvus"] = {"status": "healthy"}
+            if milvus_service.backend == "milvus":
+                connections.get_connection_addr('default')
+            status["checks"]["milvus"] = {"status": "healthy", "backend": milvus_service.backend}
         else:
             raise Exception("Milvus service not initialized")
             
@@ -69,6 +73,14 @@ def readiness_check():
             status["checks"]["redis"] = {"status": "healthy"}
         else:
             raise Exception("Redis client not initialized")
+
+        # Check that models are loaded and warmed up
+        if config.MODEL_WARMUP_ON_STARTUP:
+            models = model_registry.warmup_status()
+            if not model_registry.is_ready():
+                status["checks"]["models"] = {"status": "warming_up", "models": models}
+                raise Exception("Models are not warmed up yet")
+            status["checks"]["models"] = {"status": "healthy", "models": models}
             
         return jsonify(status)
         
@@ -1,6 +1,6 @@
 # routes/milvus_routes.py
 from flask import Blueprint, request, jsonify
-from services.milvus_service import MilvusService
+from services.milvus_service import BulkInsertError, MilvusService
 from utils.cache import cache  # ปรับการ import ให้สอดคล้องกับโครงสร้างใหม่
 from utils.monitoring import track_operation
 
@@ -70,13 +70,15 @@ async def insert_vectors(name):
         contents = data.get('contents', [])
         vectors = data.get('vectors', [])
         metadata_list = data.get('metadata_list', [])
+        flush = bool(data.get('flush', False))
         
         ids = await milvus_service.insert_vectors(
             collection_name=name,
             file_ids=file_ids,
             contents=contents,
             vectors=vectors,
-            metadata_list=metadata_list
+            metadata_list=metadata_list or None,
+            flush=flush
         )
         
         return jsonify({
@@ -86,8 +88,156 @@ async def insert_vectors(name):
                 "ids": ids
             }
         })
+    except BulkInsertError as e:
+        # เพิ่มสำเร็จบางส่วน: คืน ids ที่เพิ่มแล้วเพื่อให้ client ส่งเฉพาะแถวที่ล้มเหลวซ้ำได้
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "data": {
+                "ids": e.inserted_ids,
+                "failed_ranges": e.failed_ranges
+            }
+        }), 500
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+@milvus_bp.route('/collections/<name>/search', methods=['POST'])
+@track_operation
+async def search_vectors(name):
+    """
+    ค้นหา vectors ที่ใกล้เคียงที่สุดใน collection ที่ระบุ
+    
+    Args:
+        name: ชื่อของ collection ที่ต้องการค้นหา
+    """
+    try:
+        data = request.json
+        groups = await milvus_service.search_vectors_batch(
+            collection_name=name,
+            query_vectors=data.get('vectors', []),
+            limit=int(data.get('limit', 10)),
+            output_fields=data.get('output_fields') or ["file_id", "content"],
+            filter_expr=data.get('filter'),
+            search_params=data.get('search_params')  # เช่น {"nprobe": 32} หรือ {"ef": 128}
+        )
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                "results": groups
+            }
+        })
     except Exception as e:
         return jsonify({
             "status": "error",
             "message": str(e)
-        }), 400
\ No newline at end of file
+        }), 400
+
+@milvus_bp.route('/collections/<name>/index', methods=['POST'])
+@track_operation
+async def rebuild_index(name):
+    """
+    สร้าง index ของ collection ใหม่ตาม profile และจำนวนแถวปัจจุบัน
+    
+    Args:
+        name: ชื่อของ collection
+    """
+    try:
+        profile = (request.get_json(silent=True) or {}).get('profile')
+        result = await milvus_service.rebuild_index(name, profile=profile)
+        
+        return jsonify({
+            "status": "success",
+            "data": result
+        })
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+@milvus_bp.route('/collections/<name>/scalar-indexes', methods=['POST'])
+@track_operation
+async def ensure_scalar_indexes(name):
+    """
+    สร้าง scalar indexes ของ file_id และ metadata ที่ยังไม่มีให้ collection ที่มีอยู่แล้ว
+    
+    Args:
+        name: ชื่อของ collection
+    """
+    try:
+        reload = bool((request.get_json(silent=True) or {}).get('reload', False))
+        status = await milvus_service.ensure_scalar_indexes(name, reload=reload)
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                "indexes": status
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+@milvus_bp.route('/residency', methods=['GET'])
+@track_operation
+async def get_residency():
+    """collections ที่ load อยู่ หน่วยความจำที่ประมาณไว้ และสถิติการ release"""
+    try:
+        return jsonify({
+            "status": "success",
+            "data": milvus_service.residency_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+@milvus_bp.route('/residency/preload', methods=['POST'])
+@track_operation
+async def preload_collections():
+    """
+    load collections ไว้ล่วงหน้า
+    ถ้าไม่ระบุ collections ใช้ MILVUS_PRELOAD_COLLECTIONS และ collections ที่ถูกใช้งานบ่อยที่สุด
+    """
+    try:
+        names = (request.get_json(silent=True) or {}).get('collections')
+        status = await milvus_service.preload_collections(names)
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                "collections": status
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+@milvus_bp.route('/residency/release', methods=['POST'])
+@track_operation
+async def release_idle_collections():
+    """release collections ที่ไม่ถูกค้นหานานกว่า idle_seconds (default: 3600)"""
+    try:
+        idle_seconds = float((request.get_json(silent=True) or {}).get('idle_seconds', 3600))
+        released = await milvus_service.release_idle_collections(idle_seconds)
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                "released": released
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
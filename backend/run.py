@@ -1,27 +1,29 @@
 # run.py
 from flask import Flask
 from flask_cors import CORS
+import os
 import redis
 from core.config import AppConfig
 from routes.document_routes import document_bp, init_routes as init_document_routes
 from routes.milvus_routes import milvus_bp, init_routes as init_milvus_routes
 from routes.health_routes import health_bp, init_health_routes
-from services.milvus_service import MilvusService
+from services.vector_store import create_vector_store
+from services.llm_service import LLMService
+from services.model_registry import model_registry
+from utils.upload_buffer import SpooledUploadRequest
 
 def create_app():
     """สร้างและกำหนดค่า Flask application"""
     # สร้าง Flask application
     app = Flask(__name__)
+    app.request_class = SpooledUploadRequest  # เก็บไฟล์อัพโหลดในหน่วยความจำแทนการเขียนลงดิสก์
     CORS(app)  # เพิ่ม CORS support
 
     # โหลด configuration
     config = AppConfig()
 
     # สร้าง instances ของ services
-    milvus_service = MilvusService(
-        host=config.MILVUS_HOST,
-        port=config.MILVUS_PORT
-    )
+    milvus_service = create_vector_store(config.VECTOR_STORE_BACKEND)
 
     # เชื่อมต่อ Redis
     redis_client = redis.Redis(
@@ -36,6 +38,18 @@ def create_app():
     init_milvus_routes(milvus_service)
     init_health_routes(milvus_service, redis_client)
 
+    # load collections ที่ถูกค้นหาบ่อยไว้ก่อนคำขอแรก
+    if config.VECTOR_STORE_BACKEND == "milvus" and config.MILVUS_PRELOAD_COLLECTIONS:
+        milvus_service.start_preload()
+
+    # โหลดโมเดลและรัน inference ทดสอบใน background จนกว่าจะเสร็จ /api/health/ready จะตอบ 503
+    if config.MODEL_WARMUP_ON_STARTUP:
+        # โมเดล GGUF ถูกใช้ร่วมกันทั้ง process ตาม model_path ทุก LLMService จึงได้โมเดลที่ warmup แล้ว
+        if config.LLM_WARMUP_ENABLED and os.path.exists(config.LLM_MODEL_PATH):
+            llm_service = LLMService(config.LLM_MODEL_PATH)
+            model_registry.register_warmup(f"llama:{config.LLM_MODEL_PATH}", llm_service.warmup)
+        model_registry.start_warmup()
+
     # ลงทะเบียน blueprints
     app.register_blueprint(document_bp, url_prefix='/api/documents')
     app.register_blueprint(milvus_bp, url_prefix='/api/milvus')
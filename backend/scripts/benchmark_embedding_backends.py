@@ -0,0 +1,93 @@
+# scripts/benchmark_embedding_backends.py
+"""
+เปรียบเทียบ embedding backends กับโมเดล torch ต้นฉบับ
+
+- parity: cosine similarity ระหว่าง vectors ของแต่ละ backend กับ torch บนข้อความชุดเดียวกัน
+- throughput: จำนวนข้อความต่อวินาทีของแต่ละ backend
+
+ตัวอย่าง:
+    python scripts/benchmark_embedding_backends.py --pdf test/test_document.pdf
+    python scripts/benchmark_embedding_backends.py --backends onnx-int8 --min-cosine 0.98
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.embedding_backends import EMBEDDING_BACKENDS, get_embedding_backend  # noqa: E402
+from services.pdf_service import PDFProcessingService, normalize_embeddings  # noqa: E402
+
+SAMPLE_CORPUS = [
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "The mitochondria is the powerhouse of the cell.",
+    "Explain the difference between mitosis and meiosis.",
+    "Newton's second law states that force equals mass times acceleration.",
+    "การสังเคราะห์ด้วยแสงเปลี่ยนพลังงานแสงเป็นพลังงานเคมี",
+    "จงอธิบายความแตกต่างระหว่างการแบ่งเซลล์แบบไมโทซิสและไมโอซิส",
+    "A binary search tree keeps its keys in sorted order.",
+    "The French Revolution began in 1789.",
+]
+
+
+def load_corpus(pdf_path: str, limit: int) -> List[str]:
+    """ใช้ chunks จากไฟล์ PDF เป็นข้อความทดสอบ หรือใช้ชุดข้อความตัวอย่างเมื่อไม่ได้ระบุไฟล์"""
+    if not pdf_path:
+        return SAMPLE_CORPUS
+    service = PDFProcessingService()
+    chunks = [chunk["text"] for chunk in service.iter_chunks(service.iter_pdf_pages(pdf_path))]
+    return chunks[:limit]
+
+
+def measure_throughput(backend, texts: List[str], batch_size: int, repeats: int) -> float:
+    backend.encode(texts[:batch_size])  # warmup
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for start in range(0, len(texts), batch_size):
+            backend.encode(texts[start:start + batch_size])
+    return len(texts) * repeats / (time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--pdf", help="ไฟล์ PDF ที่ใช้เป็นข้อความทดสอบ")
+    parser.add_argument("--limit", type=int, default=512, help="จำนวน chunks สูงสุดจากไฟล์ PDF")
+    parser.add_argument("--backends", nargs="+", default=[b for b in EMBEDDING_BACKENDS if b != "torch"])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="cosine ต่ำสุดที่ยอมรับได้")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.pdf, args.limit)
+    print(f"ข้อความทดสอบ: {len(texts)} รายการ")
+
+    reference_backend = get_embedding_backend("torch", args.model)
+    reference = normalize_embeddings(reference_backend.encode(texts))
+    torch_rate = measure_throughput(reference_backend, texts, args.batch_size, args.repeats)
+    print(f"{'backend':<10} {'texts/s':>10} {'speedup':>8} {'cos mean':>9} {'cos min':>8}")
+    print(f"{'torch':<10} {torch_rate:>10.1f} {1.0:>8.2f} {1.0:>9.4f} {1.0:>8.4f}")
+
+    passed = True
+    for name in args.backends:
+        backend = get_embedding_backend(name, args.model)
+        vectors = normalize_embeddings(backend.encode(texts))
+        cosine = np.einsum("ij,ij->i", reference, vectors)
+        rate = measure_throughput(backend, texts, args.batch_size, args.repeats)
+        print(
+            f"{name:<10} {rate:>10.1f} {rate / torch_rate:>8.2f} "
+            f"{cosine.mean():>9.4f} {cosine.min():>8.4f}"
+        )
+        if cosine.min() < args.min_cosine:
+            passed = False
+            print(f"  {name}: cosine ต่ำสุด {cosine.min():.4f} ต่ำกว่าเกณฑ์ {args.min_cosine}")
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
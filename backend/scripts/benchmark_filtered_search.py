@@ -0,0 +1,98 @@
+# scripts/benchmark_filtered_search.py
+"""
+วัด latency ของการค้นหาที่กรองด้วย file_id ก่อนและหลังสร้าง scalar index เมื่อ collection มีขนาดต่างกัน
+สร้าง collection ชั่วคราวบน Milvus ที่ตั้งค่าไว้ เพิ่ม vectors สุ่ม แล้วลบทิ้งเมื่อวัดเสร็จ
+
+ตัวอย่าง:
+    python scripts/benchmark_filtered_search.py
+    python scripts/benchmark_filtered_search.py --sizes 10000 100000 500000 --documents 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import config  # noqa: E402
+from services.milvus_service import MilvusService, quote_string  # noqa: E402
+
+BENCHMARK_COLLECTION = "benchmark_filtered_search"
+
+
+async def measure(milvus: MilvusService, queries: np.ndarray, file_ids: list, limit: int) -> list:
+    """latency (ms) ของแต่ละคำขอที่กรองด้วย file_id หนึ่งเอกสาร"""
+    latencies = []
+    for query, file_id in zip(queries, file_ids):
+        started = time.perf_counter()
+        await milvus.search_vectors(
+            BENCHMARK_COLLECTION,
+            query,
+            limit=limit,
+            output_fields=["file_id"],
+            filter_expr=f"file_id == {quote_string(file_id)}"
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def summarize(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return f"p50 {statistics.median(ordered):7.2f} ms  p95 {p95:7.2f} ms"
+
+
+async def run(args: argparse.Namespace) -> int:
+    milvus = MilvusService(host=config.MILVUS_HOST, port=config.MILVUS_PORT)
+    rng = np.random.default_rng(0)
+    documents = [f"doc-{i}" for i in range(args.documents)]
+
+    for size in args.sizes:
+        if await milvus._collection_exists(BENCHMARK_COLLECTION):
+            await milvus.drop_collection(BENCHMARK_COLLECTION)
+        await milvus.create_collection(BENCHMARK_COLLECTION, args.dimension, layout="none")
+        try:
+            for start in range(0, size, 10000):
+                count = min(10000, size - start)
+                await milvus.insert_vectors(
+                    BENCHMARK_COLLECTION,
+                    [documents[i % args.documents] for i in range(start, start + count)],
+                    ["x"] * count,
+                    rng.standard_normal((count, args.dimension), dtype=np.float32),
+                    [{"page": i % 50} for i in range(count)]
+                )
+            await milvus.flush(BENCHMARK_COLLECTION)
+            await milvus.create_index(BENCHMARK_COLLECTION)
+
+            queries = rng.standard_normal((args.queries, args.dimension), dtype=np.float32)
+            targets = list(rng.choice(documents, size=args.queries))
+            await measure(milvus, queries[:5], targets[:5], args.limit)  # warmup
+            before = await measure(milvus, queries, targets, args.limit)
+
+            status = await milvus.ensure_scalar_indexes(BENCHMARK_COLLECTION, reload=True)
+            await measure(milvus, queries[:5], targets[:5], args.limit)
+            after = await measure(milvus, queries, targets, args.limit)
+
+            print(f"{size:>9} แถว  ไม่มี scalar index: {summarize(before)}  |  มี index: {summarize(after)}")
+            print(f"{'':>9}       indexes: {status}")
+        finally:
+            await milvus.drop_collection(BENCHMARK_COLLECTION)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--documents", type=int, default=1000, help="จำนวน file_id ที่ต่างกัน")
+    parser.add_argument("--dimension", type=int, default=config.DEFAULT_VECTOR_DIM)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
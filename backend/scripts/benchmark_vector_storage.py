@@ -0,0 +1,126 @@
+# scripts/benchmark_vector_storage.py
+"""
+วัด recall@k และ latency ของการเก็บ vectors แบบ float16 และ binary เทียบกับผลลัพธ์ที่ถูกต้องของ float32
+พร้อมผลของการ re-score ด้วย vectors เต็มความละเอียดที่จำนวน candidates ต่างกัน (rerank factor 0 = ไม่ re-score)
+สร้าง collections ชั่วคราวบน Milvus ที่ตั้งค่าไว้ แล้วลบทิ้งเมื่อวัดเสร็จ
+
+ใช้ embeddings จริงจาก collection ที่มีอยู่ด้วย --source (แนะนำ เพราะ vectors สุ่มไม่มีโครงสร้างแบบ embeddings จริง)
+queries คือ vectors ที่สุ่มจากข้อมูลแล้วเพิ่ม noise เล็กน้อย
+
+ตัวอย่าง:
+    python scripts/benchmark_vector_storage.py --source student_documents --rows 50000
+    python scripts/benchmark_vector_storage.py --storages float binary --rerank-factors 0 4 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import config  # noqa: E402
+from services.collection_residency import estimate_footprint  # noqa: E402
+from services.milvus_service import MilvusService  # noqa: E402
+from services.vector_storage import VECTOR_STORAGES, bytes_per_dimension  # noqa: E402
+
+BENCHMARK_COLLECTION = "benchmark_vector_storage"
+
+
+def recall_at_k(expected: list, actual: list) -> float:
+    """สัดส่วนเฉลี่ยของผลลัพธ์ที่ถูกต้อง (expected) ที่อยู่ในผลลัพธ์ที่ได้ (actual) ของแต่ละ query"""
+    return statistics.mean(
+        len(set(truth) & set(found)) / len(truth) for truth, found in zip(expected, actual) if truth
+    )
+
+
+async def load_vectors(milvus: MilvusService, args: argparse.Namespace) -> np.ndarray:
+    """vectors float32 ที่ normalize แล้วจาก --source หรือสุ่ม"""
+    if args.source:
+        entities = await milvus.query_entities(args.source, "id >= 0", output_fields=["id"])
+        ids = [entity["id"] for entity in entities[:args.rows]]
+        vectors = await milvus.fetch_vectors(args.source, ids)
+    else:
+        vectors = np.random.default_rng(0).standard_normal((args.rows, args.dimension), dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+async def measure(milvus: MilvusService, queries: np.ndarray, limit: int, batch: int) -> tuple:
+    """ids ของผลลัพธ์ต่อ query และ latency (ms) ต่อ batch ของ queries"""
+    found, latencies = [], []
+    for start in range(0, len(queries), batch):
+        started = time.perf_counter()
+        groups = await milvus.search_vectors_batch(BENCHMARK_COLLECTION, queries[start:start + batch], limit=limit)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.extend([hit["id"] for hit in group] for group in groups)
+    return found, latencies
+
+
+async def run(args: argparse.Namespace) -> int:
+    milvus = MilvusService(host=config.MILVUS_HOST, port=config.MILVUS_PORT)
+    vectors = await load_vectors(milvus, args)
+    rows, dimension = vectors.shape
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(rows, size=args.queries, replace=False)]
+    queries = queries + rng.normal(0, args.noise, queries.shape).astype(np.float32)
+
+    # ผลลัพธ์ที่ถูกต้อง: cosine similarity แบบ exact บน float32
+    unit_queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    truth_rows = np.argsort(-(unit_queries @ vectors.T), axis=1)[:, :args.k]
+    print(f"{rows} แถว {dimension} มิติ, {args.queries} queries, recall@{args.k} เทียบกับ float32 แบบ exact")
+
+    for storage in args.storages:
+        if await milvus._collection_exists(BENCHMARK_COLLECTION):
+            await milvus.drop_collection(BENCHMARK_COLLECTION)
+        try:
+            await milvus.create_collection(BENCHMARK_COLLECTION, dimension, layout="none", storage=storage)
+        except ValueError as e:
+            print(f"{storage:>8}: ข้าม ({e})")
+            continue
+        try:
+            ids = []
+            for start in range(0, rows, 10000):
+                chunk = vectors[start:start + 10000]
+                ids.extend(await milvus.insert_vectors(
+                    BENCHMARK_COLLECTION, ["bench"] * len(chunk), ["x"] * len(chunk), chunk
+                ))
+            await milvus.flush(BENCHMARK_COLLECTION)
+            index_params = await milvus.create_index(BENCHMARK_COLLECTION, profile=args.profile)
+            expected = [[ids[row] for row in truth] for truth in truth_rows]
+            footprint = estimate_footprint(rows, dimension, 1.0, bytes_per_dimension(storage))
+            print(f"{storage:>8}: {index_params['index_type']} {index_params['metric_type']}, vectors {footprint / 2**20:.1f} MiB")
+
+            for factor in (args.rerank_factors if storage != "float" else [0]):
+                milvus.rerank_factor = factor
+                await measure(milvus, queries[:args.batch], args.k, args.batch)  # warmup
+                found, latencies = await measure(milvus, queries, args.k, args.batch)
+                label = f"rerank x{factor}" if factor else "ไม่ re-score"
+                print(
+                    f"{'':>10}{label:<14} recall@{args.k} {recall_at_k(expected, found):.4f}"
+                    f"  p50 {statistics.median(latencies):7.2f} ms ต่อ {args.batch} queries"
+                )
+        finally:
+            await milvus.drop_collection(BENCHMARK_COLLECTION)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="collection ที่ใช้ embeddings จริง (default: vectors สุ่ม)")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=config.DEFAULT_VECTOR_DIM, help="มิติของ vectors สุ่ม")
+    parser.add_argument("--storages", nargs="+", choices=VECTOR_STORAGES, default=list(VECTOR_STORAGES))
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[0, 2, 4, 10])
+    parser.add_argument("--profile", default="flat", help="index profile ของ collections ชั่วคราว")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=10, help="จำนวน queries ต่อคำขอ")
+    parser.add_argument("--noise", type=float, default=0.02, help="ส่วนเบี่ยงเบนมาตรฐานของ noise ที่เพิ่มให้ queries")
+    parser.add_argument("-k", type=int, default=10)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
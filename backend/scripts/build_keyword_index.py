@@ -0,0 +1,54 @@
+# scripts/build_keyword_index.py
+"""
+สร้าง BM25 keyword index ใหม่จากข้อความของ chunks ที่เก็บไว้ใน vector store
+ใช้กับเอกสารที่นำเข้าก่อนเปิด KEYWORD_INDEX_ENABLED หรือเมื่อไฟล์ index หาย
+
+ตัวอย่าง:
+    python scripts/build_keyword_index.py
+    python scripts/build_keyword_index.py --collection teacher_documents
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import config  # noqa: E402
+from services.ingestion_pipeline import COLLECTIONS  # noqa: E402
+from services.keyword_index import KeywordIndex  # noqa: E402
+from services.vector_store import create_vector_store  # noqa: E402
+
+
+async def build(args: argparse.Namespace) -> int:
+    store = create_vector_store()
+    index = KeywordIndex(args.index_path)
+
+    for name in args.collection or list(COLLECTIONS.values()):
+        if not await store._collection_exists(name):
+            print(f"{name}: ไม่พบ collection ข้าม")
+            continue
+        entities = await store.query_entities(name, "id >= 0", output_fields=["file_id", "content"])
+        index.drop(name)
+        for start in range(0, len(entities), args.batch_size):
+            batch = entities[start:start + args.batch_size]
+            index.add(
+                name,
+                [entity["file_id"] for entity in batch],
+                [entity["id"] for entity in batch],
+                [entity["content"] for entity in batch]
+            )
+        print(f"{name}: เพิ่ม {len(entities)} chunks ลง keyword index แล้ว")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", action="append", help="collection ที่ต้องการสร้าง index (default: ทุก collection ของเอกสาร)")
+    parser.add_argument("--index-path", default=config.KEYWORD_INDEX_PATH)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    return asyncio.run(build(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
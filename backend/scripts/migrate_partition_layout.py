@@ -0,0 +1,76 @@
+# scripts/migrate_partition_layout.py
+"""
+ย้าย collections ของเอกสารไปยัง partition layout ใหม่ และเปลี่ยนรูปแบบการเก็บ vectors ได้ด้วย --storage
+
+collection เดิมถูกเก็บไว้เป็น <ชื่อ>_backup_<เวลา> จนกว่าจะสั่ง --drop-backup
+keyword index (ถ้าเปิด KEYWORD_INDEX_ENABLED) ถูกสร้างใหม่ด้วย ids ใหม่ของแถวที่ย้ายไปพร้อมกัน
+หลัง migrate ให้ตั้ง MILVUS_PARTITION_LAYOUT ให้ตรงกับ layout ใหม่ก่อนเริ่ม server
+เพื่อให้เอกสารที่เพิ่มหลังจากนี้ถูกเก็บในรูปแบบเดียวกัน
+
+ตัวอย่าง:
+    python scripts/migrate_partition_layout.py --layout partition_key
+    python scripts/migrate_partition_layout.py --collection student_documents --layout partition --dry-run
+    python scripts/migrate_partition_layout.py --layout partition_key --storage binary
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import config  # noqa: E402
+from services.ingestion_pipeline import COLLECTIONS  # noqa: E402
+from services.keyword_index import KeywordIndex  # noqa: E402
+from services.milvus_service import PARTITION_LAYOUTS, MilvusService  # noqa: E402
+from services.vector_storage import VECTOR_STORAGES  # noqa: E402
+
+
+async def migrate(args: argparse.Namespace) -> int:
+    milvus = MilvusService(host=config.MILVUS_HOST, port=config.MILVUS_PORT)
+    keyword_index = KeywordIndex(config.KEYWORD_INDEX_PATH) if config.KEYWORD_INDEX_ENABLED else None
+    collections = args.collection or list(COLLECTIONS.values())
+
+    for name in collections:
+        if not await milvus._collection_exists(name):
+            print(f"{name}: ไม่พบ collection ข้าม")
+            continue
+        current = milvus.layout_of(name)
+        stats = await milvus.get_collection_stats(name)
+        print(f"{name}: layout ปัจจุบัน {current}, vectors แบบ {milvus.storage_of(name)}, {stats['row_count']} แถว")
+        if args.dry_run:
+            continue
+
+        result = await milvus.migrate_collection_layout(
+            name, args.layout, batch_size=args.batch_size, storage=args.storage, keyword_index=keyword_index
+        )
+        print(
+            f"{name}: ย้าย {result['rows']} แถวไปยัง layout {args.layout} (vectors แบบ {result['storage']}) แล้ว"
+            f" (backup: {result['backup_collection']})"
+        )
+        if args.drop_backup:
+            await milvus.drop_collection(result["backup_collection"])
+            if keyword_index is not None:
+                keyword_index.drop(result["backup_collection"])
+            print(f"{name}: ลบ {result['backup_collection']} แล้ว")
+
+    if not args.dry_run and args.layout != config.MILVUS_PARTITION_LAYOUT:
+        print(f"ตั้ง MILVUS_PARTITION_LAYOUT={args.layout} ก่อนเริ่ม server")
+    if not args.dry_run and args.storage and args.storage != config.MILVUS_VECTOR_STORAGE:
+        print(f"ตั้ง MILVUS_VECTOR_STORAGE={args.storage} ก่อนเริ่ม server")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", action="append", help="collection ที่ต้องการย้าย (default: ทุก collection ของเอกสาร)")
+    parser.add_argument("--layout", choices=PARTITION_LAYOUTS, required=True)
+    parser.add_argument("--storage", choices=VECTOR_STORAGES, help="รูปแบบการเก็บ vectors ใหม่ (default: รูปแบบเดิม)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--drop-backup", action="store_true", help="ลบ collection เดิมหลังย้ายสำเร็จ")
+    parser.add_argument("--dry-run", action="store_true", help="แสดง layout และจำนวนแถวปัจจุบันโดยไม่ย้าย")
+    return asyncio.run(migrate(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+# services/bulk_ingestion.py
+import asyncio
+import json
+import logging
+import shutil
+import threading
+import time
+import zipfile
+from tempfile import SpooledTemporaryFile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from services.ingestion_pipeline import COLLECTIONS, IngestionPipeline
+from utils.ingestion_cache import IngestionCache
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+class BulkIngestionError(ValueError):
+    """คำขอแบบ bulk ไม่ถูกต้อง เช่น manifest ไม่ครบหรือไฟล์ใน manifest ไม่มีอยู่จริง"""
+
+
+class BulkIngestionService:
+    """
+    นำเข้าเอกสาร PDF หลายไฟล์พร้อมกัน
+    - แต่ละไฟล์ถูกประมวลผลด้วย IngestionPipeline ใน worker pool ที่จำกัดขนาดและใช้ร่วมกันทุกคำขอ
+    - ทุก worker ส่งข้อความไปยัง embedding worker ตัวเดียวกันของ PDFProcessingService
+      chunks จากไฟล์เล็กๆ หลายไฟล์จึงถูกรวมเป็น batch เดียวกันของโมเดล
+    - ไฟล์ที่อัพโหลดถูกพักไว้ใน spooled temporary files (ไฟล์ใหญ่ถูกเขียนลงดิสก์)
+      และถูกอ่านเข้าหน่วยความจำเมื่อใกล้ถึงคิวเท่านั้น จำนวนไฟล์ที่ค้างในหน่วยความจำจึงจำกัดตามจำนวน workers
+    - ผลลัพธ์ของแต่ละไฟล์ถูกส่งคืนทันทีที่ไฟล์นั้นเสร็จ ตามลำดับที่เสร็จ
+    """
+
+    def __init__(
+        self,
+        pipeline: IngestionPipeline,
+        workers: int = 4,
+        ingestion_cache: Optional[IngestionCache] = None,
+        max_files: int = 500,
+        max_file_bytes: int = 100 * 1024 * 1024,
+        spool_memory_bytes: int = 2 * 1024 * 1024
+    ):
+        """
+        Args:
+            pipeline: pipeline สำหรับนำเข้าเอกสาร
+            workers: จำนวนไฟล์ที่ประมวลผลพร้อมกันสูงสุด
+            ingestion_cache: cache ของผลการประมวลผล (optional)
+            max_files: จำนวนไฟล์สูงสุดต่อคำขอ
+            max_file_bytes: ขนาดสูงสุดของแต่ละไฟล์หลังแตกไฟล์ zip
+            spool_memory_bytes: ขนาดสูงสุดของแต่ละไฟล์ที่พักไว้ในหน่วยความจำระหว่างรอคิว
+        """
+        self.pipeline = pipeline
+        self.workers = workers
+        self.ingestion_cache = ingestion_cache
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.spool_memory_bytes = spool_memory_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-ingestion")
+
+    def spool(self, stream: IO[bytes]) -> SpooledTemporaryFile:
+        """
+        คัดลอกไฟล์จากคำขอไปพักไว้ เพื่อให้อ่านได้หลังจากคำขอจบแล้วระหว่างที่ส่งผลลัพธ์แบบ streaming
+        ผู้เรียกต้องปิดไฟล์ที่ได้เมื่อประมวลผลเสร็จ
+        """
+        spool = SpooledTemporaryFile(max_size=self.spool_memory_bytes)
+        shutil.copyfileobj(stream, spool)
+        spool.seek(0)
+        return spool
+
+    @staticmethod
+    def spool_loader(spool: SpooledTemporaryFile) -> Callable[[], bytes]:
+        """ฟังก์ชันที่อ่านข้อมูลทั้งหมดของไฟล์ที่พักไว้ (เรียกจากหลาย workers พร้อมกันได้)"""
+        lock = threading.Lock()
+
+        def load() -> bytes:
+            with lock:
+                spool.seek(0)
+                return spool.read()
+        return load
+
+    @staticmethod
+    def _validate_entry(entry: Dict, index: int) -> Dict:
+        """ตรวจสอบรายการหนึ่งใน manifest และคืนรายการในรูปแบบมาตรฐาน"""
+        if not isinstance(entry, dict):
+            raise BulkIngestionError(f"manifest รายการที่ {index} ต้องเป็น object")
+        file_name = entry.get("file") or entry.get("file_name")
+        if not file_name:
+            raise BulkIngestionError(f"manifest รายการที่ {index} ไม่มีชื่อไฟล์ (file)")
+        if not file_name.lower().endswith(".pdf"):
+            raise BulkIngestionError(f"รองรับเฉพาะไฟล์ PDF เท่านั้น: {file_name}")
+        document_id = entry.get("document_id")
+        if not document_id:
+            raise BulkIngestionError(f"manifest ของ {file_name} ไม่มี document_id")
+        file_type = entry.get("file_type")
+        if file_type not in COLLECTIONS:
+            raise BulkIngestionError(
+                f"file_type ของ {file_name} ต้องเป็น 'teacher' หรือ 'student'"
+            )
+        return {
+            "file_name": file_name,
+            "document_id": str(document_id),
+            "file_type": file_type,
+            "incremental": bool(entry.get("incremental", False))
+        }
+
+    @staticmethod
+    def by_file_name(items: Iterable[Any], file_name: Callable[[Any], str]) -> Dict[str, Any]:
+        """
+        จับคู่ไฟล์ในคำขอหรือใน zip กับชื่อไฟล์
+        ชื่อที่ซ้ำกันทำให้ไม่รู้ว่ารายการใน manifest หมายถึงไฟล์ใด จึงปฏิเสธทั้งคำขอแทนการทิ้งไฟล์ใดไฟล์หนึ่ง
+        """
+        named: Dict[str, Any] = {}
+        for item in items:
+            name = file_name(item)
+            if name in named:
+                raise BulkIngestionError(f"ชื่อไฟล์ซ้ำกัน: {name}")
+            named[name] = item
+        return named
+
+    def parse_manifest(self, manifest: Iterable[Dict], available: Iterable[str]) -> List[Dict]:
+        """
+        ตรวจสอบ manifest ทั้งหมดก่อนเริ่มประมวลผล
+
+        Args:
+            manifest: รายการของ {file, document_id, file_type, incremental (optional)}
+            available: ชื่อไฟล์ที่มีอยู่ในคำขอหรือใน zip
+
+        Returns:
+            รายการที่ผ่านการตรวจสอบแล้ว
+        """
+        if not isinstance(manifest, list) or not manifest:
+            raise BulkIngestionError("manifest ต้องเป็น list ที่ไม่ว่าง")
+        if len(manifest) > self.max_files:
+            raise BulkIngestionError(f"จำนวนไฟล์เกินกำหนด ({len(manifest)} > {self.max_files})")
+
+        available = set(available)
+        entries = [self._validate_entry(entry, index) for index, entry in enumerate(manifest)]
+        seen = set()
+        for entry in entries:
+            if entry["file_name"] not in available:
+                raise BulkIngestionError(f"ไม่พบไฟล์ {entry['file_name']} ในคำขอ")
+            key = (entry["file_type"], entry["document_id"])
+            if key in seen:
+                raise BulkIngestionError(f"document_id ซ้ำกัน: {entry['document_id']}")
+            seen.add(key)
+        return entries
+
+    def entries_from_uploads(self, manifest: Iterable[Dict], files: Dict[str, Any], spools: List) -> List[Dict]:
+        """
+        ตรวจสอบ manifest ของไฟล์ที่อัพโหลดแบบ multipart และพักแต่ละไฟล์ไว้ครั้งเดียว
+        หลายรายการใน manifest อ้างถึงไฟล์เดียวกันได้ (เช่น นำเข้าเป็นทั้ง teacher และ student)
+        โดยใช้ไฟล์ที่พักไว้ร่วมกัน เพราะ stream ของไฟล์ในคำขออ่านได้เพียงครั้งเดียว
+
+        Args:
+            manifest: รายการของ {file, document_id, file_type, incremental (optional)}
+            files: ไฟล์ในคำขอตามชื่อไฟล์ (object ที่มี stream)
+            spools: list ที่ไฟล์ที่พักไว้ถูกเพิ่มเข้าไป ผู้เรียกต้องปิดเมื่อใช้เสร็จหรือเมื่อเกิดข้อผิดพลาด
+
+        Returns:
+            รายการพร้อม "load" สำหรับอ่านข้อมูลของไฟล์
+        """
+        entries = self.parse_manifest(manifest, files)
+        loaders: Dict[str, Callable[[], bytes]] = {}
+        for entry in entries:
+            file_name = entry["file_name"]
+            if file_name not in loaders:
+                spool = self.spool(files[file_name].stream)
+                spools.append(spool)
+                loaders[file_name] = self.spool_loader(spool)
+            entry["load"] = loaders[file_name]
+        return entries
+
+    def entries_from_zip(self, archive: IO[bytes]) -> List[Dict]:
+        """
+        อ่าน manifest.json จากไฟล์ zip และผูกแต่ละรายการกับฟังก์ชันที่อ่านไฟล์นั้นจาก zip
+
+        Args:
+            archive: file object ของไฟล์ zip (ต้อง seek ได้)
+
+        Returns:
+            รายการพร้อม "load" สำหรับอ่านข้อมูลของไฟล์
+        """
+        try:
+            zf = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile:
+            raise BulkIngestionError("ไฟล์ zip ไม่ถูกต้อง")
+
+        members = self.by_file_name(
+            (info for info in zf.infolist() if not info.is_dir()), lambda info: info.filename
+        )
+        if MANIFEST_NAME not in members:
+            raise BulkIngestionError(f"ไม่พบ {MANIFEST_NAME} ในไฟล์ zip")
+        try:
+            manifest = json.loads(zf.read(MANIFEST_NAME))
+        except ValueError:
+            raise BulkIngestionError(f"{MANIFEST_NAME} ไม่ใช่ JSON ที่ถูกต้อง")
+
+        entries = self.parse_manifest(manifest, members)
+        lock = threading.Lock()
+        for entry in entries:
+            info = members[entry["file_name"]]
+            if info.file_size > self.max_file_bytes:
+                raise BulkIngestionError(f"ไฟล์ {entry['file_name']} มีขนาดเกินกำหนด")
+            entry["load"] = self._zip_loader(zf, info, lock)
+        return entries
+
+    @staticmethod
+    def _zip_loader(zf: zipfile.ZipFile, info: zipfile.ZipInfo, lock: threading.Lock) -> Callable[[], bytes]:
+        def load() -> bytes:
+            with lock:
+                return zf.read(info)
+        return load
+
+    def iter_results(self, entries: List[Dict]) -> Iterator[Dict]:
+        """
+        ประมวลผลทุกไฟล์ใน worker pool และคืนผลลัพธ์ของแต่ละไฟล์ทันทีที่เสร็จ
+        ส่งไฟล์เข้า pool ล่วงหน้าไม่เกินสองเท่าของจำนวน workers เพื่อจำกัดหน่วยความจำ
+        รายการสุดท้ายเป็นสรุปผลของทั้งคำขอ
+
+        Args:
+            entries: รายการที่ผ่านการตรวจสอบแล้ว แต่ละรายการมี "load" ที่คืนข้อมูลของไฟล์ (bytes)
+
+        Yields:
+            Dictionary ผลลัพธ์ของแต่ละไฟล์ และสรุปผลเป็นรายการสุดท้าย
+        """
+        started = time.perf_counter()
+        pending_entries = iter(entries)
+        in_flight: Dict[Future, Dict] = {}
+        succeeded = failed = 0
+        touched_collections = set()
+
+        def submit_next() -> bool:
+            entry = next(pending_entries, None)
+            if entry is None:
+                return False
+            in_flight[self._executor.submit(self._process_entry, entry)] = entry
+            return True
+
+        while len(in_flight) < self.workers * 2 and submit_next():
+            pass
+
+        try:
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.pop(future)
+                    result = future.result()
+                    if result["status"] == "success":
+                        succeeded += 1
+                        touched_collections.add(result["collection"])
+                    else:
+                        failed += 1
+                    submit_next()
+                    yield result
+        finally:
+            # client ตัดการเชื่อมต่อกลางทาง: ยกเลิกไฟล์ที่ยังไม่เริ่มประมวลผล
+            for future in in_flight:
+                future.cancel()
+
+        # insert ของแต่ละไฟล์ไม่ flush เอง จึง seal ข้อมูลครั้งเดียวต่อ collection เมื่อนำเข้าครบทุกไฟล์
+        flush_errors = {}
+        for collection_name in sorted(touched_collections):
+            try:
+                asyncio.run(self.pipeline.milvus_service.flush(collection_name))
+            except Exception as e:
+                flush_errors[collection_name] = str(e)
+
+        yield {
+            "status": "completed",
+            "total": len(entries),
+            "succeeded": succeeded,
+            "failed": failed,
+            "flushed": sorted(set(touched_collections) - set(flush_errors)),
+            **({"flush_errors": flush_errors} if flush_errors else {}),
+            "seconds": round(time.perf_counter() - started, 4)
+        }
+
+    def _process_entry(self, entry: Dict) -> Dict:
+        """ประมวลผลไฟล์หนึ่งไฟล์ใน worker thread (แต่ละไฟล์มี event loop ของตัวเอง)"""
+        summary = {
+            "file_name": entry["file_name"],
+            "document_id": entry["document_id"],
+            "file_type": entry["file_type"]
+        }
+        try:
+            source = entry["load"]()
+            if not source:
+                raise ValueError("ไฟล์ว่างเปล่า")
+            if entry["incremental"]:
+                result = asyncio.run(self.pipeline.reingest(
+                    source, entry["document_id"], entry["file_type"]
+                ))
+            else:
+                result = asyncio.run(self.pipeline.ingest(
+                    source,
+                    entry["document_id"],
+                    entry["file_type"],
+                    ingestion_cache=self.ingestion_cache
+                ))
+            result.pop("ids", None)
+            return {**summary, "status": "success", **result}
+        except Exception as e:
+            logger.exception("นำเข้าไฟล์ %s ไม่สำเร็จ", entry["file_name"])
+            return {**summary, "status": "error", "message": str(e)}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,173 @@
+# services/collection_residency.py
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+# ขนาดของหนึ่งค่าใน FLOAT_VECTOR
+FLOAT_BYTES = 4
+
+
+def estimate_footprint(
+    row_count: int,
+    dimension: int,
+    overhead: float = 1.0,
+    bytes_per_dimension: float = FLOAT_BYTES
+) -> int:
+    """
+    ประมาณหน่วยความจำที่ collection ใช้บน query nodes เมื่อถูก load (bytes)
+    คิดจาก vectors (จำนวนแถว x มิติ x 4 bytes หรือน้อยกว่าสำหรับ vectors ที่บีบอัด)
+    คูณ overhead ของ index และ scalar fields
+    """
+    return int(max(row_count, 0) * max(dimension, 0) * bytes_per_dimension * max(overhead, 1.0))
+
+
+class CollectionResidencyManager:
+    """
+    ติดตามว่า collection ใดถูก load อยู่บน Milvus และเลือก collections ที่ควร release
+    เพื่อให้หน่วยความจำที่ประมาณไว้ของ collections ที่ load อยู่ไม่เกิน budget
+
+    - เรียงลำดับแบบ LRU ตามการใช้งานล่าสุด และนับจำนวนครั้งที่ใช้เพื่อเลือก collections ที่ควร preload
+    - collection ที่กำลังถูกใช้งาน (pin อยู่) จะไม่ถูกเลือกให้ release
+      ถ้า collections ที่เหลือถูก pin ทั้งหมด จะยอมให้เกิน budget ชั่วคราวแทนการปฏิเสธคำขอ
+    - เก็บเฉพาะสถานะ การ load และ release จริงเป็นหน้าที่ของผู้เรียก (MilvusService)
+    """
+
+    def __init__(self, budget_bytes: int = 0):
+        """
+        Args:
+            budget_bytes: หน่วยความจำสูงสุดของ collections ที่ load พร้อมกัน (0 = ไม่จำกัด)
+        """
+        self.budget_bytes = max(budget_bytes, 0)
+        self._lock = threading.Lock()
+        self._resident: "OrderedDict[str, int]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._pins: Counter = Counter()
+        self._uses: Counter = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.evictions: Counter = Counter()
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._resident.values())
+
+    @property
+    def resident_count(self) -> int:
+        return len(self._resident)
+
+    def is_resident(self, collection_name: str) -> bool:
+        return collection_name in self._resident
+
+    def acquire(self, collection_name: str) -> bool:
+        """
+        pin collection ไว้ระหว่างใช้งานและบันทึกการใช้งาน ต้องเรียก unpin เมื่อใช้เสร็จ
+
+        Returns:
+            True ถ้า collection ถูก load อยู่แล้ว (ผู้เรียกต้อง load เองถ้าเป็น False)
+        """
+        with self._lock:
+            self._pins[collection_name] += 1
+            self._uses[collection_name] += 1
+            self._last_used[collection_name] = time.monotonic()
+            if collection_name in self._resident:
+                self._resident.move_to_end(collection_name)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def unpin(self, collection_name: str) -> None:
+        with self._lock:
+            self._pins[collection_name] -= 1
+            if self._pins[collection_name] <= 0:
+                del self._pins[collection_name]
+
+    def admit(self, collection_name: str, footprint: int) -> List[str]:
+        """
+        บันทึกว่า collection ถูก load แล้ว และเลือก collections ที่ต้อง release ให้อยู่ใน budget
+        collections ที่ถูกเลือกจะถูกนำออกจากรายการที่ load อยู่ทันที
+
+        Returns:
+            ชื่อ collections ที่ผู้เรียกต้อง release เรียงจากที่ใช้งานล่าสุดนานที่สุด
+        """
+        with self._lock:
+            self._resident[collection_name] = footprint
+            self._resident.move_to_end(collection_name)
+            self._last_used.setdefault(collection_name, time.monotonic())
+            victims: List[str] = []
+            if not self.budget_bytes:
+                return victims
+            excess = self.resident_bytes - self.budget_bytes
+            for name in list(self._resident):
+                if excess <= 0:
+                    break
+                if name == collection_name or self._pins.get(name):
+                    continue
+                excess -= self._resident.pop(name)
+                victims.append(name)
+            return victims
+
+    def fits(self, footprint: int) -> bool:
+        """collection ขนาดนี้ load เพิ่มได้โดยไม่ต้อง release collection อื่นหรือไม่"""
+        return not self.budget_bytes or self.resident_bytes + footprint <= self.budget_bytes
+
+    def idle(self, idle_seconds: float) -> List[str]:
+        """
+        เลือก collections ที่ไม่ถูกใช้งานนานกว่า idle_seconds และไม่ได้ pin อยู่
+        และนำออกจากรายการที่ load อยู่ ผู้เรียกต้อง release collections ที่คืนไป
+        """
+        now = time.monotonic()
+        with self._lock:
+            victims = [
+                name for name in self._resident
+                if not self._pins.get(name) and now - self._last_used.get(name, now) >= idle_seconds
+            ]
+            for name in victims:
+                del self._resident[name]
+            return victims
+
+    def confirm_release(self, collection_name: str, reason: str) -> bool:
+        """
+        ตรวจสอบอีกครั้งก่อน release จริง เพราะ collection ที่ถูกเลือกไปแล้ว
+        อาจถูก pin หรือ load กลับเข้ามาใหม่ระหว่างนั้น และนับการ release ตามเหตุผล (budget หรือ idle)
+        """
+        with self._lock:
+            if collection_name in self._resident or self._pins.get(collection_name):
+                return False
+            self.evictions[reason] += 1
+            return True
+
+    def forget(self, collection_name: str) -> None:
+        """ลบสถานะการ load ของ collection (เช่น เมื่อ release เอง ลบ หรือเปลี่ยนชื่อ collection)"""
+        with self._lock:
+            self._resident.pop(collection_name, None)
+
+    def hot(self, limit: Optional[int] = None) -> List[str]:
+        """collections ที่ไม่ได้ load อยู่ เรียงจากที่ถูกใช้งานบ่อยที่สุด"""
+        with self._lock:
+            names = [name for name, _ in self._uses.most_common() if name not in self._resident]
+        return names if limit is None else names[:limit]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """สถานะปัจจุบันสำหรับ API และ metrics"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": self.resident_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": dict(self.evictions),
+                "collections": [
+                    {
+                        "name": name,
+                        "footprint_bytes": footprint,
+                        "pinned": self._pins.get(name, 0),
+                        "uses": self._uses.get(name, 0),
+                        "idle_seconds": round(now - self._last_used.get(name, now), 1)
+                    }
+                    # ใช้งานล่าสุดก่อน
+                    for name, footprint in reversed(self._resident.items())
+                ]
+            }
@@ -0,0 +1,168 @@
+# services/embedding_backends.py
+import os
+from typing import List
+
+import numpy as np
+
+from core.config import config
+from services.model_registry import get_sentence_transformer, model_registry
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _read_max_seq_length(model_id: str) -> int:
+    """อ่าน max_seq_length จาก sentence_bert_config.json ของโมเดล (256 สำหรับ all-MiniLM-L6-v2)"""
+    try:
+        import json
+        from huggingface_hub import hf_hub_download
+
+        with open(hf_hub_download(model_id, "sentence_bert_config.json")) as f:
+            return int(json.load(f)["max_seq_length"])
+    except Exception:
+        return 256
+
+
+class TorchEmbeddingBackend:
+    """สร้าง embeddings ด้วย SentenceTransformer (PyTorch) ตามปกติ"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.model = get_sentence_transformer(model_name)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True)
+
+
+class OnnxEmbeddingBackend:
+    """
+    สร้าง embeddings ด้วย ONNX Runtime บน CPU
+    export โมเดล transformer เป็น ONNX ครั้งแรกที่ใช้งานแล้วเก็บไว้ใน EMBEDDING_ONNX_DIR
+    เมื่อ quantize=True จะแปลง weights เป็น int8 แบบ dynamic quantization ซึ่งเร็วกว่าบน CPU ที่ไม่มี GPU
+
+    ผลลัพธ์เป็น mean pooling ของ token embeddings แบบเดียวกับ all-MiniLM-L6-v2 ใน sentence-transformers
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False, onnx_dir: str = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.name = "onnx-int8" if quantize else "onnx"
+
+        model_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        export_dir = os.path.join(onnx_dir or config.EMBEDDING_ONNX_DIR, model_id.replace("/", "__"))
+        model_path = self._ensure_exported(model_id, export_dir)
+        if quantize:
+            model_path = self._ensure_quantized(model_path)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.max_seq_length = min(
+            _read_max_seq_length(model_id),
+            self.tokenizer.model_max_length
+        )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if config.EMBEDDING_ONNX_THREADS > 0:
+            options.intra_op_num_threads = config.EMBEDDING_ONNX_THREADS
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {item.name for item in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    @staticmethod
+    def _ensure_exported(model_id: str, export_dir: str) -> str:
+        """export โมเดลเป็น ONNX ถ้ายังไม่มีไฟล์ (เขียนไฟล์ชั่วคราวแล้ว rename เพื่อไม่ให้ได้ไฟล์ที่เขียนไม่ครบ)"""
+        model_path = os.path.join(export_dir, "model.onnx")
+        if os.path.exists(model_path):
+            return model_path
+
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        os.makedirs(export_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_id)
+        model = AutoModel.from_pretrained(model_id).eval()
+        sample = tokenizer(["warmup text"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        temp_path = f"{model_path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                temp_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        os.replace(temp_path, model_path)
+        return model_path
+
+    @staticmethod
+    def _ensure_quantized(model_path: str) -> str:
+        """แปลงโมเดล ONNX เป็น int8 ด้วย dynamic quantization ถ้ายังไม่มีไฟล์"""
+        quantized_path = model_path.replace(".onnx", ".int8.onnx")
+        if os.path.exists(quantized_path):
+            return quantized_path
+
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        temp_path = f"{quantized_path}.{os.getpid()}.tmp"
+        quantize_dynamic(model_path, temp_path, weight_type=QuantType.QInt8)
+        os.replace(temp_path, quantized_path)
+        return quantized_path
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            list(texts),
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        inputs = {
+            name: encoded[name].astype(np.int64)
+            for name in self.input_names
+        }
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # mean pooling เฉพาะ tokens จริง (ไม่รวม padding)
+        mask = encoded["attention_mask"][..., np.newaxis].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return (summed / counts).astype(np.float32)
+
+
+def get_embedding_backend(backend: str, model_name: str):
+    """
+    คืน embedding backend ที่ใช้ร่วมกันทั้ง process ตามชื่อ
+    
+    Args:
+        backend: "torch", "onnx" หรือ "onnx-int8"
+        model_name: ชื่อโมเดลของ sentence-transformers
+        
+    Returns:
+        backend ที่มี tokenizer, max_seq_length, dimension และ encode(texts) -> np.ndarray
+    """
+    if backend == "torch":
+        loader = lambda: TorchEmbeddingBackend(model_name)
+    elif backend == "onnx":
+        loader = lambda: OnnxEmbeddingBackend(model_name)
+    elif backend == "onnx-int8":
+        loader = lambda: OnnxEmbeddingBackend(model_name, quantize=True)
+    else:
+        raise ValueError(
+            f"EMBEDDING_BACKEND ไม่ถูกต้อง: {backend} (ต้องเป็นหนึ่งใน {', '.join(EMBEDDING_BACKENDS)})"
+        )
+    return model_registry.get(f"embedding-backend:{backend}:{model_name}", loader)
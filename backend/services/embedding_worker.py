@@ -0,0 +1,119 @@
+# services/embedding_worker.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingWorker:
+    """
+    Worker สำหรับสร้าง embeddings แบบ dynamic micro-batching
+    รวมคำขอที่เข้ามาพร้อมกันจากหลาย requests ให้เป็น batch เดียวภายในช่วงเวลาสั้นๆ
+    แล้วเรียกโมเดลใน background thread ผู้เรียกแต่ละรายจะได้ Future ของผลลัพธ์ตัวเอง
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        name: str = "embedding-worker"
+    ):
+        """
+        Args:
+            encode_fn: ฟังก์ชันที่รับรายการข้อความและคืนเมทริกซ์ embeddings
+            max_batch_size: จำนวนข้อความสูงสุดต่อ batch
+            max_wait_ms: เวลาสูงสุดที่จะรอรวมคำขออื่นหลังจากได้รับคำขอแรก (มิลลิวินาที)
+            name: ชื่อของ background thread
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        ส่งข้อความเข้าคิวเพื่อสร้าง embeddings
+        
+        Args:
+            texts: รายการข้อความ
+            
+        Returns:
+            concurrent.futures.Future ที่จะได้เมทริกซ์ embeddings ขนาด (len(texts), มิติ)
+            ใช้ asyncio.wrap_future เพื่อรอผลลัพธ์ใน async code โดยไม่ block event loop
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self) -> Optional[List[Tuple[List[str], Future]]]:
+        """รอคำขอแรกแล้วรวมคำขอที่ตามมาจนกว่าจะครบขนาด batch หรือหมดเวลารอ"""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        batch_size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+
+        while batch_size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # ส่ง sentinel กลับเข้าคิวเพื่อหยุด worker หลังจากประมวลผล batch นี้เสร็จ
+                self._queue.put(None)
+                break
+            batch.append(item)
+            batch_size += len(item[0])
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+
+            # ข้ามคำขอที่ผู้เรียกยกเลิกไปแล้ว
+            batch = [(texts, future) for texts, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                embeddings = self.encode_fn([text for texts, _ in batch for text in texts])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for texts, future in batch:
+                future.set_result(embeddings[start:start + len(texts)])
+                start += len(texts)
+
+    def shutdown(self) -> None:
+        """หยุด background thread หลังจากประมวลผลคำขอที่ค้างอยู่เสร็จ"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
@@ -1,22 +1,30 @@
 # services/evaluation_service.py
 from typing import Dict, List, Optional
-from services.milvus_service import MilvusService
+import asyncio
+import numpy as np
+from core.config import config
+from services.keyword_index import KeywordIndex
+from services.milvus_service import MilvusService, quote_string
 from services.pdf_service import PDFProcessingService
 from services.llm_service import LLMService
+from services.search_service import file_id_filter, reciprocal_rank_fusion
 
 class EvaluationService:
     def __init__(
         self,
         milvus_service: MilvusService,
         pdf_service: PDFProcessingService,
-        llm_service: LLMService
+        llm_service: LLMService,
+        keyword_index: Optional[KeywordIndex] = None
     ):
         """
         เริ่มต้น EvaluationService พร้อม dependencies ที่จำเป็น
+        ถ้ามี keyword_index และเปิด HYBRID_SEARCH_ENABLED เนื้อหาอ้างอิงจะค้นหาแบบ hybrid (vector + BM25)
         """
         self.milvus_service = milvus_service
         self.pdf_service = pdf_service
         self.llm_service = llm_service
+        self.keyword_index = keyword_index if config.HYBRID_SEARCH_ENABLED else None
 
     async def evaluate_answer(
         self,
@@ -48,6 +56,44 @@ class EvaluationService:
 
         return evaluation_result
 
+    async def evaluate_answers(
+        self,
+        questions: List[str],
+        student_file_id: str,
+        teacher_file_ids: List[str],
+        evaluation_criteria: Dict[str, float]
+    ) -> List[Dict]:
+        """
+        ประเมินคำตอบของนักเรียนหลายคำถามพร้อมกัน
+        การค้นหาเนื้อหาอ้างอิงและคำตอบของนักเรียนของทุกคำถามใช้ Milvus เพียงครั้งเดียวต่อ collection
+        
+        Returns:
+            ผลการประเมินของแต่ละคำถามตามลำดับของ questions
+        """
+        if not questions:
+            return []
+
+        # สร้าง embeddings ของทุกคำถามครั้งเดียว ใช้ร่วมกันทั้งสองการค้นหา
+        query_embeddings = await self.pdf_service.create_embedding_matrix(questions)
+        reference_contents = await self._retrieve_relevant_content_batch(
+            query_embeddings, teacher_file_ids, questions
+        )
+        student_answers = await self._get_student_answers_batch(
+            query_embeddings, student_file_id
+        )
+
+        evaluations = []
+        for question, reference_content, student_answer in zip(
+            questions, reference_contents, student_answers
+        ):
+            evaluations.append(await self.llm_service.generate_evaluation(
+                question=question,
+                student_answer=student_answer,
+                reference_content=reference_content,
+                evaluation_criteria=evaluation_criteria
+            ))
+        return evaluations
+
     async def _retrieve_relevant_content(
         self,
         question: str,
@@ -56,17 +102,45 @@ class EvaluationService:
         """
         ดึงเนื้อหาที่เกี่ยวข้องจากเอกสารอ้างอิงโดยใช้ semantic search
         """
-        query_embedding = await self.pdf_service.create_embeddings([question])
-        
-        results = await self.milvus_service.search_vectors(
+        query_embedding = await self.pdf_service.create_embedding_matrix([question])
+        contents = await self._retrieve_relevant_content_batch(query_embedding, teacher_file_ids, [question])
+        return contents[0]
+
+    async def _retrieve_relevant_content_batch(
+        self,
+        query_embeddings: np.ndarray,
+        teacher_file_ids: List[str],
+        questions: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        ดึงเนื้อหาที่เกี่ยวข้องของหลายคำถามจากเอกสารอ้างอิงในการค้นหาครั้งเดียว
+        เมื่อมี keyword index จะดึงผู้สมัครจาก vector และ BM25 อย่างละ HYBRID_CANDIDATES รายการ
+        แล้วเลือก 3 อันดับแรกด้วย reciprocal rank fusion
+        """
+        limit = 3  # จำกัดจำนวนผลลัพธ์เพื่อให้พอดีกับ context window
+        hybrid = self.keyword_index is not None and questions is not None
+        groups = await self.milvus_service.search_vectors_batch(
             collection_name="teacher_documents",
-            query_vectors=query_embedding[0],
-            limit=3,  # จำกัดจำนวนผลลัพธ์เพื่อให้พอดีกับ context window
-            filter_expr=f"file_id in {teacher_file_ids}",
+            query_vectors=query_embeddings,
+            limit=max(config.HYBRID_CANDIDATES, limit) if hybrid else limit,
+            filter_expr=file_id_filter(teacher_file_ids),
             output_fields=["content"]
         )
+        if hybrid:
+            keyword_groups = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.keyword_index.search_batch,
+                "teacher_documents",
+                questions,
+                max(config.HYBRID_CANDIDATES, limit),
+                teacher_file_ids
+            )
+            groups = [
+                reciprocal_rank_fusion({"vector": vector_results, "keyword": keyword_results}, limit)
+                for vector_results, keyword_results in zip(groups, keyword_groups)
+            ]
         
-        return "\n\n".join([r["content"] for r in results])
+        return ["\n\n".join([r["content"] for r in results]) for results in groups]
 
     async def _get_student_answer(
         self,
@@ -76,14 +150,24 @@ class EvaluationService:
         """
         ดึงคำตอบของนักเรียนที่เกี่ยวข้องกับคำถาม
         """
-        query_embedding = await self.pdf_service.create_embeddings([question])
-        
-        results = await self.milvus_service.search_vectors(
+        query_embedding = await self.pdf_service.create_embedding_matrix([question])
+        answers = await self._get_student_answers_batch(query_embedding, student_file_id)
+        return answers[0]
+
+    async def _get_student_answers_batch(
+        self,
+        query_embeddings: np.ndarray,
+        student_file_id: str
+    ) -> List[str]:
+        """
+        ดึงคำตอบของนักเรียนสำหรับหลายคำถามในการค้นหาครั้งเดียว
+        """
+        groups = await self.milvus_service.search_vectors_batch(
             collection_name="student_documents",
-            query_vectors=query_embedding[0],
+            query_vectors=query_embeddings,
             limit=1,
-            filter_expr=f"file_id == '{student_file_id}'",
+            filter_expr=f"file_id == {quote_string(student_file_id)}",
             output_fields=["content"]
         )
         
-        return results[0]["content"] if results else ""
\ No newline at end of file
+        return [results[0]["content"] if results else "" for results in groups]
\ No newline at end of file
@@ -0,0 +1,107 @@
+# services/full_vector_store.py
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+# SQLite จำกัดจำนวน parameters ต่อคำสั่ง
+_MAX_VARIABLES = 900
+
+
+class FullPrecisionStore:
+    """
+    ที่เก็บ vectors แบบ float32 คู่กับ collection ที่เก็บ vectors แบบบีบอัด (float16 หรือ binary) ใน Milvus
+    ใช้ re-score ผลลัพธ์รอบแรกด้วย vectors เต็มความละเอียด จึงอ่านจากดิสก์เฉพาะ candidates ไม่ต้องอยู่ในหน่วยความจำของ Milvus
+    ใช้ SQLite หนึ่งตารางต่อ collection โดย id คือ primary key ของแถวใน Milvus
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: ไฟล์ฐานข้อมูล SQLite
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._tables: set = set()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _table(collection_name: str) -> str:
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", collection_name):
+            raise ValueError(f"ชื่อ collection ไม่ถูกต้อง: {collection_name}")
+        return f"vec_{collection_name}"
+
+    def _ensure_table(self, connection: sqlite3.Connection, collection_name: str) -> str:
+        table = self._table(collection_name)
+        if table not in self._tables:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, vector BLOB NOT NULL)")
+            self._tables.add(table)
+        return table
+
+    def add(self, collection_name: str, ids: List[int], vectors: np.ndarray) -> None:
+        """เก็บ vectors ตาม primary keys ใน Milvus (แถวที่ i ของ vectors คือ ids[i])"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._connect() as connection:
+            table = self._ensure_table(connection, collection_name)
+            connection.execute("BEGIN")
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {table} (id, vector) VALUES (?, ?)",
+                [(int(i), vector.tobytes()) for i, vector in zip(ids, vectors)]
+            )
+            connection.execute("COMMIT")
+
+    def get(self, collection_name: str, ids: List[int]) -> Dict[int, np.ndarray]:
+        """vectors ของ ids ที่มีอยู่ (ids ที่ไม่พบจะไม่อยู่ในผลลัพธ์)"""
+        found: Dict[int, np.ndarray] = {}
+        with self._connect() as connection:
+            table = self._ensure_table(connection, collection_name)
+            for start in range(0, len(ids), _MAX_VARIABLES):
+                chunk = [int(i) for i in ids[start:start + _MAX_VARIABLES]]
+                rows = connection.execute(
+                    f"SELECT id, vector FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)})",
+                    chunk
+                ).fetchall()
+                for row_id, blob in rows:
+                    found[row_id] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def delete(self, collection_name: str, ids: List[int]) -> None:
+        """ลบ vectors ตาม primary keys ใน Milvus"""
+        if not ids:
+            return
+        with self._connect() as connection:
+            table = self._ensure_table(connection, collection_name)
+            connection.execute("BEGIN")
+            connection.executemany(f"DELETE FROM {table} WHERE id = ?", [(int(i),) for i in ids])
+            connection.execute("COMMIT")
+
+    def rename(self, collection_name: str, new_name: str) -> None:
+        """ย้าย vectors ไปอยู่กับ collection ที่เปลี่ยนชื่อ (แทนที่ vectors เดิมของชื่อใหม่)"""
+        table, new_table = self._table(collection_name), self._table(new_name)
+        with self._connect() as connection:
+            connection.execute(f"DROP TABLE IF EXISTS {new_table}")
+            self._ensure_table(connection, collection_name)
+            connection.execute(f"ALTER TABLE {table} RENAME TO {new_table}")
+        self._tables.discard(table)
+        self._tables.add(new_table)
+
+    def drop(self, collection_name: str) -> None:
+        """ลบ vectors ทั้งหมดของ collection"""
+        table = self._table(collection_name)
+        with self._connect() as connection:
+            connection.execute(f"DROP TABLE IF EXISTS {table}")
+        self._tables.discard(table)
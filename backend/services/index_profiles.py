@@ -0,0 +1,110 @@
+# services/index_profiles.py
+import math
+from typing import Any, Dict, Optional
+
+from core.config import config
+
+# profiles ของ vector index
+# - flat: ค้นหาแบบ exact ทุกแถว เหมาะกับ collection เล็ก ไม่ต้อง train index
+# - ivf: IVF_FLAT ที่คำนวณ nlist จากจำนวนแถว
+# - hnsw: graph index ที่ recall สูงและเร็ว แลกกับหน่วยความจำที่มากกว่า
+# - auto: flat เมื่อจำนวนแถวไม่เกิน MILVUS_FLAT_MAX_ROWS นอกนั้น ivf
+INDEX_PROFILES = ("auto", "flat", "ivf", "hnsw")
+BINARY_METRICS = ("HAMMING", "JACCARD")
+
+
+def ivf_nlist(row_count: int) -> int:
+    """จำนวน clusters ของ IVF ตามแนวทางของ Milvus ประมาณ 4 * sqrt(จำนวนแถว)"""
+    nlist = int(4 * math.sqrt(max(row_count, 1)))
+    return min(max(nlist, config.MILVUS_IVF_MIN_NLIST), 65536)
+
+
+def resolve_profile(profile: str, row_count: int) -> str:
+    """แปลง profile auto เป็น profile จริงตามจำนวนแถว"""
+    if profile not in INDEX_PROFILES:
+        raise ValueError(
+            f"index profile ไม่ถูกต้อง: {profile} (ต้องเป็นหนึ่งใน {', '.join(INDEX_PROFILES)})"
+        )
+    if profile == "auto":
+        return "flat" if row_count <= config.MILVUS_FLAT_MAX_ROWS else "ivf"
+    return profile
+
+
+def build_index_params(
+    profile: str,
+    row_count: int,
+    metric_type: str = "COSINE",
+    storage: str = "float"
+) -> Dict[str, Any]:
+    """
+    สร้าง index params ของ Milvus จาก profile
+    binary vectors ใช้ BIN_FLAT หรือ BIN_IVF_FLAT กับ HAMMING (profile hnsw ใช้ BIN_IVF_FLAT แทน)
+    
+    Args:
+        profile: ชื่อ profile ใน INDEX_PROFILES
+        row_count: จำนวนแถวปัจจุบันของ collection
+        metric_type: วิธีการคำนวณระยะห่าง
+        storage: รูปแบบการเก็บ vectors (float, float16 หรือ binary)
+        
+    Returns:
+        dictionary สำหรับ Collection.create_index
+    """
+    profile = resolve_profile(profile, row_count)
+    if storage == "binary":
+        if metric_type not in BINARY_METRICS:
+            metric_type = "HAMMING"
+        if profile == "flat":
+            return {"metric_type": metric_type, "index_type": "BIN_FLAT", "params": {}}
+        return {"metric_type": metric_type, "index_type": "BIN_IVF_FLAT", "params": {"nlist": ivf_nlist(row_count)}}
+    if profile == "flat":
+        index_type, params = "FLAT", {}
+    elif profile == "ivf":
+        index_type, params = "IVF_FLAT", {"nlist": ivf_nlist(row_count)}
+    else:
+        index_type, params = "HNSW", {
+            "M": config.MILVUS_HNSW_M,
+            "efConstruction": config.MILVUS_HNSW_EF_CONSTRUCTION
+        }
+    return {"metric_type": metric_type, "index_type": index_type, "params": params}
+
+
+def profile_for_collection(collection_name: str) -> str:
+    """profile ของ collection จาก MILVUS_INDEX_PROFILES หรือ MILVUS_INDEX_PROFILE"""
+    return config.MILVUS_INDEX_PROFILES.get(collection_name, config.MILVUS_INDEX_PROFILE)
+
+
+def build_search_params(
+    collection_name: str,
+    index_params: Optional[Dict[str, Any]],
+    limit: int,
+    overrides: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    สร้าง search params ตามชนิดของ index ที่ collection ใช้อยู่
+    ลำดับความสำคัญ: overrides ของคำขอ > MILVUS_SEARCH_PARAMS ของ collection > ค่าเริ่มต้นของ index
+    
+    Args:
+        collection_name: ชื่อของ collection
+        index_params: index params ของ vector field (None ถ้ายังไม่มี index)
+        limit: จำนวนผลลัพธ์ที่ต้องการ (ef ของ HNSW ต้องไม่น้อยกว่าค่านี้)
+        overrides: params ของคำขอ เช่น {"nprobe": 32} หรือ {"ef": 128}
+        
+    Returns:
+        dictionary สำหรับ Collection.search
+    """
+    index_params = index_params or {}
+    index_type = index_params.get("index_type", "FLAT")
+    if index_type == "HNSW":
+        params: Dict[str, Any] = {"ef": config.MILVUS_SEARCH_EF}
+    elif index_type.startswith("IVF") or index_type.startswith("BIN_IVF"):
+        params = {"nprobe": config.MILVUS_SEARCH_NPROBE}
+    else:
+        params = {}
+    params.update(config.MILVUS_SEARCH_PARAMS.get(collection_name, {}))
+    params.update(overrides or {})
+
+    if "ef" in params:
+        params["ef"] = max(int(params["ef"]), limit)
+    if "nprobe" in params and "nlist" in index_params.get("params", {}):
+        params["nprobe"] = min(int(params["nprobe"]), int(index_params["params"]["nlist"]))
+    return {"metric_type": index_params.get("metric_type", "COSINE"), "params": params}
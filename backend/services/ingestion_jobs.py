@@ -0,0 +1,377 @@
+# services/ingestion_jobs.py
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Union
+
+from services.ingestion_pipeline import IngestionPipeline
+from utils.ingestion_cache import IngestionCache
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionJobManager:
+    """
+    จัดการงานนำเข้าเอกสารแบบ asynchronous
+    - ไฟล์ที่อัพโหลดและสถานะของงานถูกเก็บในคิวถาวรบนดิสก์ (SQLite) จึงไม่หายเมื่อ worker restart
+    - background workers จำนวนจำกัดดึงงานจากคิวไปรัน IngestionPipeline
+    - ความคืบหน้า (จำนวนหน้า, chunks, vectors ที่เพิ่มแล้ว) ถูกบันทึกระหว่างประมวลผลเพื่อให้ client ตรวจสอบได้
+    งานที่อยู่ในสถานะ running แต่ไม่มีการอัพเดทนานเกิน lease_seconds จะถูกนำกลับมารันใหม่
+    - worker ที่กำลังรันงานต่อ lease ทุก lease_seconds / 3 ด้วย heartbeat ตลอดเวลาที่รัน
+      แม้ขั้นตอนที่ไม่มีการรายงานความคืบหน้า (เช่น อ่าน PDF ทั้งไฟล์) จะใช้เวลานาน
+    - การจองงานแต่ละครั้งได้ attempt token ใหม่ worker จะบันทึกผลและลบไฟล์ของงาน
+      เฉพาะเมื่อยังเป็นเจ้าของการจองครั้งนั้นอยู่ จึงไม่ลบไฟล์ที่ worker อื่นที่จองงานต่อกำลังอ่านอยู่
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        pipeline: IngestionPipeline,
+        jobs_dir: str,
+        workers: int = 2,
+        ingestion_cache: Optional[IngestionCache] = None,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 3,
+        poll_interval: float = 1.0
+    ):
+        """
+        Args:
+            pipeline: pipeline สำหรับนำเข้าเอกสาร
+            jobs_dir: โฟลเดอร์สำหรับเก็บฐานข้อมูลของคิวและไฟล์ที่รอประมวลผล
+            workers: จำนวน background workers
+            ingestion_cache: cache ของผลการประมวลผล (optional)
+            lease_seconds: เวลาที่งาน running จะถูกถือว่าค้างถ้าไม่มีการอัพเดท
+            max_attempts: จำนวนครั้งสูงสุดที่จะรันงานเดิม ก่อนถือว่าล้มเหลว
+            poll_interval: ระยะเวลาที่ worker รอก่อนตรวจสอบคิวอีกครั้งเมื่อไม่มีงาน
+        """
+        self.pipeline = pipeline
+        self.jobs_dir = jobs_dir
+        self.uploads_dir = os.path.join(jobs_dir, "uploads")
+        self.db_path = os.path.join(jobs_dir, "jobs.sqlite3")
+        self.worker_count = workers
+        self.ingestion_cache = ingestion_cache
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    document_id TEXT NOT NULL,
+                    file_type TEXT NOT NULL,
+                    file_name TEXT,
+                    file_path TEXT NOT NULL,
+                    content_hash TEXT,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)"
+            )
+            # คิวที่สร้างก่อนรองรับการนำเข้าแบบ incremental ไม่มีคอลัมน์นี้
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+            if "incremental" not in columns:
+                connection.execute(
+                    "ALTER TABLE jobs ADD COLUMN incremental INTEGER NOT NULL DEFAULT 0"
+                )
+            if "attempt_token" not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN attempt_token TEXT")
+
+    def start(self) -> None:
+        """เริ่ม background workers (เรียกซ้ำได้โดยไม่สร้าง worker เพิ่ม)"""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for index in range(self.worker_count):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"ingestion-job-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """หยุด workers หลังจากงานที่กำลังประมวลผลอยู่เสร็จ"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(
+        self,
+        source: Union[bytes, memoryview, str],
+        document_id: str,
+        file_type: str,
+        file_name: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        incremental: bool = False
+    ) -> str:
+        """
+        บันทึกไฟล์และเพิ่มงานเข้าคิว
+        
+        Args:
+            source: ข้อมูลของไฟล์ PDF (bytes หรือ memoryview) หรือพาธของไฟล์ชั่วคราวที่จะถูกย้ายเข้าคิว
+            document_id: ID ของเอกสาร
+            file_type: ประเภทของเอกสาร ('teacher' หรือ 'student')
+            file_name: ชื่อไฟล์ต้นฉบับ (optional)
+            content_hash: SHA-256 ของไฟล์ (optional)
+            incremental: นำเข้าเป็นเวอร์ชันใหม่ของเอกสารเดิม โดยประมวลผลเฉพาะ chunks ที่เปลี่ยน
+            
+        Returns:
+            ID ของงาน
+        """
+        IngestionPipeline.collection_for(file_type)
+        job_id = uuid.uuid4().hex
+        file_path = os.path.join(self.uploads_dir, f"{job_id}.pdf")
+        if isinstance(source, str):
+            shutil.move(source, file_path)
+        else:
+            with open(file_path, "wb") as f:
+                f.write(source)
+                f.flush()
+                os.fsync(f.fileno())
+
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                """
+                INSERT INTO jobs (id, status, document_id, file_type, file_name, file_path,
+                                  content_hash, progress, incremental, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job_id, self.QUEUED, document_id, file_type, file_name, file_path,
+                    content_hash, json.dumps(self._empty_progress()), int(incremental), now, now
+                )
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        ดึงสถานะ ความคืบหน้า และผลลัพธ์ของงาน
+        
+        Args:
+            job_id: ID ของงาน
+            
+        Returns:
+            Dictionary ของข้อมูลงาน หรือ None ถ้าไม่พบ
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "document_id": row["document_id"],
+            "file_type": row["file_type"],
+            "file_name": row["file_name"],
+            "incremental": bool(row["incremental"]),
+            "progress": json.loads(row["progress"]) if row["progress"] else self._empty_progress(),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    @staticmethod
+    def _empty_progress() -> Dict:
+        return {"pages": 0, "chunks": 0, "vectors_inserted": 0}
+
+    def _claim_next(self) -> Optional[Dict]:
+        """
+        จองงานถัดไปจากคิวแบบ atomic
+        รวมถึงงาน running ที่ค้างเกิน lease เช่น จาก worker ที่ถูก restart ระหว่างประมวลผล
+
+        Returns:
+            ข้อมูลของงานพร้อม attempt_token ของการจองครั้งนี้ หรือ None ถ้าไม่มีงาน
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # งานที่ค้างและรันครบจำนวนครั้งแล้วถือว่าล้มเหลว
+                connection.execute(
+                    """
+                    UPDATE jobs SET status = ?, error = ?, updated_at = ?
+                    WHERE status = ? AND updated_at < ? AND attempts >= ?
+                    """,
+                    (
+                        self.FAILED, "งานถูกขัดจังหวะหลายครั้งเกินกำหนด", now,
+                        self.RUNNING, now - self.lease_seconds, self.max_attempts
+                    )
+                )
+                row = connection.execute(
+                    """
+                    SELECT * FROM jobs
+                    WHERE status = ? OR (status = ? AND updated_at < ?)
+                    ORDER BY created_at
+                    LIMIT 1
+                    """,
+                    (self.QUEUED, self.RUNNING, now - self.lease_seconds)
+                ).fetchone()
+                job = None
+                if row is not None:
+                    job = {**dict(row), "attempt_token": uuid.uuid4().hex}
+                    connection.execute(
+                        """
+                        UPDATE jobs SET status = ?, attempts = attempts + 1, attempt_token = ?, updated_at = ?
+                        WHERE id = ?
+                        """,
+                        (self.RUNNING, job["attempt_token"], now, row["id"])
+                    )
+                connection.execute("COMMIT")
+                return job
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _update(self, job_id: str, attempt_token: Optional[str] = None, **fields) -> bool:
+        """
+        อัพเดทงานและต่อ lease (updated_at)
+        ถ้าระบุ attempt_token จะอัพเดทเฉพาะเมื่องานยังเป็นของการจองครั้งนั้น
+
+        Returns:
+            True ถ้างานถูกอัพเดท
+        """
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        condition, params = "id = ?", [job_id]
+        if attempt_token is not None:
+            condition += " AND attempt_token = ?"
+            params.append(attempt_token)
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE {condition}",
+                (*fields.values(), *params)
+            )
+            return cursor.rowcount > 0
+
+    def _heartbeat(self, job_id: str, attempt_token: str, done: threading.Event) -> None:
+        """ต่อ lease ของงานทุก lease_seconds / 3 จนกว่างานจะเสร็จหรือถูก worker อื่นจองไปแล้ว"""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                if not self._update(job_id, attempt_token):
+                    return
+            except sqlite3.Error:
+                # ฐานข้อมูลถูก lock ชั่วคราว ลองใหม่ในรอบถัดไปซึ่งยังอยู่ภายใน lease
+                continue
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            job = self._claim_next()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job: Dict) -> None:
+        job_id = job["id"]
+        attempt_token = job["attempt_token"]
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(job_id, attempt_token, done),
+            name=f"ingestion-job-heartbeat-{job_id[:8]}",
+            daemon=True
+        )
+        heartbeat.start()
+        owned = True
+
+        def on_progress(stats: Dict) -> None:
+            self._update(job_id, attempt_token, progress=json.dumps({
+                "pages": stats["pages"],
+                "chunks": stats["chunks"],
+                "vectors_inserted": stats["vectors_inserted"]
+            }))
+
+        try:
+            if job["incremental"]:
+                result = asyncio.run(self.pipeline.reingest(
+                    job["file_path"],
+                    job["document_id"],
+                    job["file_type"],
+                    on_progress=on_progress
+                ))
+            else:
+                result = asyncio.run(self.pipeline.ingest(
+                    job["file_path"],
+                    job["document_id"],
+                    job["file_type"],
+                    ingestion_cache=self.ingestion_cache,
+                    content_hash=job["content_hash"],
+                    on_progress=on_progress
+                ))
+            result.pop("ids", None)
+            owned = self._update(
+                job_id,
+                attempt_token,
+                status=self.COMPLETED,
+                progress=json.dumps({
+                    "pages": result["page_count"],
+                    "chunks": result["chunk_count"],
+                    "vectors_inserted": result["vector_count"]
+                }),
+                result=json.dumps(result)
+            )
+        except Exception as e:
+            logger.exception("งานนำเข้าเอกสาร %s ล้มเหลว", job_id)
+            owned = self._update(
+                job_id,
+                attempt_token,
+                status=self.FAILED,
+                error=f"{str(e)}\n{traceback.format_exc()}"
+            )
+        finally:
+            done.set()
+            heartbeat.join()
+            # งานถูก worker อื่นจองต่อไปแล้ว ไฟล์ยังถูกใช้อยู่และผลลัพธ์เป็นของการจองครั้งนั้น
+            if not owned:
+                logger.warning("งานนำเข้าเอกสาร %s ถูก worker อื่นจองต่อแล้ว ไม่บันทึกผลของการรันครั้งนี้", job_id)
+            else:
+                try:
+                    os.unlink(job["file_path"])
+                except OSError:
+                    pass
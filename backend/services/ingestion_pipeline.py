@@ -0,0 +1,702 @@
+# services/ingestion_pipeline.py
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import config
+from services.keyword_index import KeywordIndex
+from services.milvus_service import MilvusService, quote_string
+from services.pdf_service import PDFProcessingService, PdfSource
+from utils.ingestion_cache import IngestionCache
+
+# collection ปลายทางของเอกสารแต่ละประเภท
+COLLECTIONS = {
+    "teacher": "teacher_documents",
+    "student": "student_documents"
+}
+
+# ค่าที่ใช้ส่งสัญญาณว่า stage ก่อนหน้าทำงานเสร็จแล้ว
+_END = None
+
+# ระยะเวลาสูงสุดที่ executor thread รอ lock ของเอกสารในแต่ละรอบ
+_LOCK_POLL_SECONDS = 0.5
+
+
+def chunk_hash(text: str) -> str:
+    """SHA-256 ของข้อความใน chunk ใช้เปรียบเทียบ chunks ระหว่างเวอร์ชันของเอกสาร"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def index_chunks(chunks: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    ใส่ลำดับในเอกสาร (chunk_index) ลำดับภายในหน้า (page_chunk_index) และ hash ของข้อความให้ chunks
+    ตามลำดับที่ได้จากการแบ่ง ลำดับภายในหน้าไม่เปลี่ยนเมื่อแก้ไขหน้าอื่น จึงใช้เทียบ chunks ระหว่างเวอร์ชันได้
+    """
+    page, page_chunk_index = None, 0
+    for index, chunk in enumerate(chunks):
+        page_chunk_index = page_chunk_index + 1 if index and chunk["page"] == page else 0
+        page = chunk["page"]
+        chunk["chunk_index"] = index
+        chunk["page_chunk_index"] = page_chunk_index
+        chunk["hash"] = chunk_hash(chunk["text"])
+        yield chunk
+
+
+class IngestionPipeline:
+    """
+    Pipeline สำหรับนำเข้าเอกสาร PDF ลง Milvus แบบเป็นขั้นตอนที่ทำงานซ้อนกัน
+    1. extract + chunk: อ่าน PDF และแบ่ง chunks ใน background thread
+    2. embed: สร้าง embeddings ทีละ batch ผ่าน embedding worker
+    3. insert: เพิ่ม vectors ลง collection ของ Milvus (และข้อความลง keyword index ถ้ามี)
+    แต่ละขั้นตอนเชื่อมกันด้วยคิวที่จำกัดขนาด ทำให้ขั้นตอนที่เร็วกว่าต้องรอ (backpressure)
+    และหน่วยความจำที่ใช้ไม่ขึ้นกับขนาดของเอกสาร
+    """
+
+    def __init__(
+        self,
+        pdf_service: PDFProcessingService,
+        milvus_service: MilvusService,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        keyword_index: Optional[KeywordIndex] = None
+    ):
+        """
+        Args:
+            pdf_service: service สำหรับอ่าน PDF, แบ่ง chunks และสร้าง embeddings
+            milvus_service: service สำหรับเพิ่ม vectors ลง Milvus
+            queue_size: จำนวน batch สูงสุดที่ค้างอยู่ระหว่างแต่ละขั้นตอน
+            batch_size: จำนวน chunks ต่อ batch
+            keyword_index: BM25 index ที่เก็บข้อความของ chunks คู่กับ vectors (optional)
+        """
+        self.pdf_service = pdf_service
+        self.milvus_service = milvus_service
+        self.keyword_index = keyword_index
+        self.queue_size = queue_size or config.INGESTION_QUEUE_SIZE
+        self.batch_size = batch_size or config.PDF_EMBEDDING_BATCH_SIZE
+
+    # lock ต่อเอกสาร ป้องกันการนำเข้าเอกสารเดียวกันพร้อมกันจากหลาย requests หรือ workers
+    _document_locks: Dict[Tuple[str, str], threading.Lock] = {}
+    _document_locks_guard = threading.Lock()
+
+    @classmethod
+    def _document_lock(cls, collection_name: str, document_id: str) -> threading.Lock:
+        with cls._document_locks_guard:
+            return cls._document_locks.setdefault((collection_name, document_id), threading.Lock())
+
+    @asynccontextmanager
+    async def _document_locked(self, collection_name: str, document_id: str) -> AsyncIterator[None]:
+        """
+        ถือ lock ของเอกสารตลอด block (ใช้ threading.Lock เพราะ job workers แต่ละตัวมี event loop ของตัวเอง)
+        รอ lock ใน executor ครั้งละไม่เกิน _LOCK_POLL_SECONDS ถ้า coroutine ถูกยกเลิกระหว่างรอ
+        lock ที่ executor thread ได้มาภายหลังจะถูกปล่อยคืนทันที
+        """
+        lock = self._document_lock(collection_name, document_id)
+        loop = asyncio.get_running_loop()
+        acquired = False
+        while not acquired:
+            pending = loop.run_in_executor(None, lock.acquire, True, _LOCK_POLL_SECONDS)
+            try:
+                acquired = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                pending.add_done_callback(
+                    lambda f: lock.release() if not f.cancelled() and f.exception() is None and f.result() else None
+                )
+                raise
+        try:
+            yield
+        finally:
+            lock.release()
+
+    @staticmethod
+    def collection_for(file_type: str) -> str:
+        """เลือก collection ตามประเภทของเอกสาร ('teacher' หรือ 'student')"""
+        if file_type not in COLLECTIONS:
+            raise ValueError(f"file_type ต้องเป็น 'teacher' หรือ 'student' ไม่ใช่ '{file_type}'")
+        return COLLECTIONS[file_type]
+
+    @staticmethod
+    def _new_stats() -> Dict:
+        return {
+            "pages": 0,
+            "chunks": 0,
+            "vectors_inserted": 0,
+            "timings": {
+                "extract": 0.0,
+                "chunk": 0.0,
+                "embed": 0.0,
+                "insert": 0.0,
+                "total": 0.0
+            }
+        }
+
+    async def run(
+        self,
+        file_path: PdfSource,
+        document_id: str,
+        file_type: str,
+        collect_result: bool = False,
+        on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        นำเข้าเอกสาร PDF ลง Milvus
+
+        Args:
+            file_path: พาธของไฟล์ PDF หรือข้อมูลของไฟล์ (bytes)
+            document_id: ID ของเอกสาร ใช้เป็น file_id ใน Milvus
+            file_type: ประเภทของเอกสาร ('teacher' หรือ 'student')
+            collect_result: เก็บ chunks และ embeddings ทั้งหมดไว้ในผลลัพธ์ด้วย (เช่น เพื่อบันทึกลง cache)
+            on_progress: callback ที่ถูกเรียกพร้อมสถิติทุกครั้งที่มีความคืบหน้า
+
+        Returns:
+            Dictionary ที่มี collection, จำนวนหน้า/chunks/vectors, ids และเวลาที่ใช้ในแต่ละขั้นตอน
+        """
+        collection_name = self.collection_for(file_type)
+        await self.milvus_service.ensure_collection(
+            collection_name, self.pdf_service.embedding_dimension
+        )
+
+        stats = self._new_stats()
+        collected = self._new_collected() if collect_result else None
+        ids: List[int] = []
+        started = time.perf_counter()
+
+        loop = asyncio.get_running_loop()
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        producer = loop.run_in_executor(
+            None, self._produce_chunks, file_path, chunk_queue, loop, stop, stats, collected
+        )
+        embed_task = asyncio.create_task(self._embed_stage(chunk_queue, embed_queue, stats))
+        insert_task = asyncio.create_task(self._insert_stage(
+            embed_queue, collection_name, document_id, stats, ids, collected, on_progress
+        ))
+
+        try:
+            await asyncio.gather(producer, embed_task, insert_task)
+        except BaseException:
+            stop.set()
+            embed_task.cancel()
+            insert_task.cancel()
+            # ระบายคิวเพื่อให้ thread ที่อ่าน PDF ไม่ค้างอยู่ที่คิวที่เต็ม
+            while not producer.done():
+                while not chunk_queue.empty():
+                    chunk_queue.get_nowait()
+                await asyncio.sleep(0.01)
+            raise
+
+        stats["timings"]["total"] = time.perf_counter() - started
+        return self._build_result(collection_name, document_id, stats, ids, collected)
+
+    async def ingest(
+        self,
+        source: PdfSource,
+        document_id: str,
+        file_type: str,
+        ingestion_cache: Optional[IngestionCache] = None,
+        content_hash: Optional[str] = None,
+        on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        นำเข้าเอกสารโดยใช้ ingestion cache ถ้ามี: ถ้าเคยประมวลผลไฟล์ที่มีเนื้อหาเดียวกันแล้ว
+        จะเพิ่ม vectors ที่เก็บไว้ลง Milvus ทันที มิฉะนั้นจะรัน pipeline เต็มและบันทึกผลลง cache
+        ถ้า document_id มี chunks อยู่แล้ว chunks เดิมจะถูกลบหลังจากเพิ่มชุดใหม่สำเร็จ (แทนที่ทั้งเอกสาร)
+
+        Args:
+            source: พาธของไฟล์ PDF หรือข้อมูลของไฟล์ (bytes)
+            document_id: ID ของเอกสาร
+            file_type: ประเภทของเอกสาร ('teacher' หรือ 'student')
+            ingestion_cache: cache ของผลการประมวลผล (optional)
+            content_hash: SHA-256 ของไฟล์ (คำนวณให้อัตโนมัติถ้าไม่ระบุ)
+            on_progress: callback ที่ถูกเรียกพร้อมสถิติทุกครั้งที่มีความคืบหน้า
+
+        Returns:
+            ผลลัพธ์ในรูปแบบเดียวกับ run พร้อม content_hash, cache_hit และจำนวน chunks เดิมที่ถูกแทนที่
+        """
+        loop = asyncio.get_running_loop()
+        if content_hash is None:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                content_hash = IngestionCache.hash_bytes(source)
+            elif ingestion_cache is not None:
+                content_hash = await loop.run_in_executor(None, IngestionCache.hash_file, source)
+
+        # การอ่าน cache เป็น disk I/O จึงรันใน executor เพื่อไม่ให้ block event loop
+        cached = await loop.run_in_executor(None, ingestion_cache.get, content_hash) if ingestion_cache else None
+        collection_name = self.collection_for(file_type)
+        async with self._document_locked(collection_name, document_id):
+            if cached is not None:
+                result = await self.insert_precomputed(cached, document_id, file_type)
+            else:
+                result = await self.run(
+                    source,
+                    document_id,
+                    file_type,
+                    collect_result=ingestion_cache is not None,
+                    on_progress=on_progress
+                )
+
+                if ingestion_cache is not None:
+                    await loop.run_in_executor(None, ingestion_cache.put, content_hash, result.pop("processed"))
+
+            # ลบ chunks ของการนำเข้าครั้งก่อน (หรือที่ค้างจากการนำเข้าที่ล้มเหลว) หลังจากเพิ่มชุดใหม่สำเร็จแล้ว
+            result["replaced_count"] = await self._delete_previous(collection_name, document_id, result["ids"])
+
+        result["content_hash"] = content_hash
+        result["cache_hit"] = cached is not None
+        return result
+
+    async def insert_precomputed(
+        self,
+        result: Dict,
+        document_id: str,
+        file_type: str
+    ) -> Dict:
+        """
+        เพิ่ม chunks และ embeddings ที่ประมวลผลไว้แล้ว (เช่น จาก ingestion cache) ลง Milvus โดยข้ามการอ่านและสร้าง embeddings
+
+        Args:
+            result: Dictionary ที่มี chunks, chunk_pages, chunk_offsets และ embeddings
+            document_id: ID ของเอกสาร
+            file_type: ประเภทของเอกสาร
+
+        Returns:
+            ผลลัพธ์ในรูปแบบเดียวกับ run
+        """
+        collection_name = self.collection_for(file_type)
+        stats = self._new_stats()
+        stats["pages"] = len(result.get("page_offsets", []))
+        stats["chunks"] = len(result["chunks"])
+        ids: List[int] = []
+        # เอกสารที่ไม่มีข้อความไม่มีอะไรให้เพิ่ม (cache รุ่นเก่าเก็บ embeddings ของเอกสารว่างเป็นขนาด 0 x 0)
+        if not result["chunks"]:
+            return self._build_result(collection_name, document_id, stats, ids, None)
+
+        embeddings = np.asarray(result["embeddings"], dtype=np.float32)
+        await self.milvus_service.ensure_collection(collection_name, embeddings.shape[1])
+        started = time.perf_counter()
+
+        pages = result.get("chunk_pages") or [None] * len(result["chunks"])
+        offsets = result.get("chunk_offsets") or [(None, None)] * len(result["chunks"])
+        chunks = list(index_chunks(
+            {"text": text, "page": page, "start": offset[0], "end": offset[1]}
+            for text, page, offset in zip(result["chunks"], pages, offsets)
+        ))
+        for start in range(0, len(chunks), self.batch_size):
+            stop = start + self.batch_size
+            ids.extend(await self._insert_batch(
+                collection_name, document_id, chunks[start:stop], embeddings[start:stop], start, stats
+            ))
+
+        stats["timings"]["total"] = time.perf_counter() - started
+        return self._build_result(collection_name, document_id, stats, ids, None)
+
+    async def reingest(
+        self,
+        source: PdfSource,
+        document_id: str,
+        file_type: str,
+        on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        นำเข้าเอกสารเวอร์ชันใหม่แบบ incremental โดยเทียบกับ chunks ที่เก็บไว้แล้วของ document_id เดียวกัน
+        - chunk ที่ข้อความเหมือนเดิมและอยู่หน้าเดิม: ไม่แตะต้อง แม้ตำแหน่งภายในหน้าจะเลื่อนไป
+        - chunk ที่ข้อความเหมือนเดิมแต่ย้ายไปหน้าอื่น: เพิ่มใหม่ด้วย vector เดิมจาก Milvus (ไม่ต้องสร้าง embeddings)
+          เพื่อให้หมายเลขหน้าใน metadata ถูกต้อง
+        - chunk ที่ข้อความใหม่: สร้าง embeddings และเพิ่มลง Milvus
+        - chunk เดิมที่ไม่มีในเวอร์ชันใหม่: ลบออก
+        chunks ถูกแบ่งแบบไม่ต่อข้ามหน้า การแก้ไขหน้าเดียวจึงเพิ่มและลบเฉพาะ chunks ของหน้านั้น
+        vectors ใหม่ถูกเพิ่มก่อนลบของเดิม ถ้าล้มเหลวกลางทางเอกสารจะมี chunks ซ้ำแทนที่จะขาดหาย
+        และการนำเข้าครั้งถัดไปจะลบส่วนที่ซ้ำออกเอง
+
+        Args:
+            source: พาธของไฟล์ PDF หรือข้อมูลของไฟล์ (bytes)
+            document_id: ID ของเอกสาร
+            file_type: ประเภทของเอกสาร ('teacher' หรือ 'student')
+            on_progress: callback ที่ถูกเรียกพร้อมสถิติทุกครั้งที่มีความคืบหน้า
+
+        Returns:
+            ผลลัพธ์ในรูปแบบเดียวกับ run พร้อม version และจำนวน chunks ที่ไม่เปลี่ยน ย้ายตำแหน่ง เพิ่ม และลบ
+        """
+        collection_name = self.collection_for(file_type)
+        await self.milvus_service.ensure_collection(
+            collection_name, self.pdf_service.embedding_dimension
+        )
+
+        stats = self._new_stats()
+        stats.update({"unchanged": 0, "relocated": 0, "embedded": 0, "deleted": 0})
+        stats["timings"]["diff"] = 0.0
+        stats["timings"]["delete"] = 0.0
+        ids: List[int] = []
+        started = time.perf_counter()
+
+        loop = asyncio.get_running_loop()
+        async with self._document_locked(collection_name, document_id):
+            chunks = await loop.run_in_executor(None, self._chunk_document, source, stats)
+            stats["chunks"] = len(chunks)
+
+            diff_started = time.perf_counter()
+            stored = await self.milvus_service.query_entities(
+                collection_name,
+                f"file_id == {quote_string(document_id)}",
+                output_fields=["metadata"]
+            )
+            unchanged, relocated, new, stale_ids = self._diff_chunks(stored, chunks)
+            version = max(
+                ((entity.get("metadata") or {}).get("version", 0) for entity in stored),
+                default=0
+            ) + 1
+            stats["timings"]["diff"] += time.perf_counter() - diff_started
+            stats["unchanged"] = len(unchanged)
+            if on_progress is not None:
+                on_progress(stats)
+
+            # chunk ที่ย้ายตำแหน่ง: ใช้ vector เดิมที่เก็บไว้
+            for start in range(0, len(relocated), self.batch_size):
+                batch = relocated[start:start + self.batch_size]
+                insert_started = time.perf_counter()
+                embeddings = await self.milvus_service.fetch_vectors(
+                    collection_name, [stored_id for _, stored_id in batch]
+                )
+                stats["timings"]["insert"] += time.perf_counter() - insert_started
+                ids.extend(await self._insert_batch(
+                    collection_name, document_id, [chunk for chunk, _ in batch],
+                    embeddings, 0, stats, version
+                ))
+                stale_ids.extend(stored_id for _, stored_id in batch)
+                stats["relocated"] += len(batch)
+                if on_progress is not None:
+                    on_progress(stats)
+
+            # chunk ใหม่: สร้าง embeddings เฉพาะส่วนนี้
+            for start in range(0, len(new), self.batch_size):
+                batch = new[start:start + self.batch_size]
+                embed_started = time.perf_counter()
+                embeddings = await self.pdf_service.create_embedding_matrix(
+                    [chunk["text"] for chunk in batch]
+                )
+                stats["timings"]["embed"] += time.perf_counter() - embed_started
+                ids.extend(await self._insert_batch(
+                    collection_name, document_id, batch, embeddings, 0, stats, version
+                ))
+                stats["embedded"] += len(batch)
+                if on_progress is not None:
+                    on_progress(stats)
+
+            delete_started = time.perf_counter()
+            await self._delete_chunks(collection_name, stale_ids)
+            stats["deleted"] = len(stale_ids) - stats["relocated"]
+            stats["timings"]["delete"] += time.perf_counter() - delete_started
+
+        stats["timings"]["total"] = time.perf_counter() - started
+        result = self._build_result(collection_name, document_id, stats, ids, None)
+        result.update({
+            "version": version,
+            "unchanged_count": stats["unchanged"],
+            "relocated_count": stats["relocated"],
+            "embedded_count": stats["embedded"],
+            "deleted_count": stats["deleted"]
+        })
+        return result
+
+    async def _delete_previous(self, collection_name: str, document_id: str, ids: List[int]) -> int:
+        """
+        ลบ chunks ของ document_id ที่ไม่ได้อยู่ใน ids ของการนำเข้าครั้งนี้
+        ทำให้การนำเข้าเอกสารเดิมซ้ำ (เช่น retry ของ job หรือการอัปโหลดซ้ำ) เหลือ chunks เพียงชุดเดียว
+
+        Returns:
+            จำนวน chunks ที่ลบ
+        """
+        current = set(ids)
+        stored = await self.milvus_service.query_entities(
+            collection_name,
+            f"file_id == {quote_string(document_id)}",
+            output_fields=["id"]
+        )
+        stale_ids = [entity["id"] for entity in stored if entity["id"] not in current]
+        await self._delete_chunks(collection_name, stale_ids)
+        return len(stale_ids)
+
+    async def _delete_chunks(self, collection_name: str, ids: List[int]) -> None:
+        """ลบ chunks ออกจาก Milvus (รวม vectors เต็มความละเอียด) และ keyword index"""
+        if not ids:
+            return
+        await self.milvus_service.delete_entities(collection_name, ids)
+        if self.keyword_index is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.keyword_index.delete, collection_name, ids
+            )
+
+    def _chunk_document(self, source: PdfSource, stats: Dict) -> List[Dict]:
+        """อ่านและแบ่งเอกสารทั้งหมดเป็น chunks ที่ไม่ต่อข้ามหน้า (รันใน background thread)"""
+        timings = stats["timings"]
+        pages = []
+        started = time.perf_counter()
+        for page in self.pdf_service.iter_pdf_pages(source):
+            pages.append(page)
+        timings["extract"] += time.perf_counter() - started
+        stats["pages"] = len(pages)
+
+        started = time.perf_counter()
+        chunks = list(index_chunks(self.pdf_service.iter_chunks(pages, page_aligned=True)))
+        timings["chunk"] += time.perf_counter() - started
+        return chunks
+
+    @staticmethod
+    def _diff_chunks(
+        stored: List[Dict],
+        chunks: List[Dict]
+    ) -> Tuple[List[Dict], List[Tuple[Dict, int]], List[Dict], List[int]]:
+        """
+        เทียบ chunks ใหม่กับ entities ที่เก็บไว้แบบ multiset ตาม hash ของข้อความ
+        หน้าและลำดับภายในหน้าใช้เพียงเลือกคู่เมื่อข้อความเดียวกันมีหลาย chunks
+        การแก้ไขที่ทำให้ข้อความยาวขึ้นหรือสั้นลงจึงไม่ทำให้ chunks อื่นถูกนับว่าเปลี่ยน
+
+        Returns:
+            (chunks ที่ไม่เปลี่ยน, (chunk, id เดิม) ที่ย้ายไปหน้าอื่น, chunks ใหม่, ids ที่ต้องลบ)
+        """
+        by_hash: Dict[str, List[Dict]] = {}
+        stale_ids: List[int] = []
+        for entity in stored:
+            metadata = entity.get("metadata") or {}
+            if "chunk_hash" in metadata:
+                by_hash.setdefault(metadata["chunk_hash"], []).append(entity)
+            else:
+                # entity ที่นำเข้าก่อนมีการเก็บ hash ไม่สามารถเทียบได้
+                stale_ids.append(entity["id"])
+
+        def take(chunk: Dict, same_position: Callable[[Dict, Dict], bool]) -> Optional[Dict]:
+            candidates = by_hash.get(chunk["hash"], [])
+            match = next(
+                (i for i, entity in enumerate(candidates) if same_position(entity["metadata"], chunk)),
+                None
+            )
+            return None if match is None else candidates.pop(match)
+
+        def same_page_index(metadata: Dict, chunk: Dict) -> bool:
+            return (
+                metadata.get("page") == chunk["page"]
+                and metadata.get("page_chunk_index") == chunk["page_chunk_index"]
+            )
+
+        def same_page(metadata: Dict, chunk: Dict) -> bool:
+            return metadata.get("page") == chunk["page"]
+
+        # จับคู่ตาม hash โดยเลือก entity ที่อยู่ตำแหน่งเดิมในหน้าเดิมก่อน แล้วจึงหน้าเดิม และสุดท้ายหน้าใดก็ได้
+        unchanged: List[Dict] = []
+        relocated: List[Tuple[Dict, int]] = []
+        new: List[Dict] = []
+        remaining = chunks
+        for same_position in (same_page_index, same_page):
+            unmatched = []
+            for chunk in remaining:
+                if take(chunk, same_position) is None:
+                    unmatched.append(chunk)
+                else:
+                    unchanged.append(chunk)
+            remaining = unmatched
+        for chunk in remaining:
+            entity = take(chunk, lambda metadata, chunk: True)
+            if entity is None:
+                new.append(chunk)
+            else:
+                relocated.append((chunk, entity["id"]))
+
+        for candidates in by_hash.values():
+            stale_ids.extend(entity["id"] for entity in candidates)
+
+        return unchanged, relocated, new, stale_ids
+
+    def _produce_chunks(
+        self,
+        file_path: PdfSource,
+        chunk_queue: asyncio.Queue,
+        loop: asyncio.AbstractEventLoop,
+        stop: threading.Event,
+        stats: Dict,
+        collected: Optional[Dict]
+    ) -> None:
+        """stage 1 (background thread): อ่านหน้า PDF แบ่ง chunks และส่งต่อทีละ batch"""
+        timings = stats["timings"]
+        page_offset = 0
+
+        def timed_pages() -> Iterator[Tuple[int, str]]:
+            nonlocal page_offset
+            pages = iter(self.pdf_service.iter_pdf_pages(file_path))
+            while True:
+                started = time.perf_counter()
+                page = next(pages, None)
+                timings["extract"] += time.perf_counter() - started
+                if page is None:
+                    return
+                stats["pages"] += 1
+                if collected is not None:
+                    collected["page_offsets"].append(page_offset)
+                    page_offset += len(page[1]) + 1
+                yield page
+
+        def put(item) -> None:
+            asyncio.run_coroutine_threadsafe(chunk_queue.put(item), loop).result()
+
+        batch: List[Dict] = []
+        # แบ่งแบบไม่ต่อข้ามหน้าเหมือน reingest เพื่อให้เวอร์ชันถัดไปเทียบ chunks ทีละหน้าได้
+        chunks = index_chunks(self.pdf_service.iter_chunks(timed_pages(), page_aligned=True))
+        while not stop.is_set():
+            extract_before = timings["extract"]
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            elapsed = time.perf_counter() - started
+            if chunk is None:
+                break
+            # เวลาที่ได้จาก next() รวมเวลาอ่าน PDF ไว้ด้วย จึงหักส่วนนั้นออก
+            timings["chunk"] += elapsed - (timings["extract"] - extract_before)
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                put(batch)
+                batch = []
+
+        if batch and not stop.is_set():
+            put(batch)
+        put(_END)
+
+    async def _embed_stage(
+        self,
+        chunk_queue: asyncio.Queue,
+        embed_queue: asyncio.Queue,
+        stats: Dict
+    ) -> None:
+        """stage 2: สร้าง embeddings ของแต่ละ batch"""
+        while True:
+            batch = await chunk_queue.get()
+            if batch is _END:
+                await embed_queue.put(_END)
+                return
+
+            started = time.perf_counter()
+            embeddings = await self.pdf_service.create_embedding_matrix(
+                [chunk["text"] for chunk in batch]
+            )
+            stats["timings"]["embed"] += time.perf_counter() - started
+            stats["chunks"] += len(batch)
+            await embed_queue.put((batch, embeddings))
+
+    async def _insert_stage(
+        self,
+        embed_queue: asyncio.Queue,
+        collection_name: str,
+        document_id: str,
+        stats: Dict,
+        ids: List[int],
+        collected: Optional[Dict],
+        on_progress: Optional[Callable[[Dict], None]]
+    ) -> None:
+        """stage 3: เพิ่ม vectors ลง Milvus ทีละ batch"""
+        chunk_index = 0
+        while True:
+            item = await embed_queue.get()
+            if item is _END:
+                return
+
+            batch, embeddings = item
+            ids.extend(await self._insert_batch(
+                collection_name, document_id, batch, embeddings, chunk_index, stats
+            ))
+            chunk_index += len(batch)
+
+            if collected is not None:
+                collected["chunks"].extend(chunk["text"] for chunk in batch)
+                collected["chunk_pages"].extend(chunk["page"] for chunk in batch)
+                collected["chunk_offsets"].extend((chunk["start"], chunk["end"]) for chunk in batch)
+                collected["embeddings"].append(embeddings)
+
+            if on_progress is not None:
+                on_progress(stats)
+
+    async def _insert_batch(
+        self,
+        collection_name: str,
+        document_id: str,
+        batch: List[Dict],
+        embeddings: np.ndarray,
+        first_index: int,
+        stats: Dict,
+        version: int = 1
+    ) -> List[int]:
+        """
+        เพิ่ม chunks หนึ่ง batch ลง Milvus พร้อม metadata ของตำแหน่งในเอกสาร
+        hash ของข้อความและเวอร์ชันของเอกสารถูกเก็บไว้สำหรับการนำเข้าเวอร์ชันถัดไปแบบ incremental
+        chunk ที่มีค่า "chunk_index" อยู่แล้วจะใช้ค่านั้นแทนการนับจาก first_index
+        """
+        started = time.perf_counter()
+        batch_ids = await self.milvus_service.insert_vectors(
+            collection_name=collection_name,
+            file_ids=[document_id] * len(batch),
+            contents=[chunk["text"] for chunk in batch],
+            vectors=embeddings,
+            metadata_list=[
+                {
+                    "page": chunk["page"],
+                    "start": chunk["start"],
+                    "end": chunk["end"],
+                    "chunk_index": chunk.get("chunk_index", first_index + i),
+                    "page_chunk_index": chunk.get("page_chunk_index"),
+                    "chunk_hash": chunk.get("hash") or chunk_hash(chunk["text"]),
+                    "version": version
+                }
+                for i, chunk in enumerate(batch)
+            ]
+        )
+        if self.keyword_index is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.keyword_index.add,
+                collection_name,
+                [document_id] * len(batch),
+                batch_ids,
+                [chunk["text"] for chunk in batch]
+            )
+        stats["timings"]["insert"] += time.perf_counter() - started
+        stats["vectors_inserted"] += len(batch_ids)
+        return list(batch_ids)
+
+    @staticmethod
+    def _new_collected() -> Dict:
+        return {
+            "chunks": [],
+            "chunk_pages": [],
+            "chunk_offsets": [],
+            "page_offsets": [],
+            "embeddings": []
+        }
+
+    def _build_result(
+        self,
+        collection_name: str,
+        document_id: str,
+        stats: Dict,
+        ids: List[int],
+        collected: Optional[Dict]
+    ) -> Dict:
+        result = {
+            "collection": collection_name,
+            "document_id": document_id,
+            "page_count": stats["pages"],
+            "chunk_count": stats["chunks"],
+            "vector_count": stats["vectors_inserted"],
+            "ids": ids,
+            "timings": {stage: round(seconds, 4) for stage, seconds in stats["timings"].items()}
+        }
+        if collected is not None:
+            embeddings = collected.pop("embeddings")
+            result["processed"] = {
+                **collected,
+                "embeddings": np.concatenate(embeddings) if embeddings else np.empty(
+                    (0, self.pdf_service.embedding_dimension), dtype=np.float32
+                )
+            }
+        return result
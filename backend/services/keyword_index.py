@@ -0,0 +1,169 @@
+# services/keyword_index.py
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# ภาษาไทยไม่เว้นวรรคระหว่างคำ จึงแบ่งเป็น bigram ของตัวอักษร ส่วนภาษาอื่นแบ่งตามคำ
+_THAI_RUN = re.compile(r"[\u0E00-\u0E7F]+")
+_TOKEN_RUN = re.compile(r"[\u0E00-\u0E7F]+|[^\W\u0E00-\u0E7F]+")
+
+
+def keyword_terms(text: str) -> List[str]:
+    """
+    แปลงข้อความเป็น terms สำหรับ BM25
+    คำภาษาอังกฤษ ตัวเลข และสัญลักษณ์ที่เป็นตัวอักษรถูกแปลงเป็นตัวพิมพ์เล็ก
+    ข้อความภาษาไทยแต่ละช่วงถูกแบ่งเป็น bigram ของตัวอักษร เช่น "เซลล์" -> เซ ซล ลล ล์
+    """
+    terms: List[str] = []
+    for run in _TOKEN_RUN.findall(text.lower()):
+        if _THAI_RUN.fullmatch(run) and len(run) > 1:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+class KeywordIndex:
+    """
+    inverted index สำหรับค้นหาด้วย BM25 เก็บคู่กับ vectors ใน Milvus
+    ใช้ SQLite FTS5 หนึ่งตารางต่อ collection โดย rowid คือ primary key ของ chunk ใน Milvus
+    จึงลบ chunks ตาม ids เดียวกับที่ลบจาก Milvus ได้
+    terms ถูกแบ่งด้วย keyword_terms ก่อนเก็บ และใช้ tokenizer แบบ ascii ของ FTS5
+    ซึ่งถือว่าอักขระที่ไม่ใช่ ASCII เป็นส่วนหนึ่งของ token ทำให้ bigram ภาษาไทยไม่ถูกแยกอีก
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: ไฟล์ฐานข้อมูล SQLite ของ index
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._tables: set = set()
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _table(collection_name: str) -> str:
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", collection_name):
+            raise ValueError(f"ชื่อ collection ไม่ถูกต้อง: {collection_name}")
+        return f"fts_{collection_name}"
+
+    def _ensure_table(self, connection: sqlite3.Connection, collection_name: str) -> str:
+        table = self._table(collection_name)
+        if table not in self._tables:
+            connection.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+                "USING fts5(file_id UNINDEXED, content UNINDEXED, terms, tokenize='ascii')"
+            )
+            self._tables.add(table)
+        return table
+
+    def add(self, collection_name: str, file_ids: List[str], ids: List[int], contents: List[str]) -> None:
+        """
+        เพิ่ม chunks เข้า index
+
+        Args:
+            collection_name: ชื่อของ collection ใน Milvus
+            file_ids: file ID ของแต่ละ chunk
+            ids: primary keys ของ chunks ใน Milvus
+            contents: ข้อความของแต่ละ chunk
+        """
+        with self._connect() as connection:
+            table = self._ensure_table(connection, collection_name)
+            connection.execute("BEGIN")
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {table} (rowid, file_id, content, terms) VALUES (?, ?, ?, ?)",
+                [
+                    (int(chunk_id), file_id, content, " ".join(keyword_terms(content)))
+                    for file_id, chunk_id, content in zip(file_ids, ids, contents)
+                ]
+            )
+            connection.execute("COMMIT")
+
+    def delete(self, collection_name: str, ids: List[int]) -> None:
+        """ลบ chunks ตาม primary keys ใน Milvus"""
+        if not ids:
+            return
+        with self._connect() as connection:
+            table = self._ensure_table(connection, collection_name)
+            connection.execute("BEGIN")
+            connection.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(int(i),) for i in ids])
+            connection.execute("COMMIT")
+
+    def rename(self, collection_name: str, new_name: str) -> None:
+        """ย้าย index ไปอยู่กับ collection ที่เปลี่ยนชื่อ (แทนที่ index เดิมของชื่อใหม่)"""
+        table, new_table = self._table(collection_name), self._table(new_name)
+        with self._connect() as connection:
+            connection.execute(f"DROP TABLE IF EXISTS {new_table}")
+            self._ensure_table(connection, collection_name)
+            connection.execute(f"ALTER TABLE {table} RENAME TO {new_table}")
+        self._tables.discard(table)
+        self._tables.add(new_table)
+
+    def drop(self, collection_name: str) -> None:
+        """ลบ index ทั้งหมดของ collection"""
+        table = self._table(collection_name)
+        with self._connect() as connection:
+            connection.execute(f"DROP TABLE IF EXISTS {table}")
+        self._tables.discard(table)
+
+    def search_batch(
+        self,
+        collection_name: str,
+        queries: List[str],
+        limit: int = 10,
+        file_ids: Optional[List[str]] = None
+    ) -> List[List[Dict]]:
+        """
+        ค้นหาหลาย queries ด้วย BM25
+
+        Args:
+            collection_name: ชื่อของ collection ใน Milvus
+            queries: รายการข้อความที่ต้องการค้นหา
+            limit: จำนวนผลลัพธ์สูงสุดต่อ query
+            file_ids: ค้นหาเฉพาะ chunks ของเอกสารเหล่านี้ (optional)
+
+        Returns:
+            ผลลัพธ์ของแต่ละ query เรียงจากคะแนน BM25 สูงสุด ในรูปแบบ {"id", "file_id", "content", "score"}
+        """
+        groups: List[List[Dict]] = []
+        with self._connect() as connection:
+            table = self._ensure_table(connection, collection_name)
+            file_filter = ""
+            file_params: List[str] = []
+            if file_ids is not None:
+                if not file_ids:
+                    return [[] for _ in queries]
+                file_filter = f" AND file_id IN ({', '.join('?' for _ in file_ids)})"
+                file_params = list(file_ids)
+
+            for query in queries:
+                terms = list(dict.fromkeys(keyword_terms(query)))
+                if not terms:
+                    groups.append([])
+                    continue
+                match = " OR ".join(f'"{term}"' for term in terms)
+                rows = connection.execute(
+                    f"SELECT rowid, file_id, content, bm25({table}) AS rank FROM {table} "
+                    f"WHERE {table} MATCH ?{file_filter} ORDER BY rank LIMIT ?",
+                    [match, *file_params, limit]
+                ).fetchall()
+                # bm25() ของ FTS5 คืนค่าติดลบ ค่าที่น้อยกว่าคือเกี่ยวข้องมากกว่า
+                groups.append([
+                    {"id": rowid, "file_id": file_id, "content": content, "score": -rank}
+                    for rowid, file_id, content, rank in rows
+                ])
+        return groups
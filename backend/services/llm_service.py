@@ -1,19 +1,30 @@
 # services/llm_service.py
 from typing import Dict, List, Optional
-from llama_cpp import Llama
+from core.config import config
+from services.model_registry import get_llama
 
 class LLMService:
-    def __init__(self, model_path: str = "models/llama-3.2-typhoon2-3b-instruct-q4_k_m.gguf"):
+    def __init__(self, model_path: str = config.LLM_MODEL_PATH):
         """
-        เริ่มต้น LLM Service โดยโหลด Llama 3.2 model
+        เริ่มต้น LLM Service สำหรับ Llama 3.2 model
+        โมเดลจะถูกโหลดเมื่อใช้งานครั้งแรกและใช้ร่วมกันทั้ง process
         model_path: พาธไปยังไฟล์โมเดลที่ quantized แล้ว
         """
-        self.model = Llama(
-            model_path=model_path,
+        self.model_path = model_path
+
+    @property
+    def model(self):
+        """โมเดล Llama ที่ใช้ร่วมกันทั้ง process (โหลดเมื่อเรียกครั้งแรก)"""
+        return get_llama(
+            self.model_path,
             n_ctx=4096,  # ขนาด context window
             n_batch=512  # batch size สำหรับการประมวลผล
         )
 
+    def warmup(self) -> None:
+        """โหลดโมเดลและสร้างข้อความหนึ่ง token เพื่อให้ request แรกไม่ต้องรอ"""
+        self.model("Hello", max_tokens=1)
+
     async def generate_evaluation(
         self,
         question: str,
@@ -0,0 +1,438 @@
+# services/local_vector_store.py
+import json
+import os
+import re
+import shutil
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.milvus_service import VectorInput, as_vector_matrix, parse_file_id_filter
+from services.vector_storage import with_score
+
+_ID_IN = re.compile(r"^\s*id\s+in\s*\[\s*([-0-9,\s]*)\]\s*$")
+_ALL_ROWS = re.compile(r"^\s*id\s*>=\s*0\s*$")
+
+
+class _LocalCollection:
+    """
+    ข้อมูลของหนึ่ง collection บนดิสก์
+    - vectors.f32: เมทริกซ์ float32 ขนาด (capacity, dimension) เปิดแบบ memory-mapped
+    - norms.f32, ids.i64, alive.u8: ขนาดของ vector, primary key และสถานะการลบของแต่ละแถว
+    - rows.jsonl: file_id, content และ metadata หนึ่งบรรทัดต่อแถว
+    - meta.json: dimension, จำนวนแถวที่ใช้แล้ว และ id ถัดไป (เขียนหลังสุดเพื่อให้แถวที่เขียนไม่ครบถูกละทิ้ง)
+    """
+
+    META_FILE = "meta.json"
+    ROWS_FILE = "rows.jsonl"
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, self.META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.dimension = self.meta["dimension"]
+        count = self.meta["count"]
+
+        self.file_ids: List[str] = []
+        self.contents: List[str] = []
+        self.metadata: List[Dict] = []
+        rows_path = os.path.join(path, self.ROWS_FILE)
+        with open(rows_path, "r+", encoding="utf-8") as f:
+            for _ in range(count):
+                row = json.loads(f.readline())
+                self.file_ids.append(row["file_id"])
+                self.contents.append(row["content"])
+                self.metadata.append(row["metadata"])
+            # ตัดแถวที่เขียนค้างจากการเพิ่มที่ไม่สำเร็จ
+            f.truncate(f.tell())
+
+        self._open_arrays(max(self.meta["capacity"], 1))
+        self.rows_by_file: Dict[str, List[int]] = {}
+        self.row_by_id: Dict[int, int] = {}
+        for row in range(count):
+            if self.alive[row]:
+                self.rows_by_file.setdefault(self.file_ids[row], []).append(row)
+                self.row_by_id[int(self.ids[row])] = row
+
+    @classmethod
+    def create(cls, path: str, dimension: int, description: str) -> "_LocalCollection":
+        os.makedirs(path)
+        open(os.path.join(path, cls.ROWS_FILE), "w").close()
+        cls._write_meta(path, {
+            "dimension": dimension,
+            "description": description,
+            "count": 0,
+            "capacity": 0,
+            "next_id": 1
+        })
+        return cls(path)
+
+    @classmethod
+    def _write_meta(cls, path: str, meta: Dict[str, Any]) -> None:
+        tmp_path = os.path.join(path, cls.META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, cls.META_FILE))
+
+    def _array(self, name: str, dtype, shape) -> np.memmap:
+        file_path = os.path.join(self.path, name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(file_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(file_path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open_arrays(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.vectors = self._array("vectors.f32", np.float32, (capacity, self.dimension))
+        self.norms = self._array("norms.f32", np.float32, (capacity,))
+        self.ids = self._array("ids.i64", np.int64, (capacity,))
+        self.alive = self._array("alive.u8", np.uint8, (capacity,))
+
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def live_count(self) -> int:
+        return len(self.row_by_id)
+
+    def append(self, file_ids: List[str], contents: List[str], vectors: np.ndarray, metadata_list: List[Dict]) -> List[int]:
+        start = self.count
+        stop = start + len(vectors)
+        if stop > self.capacity:
+            # ขยายไฟล์เป็นสองเท่าเพื่อไม่ต้อง map ใหม่ทุกครั้งที่เพิ่ม
+            self.flush()
+            self._open_arrays(max(stop, self.capacity * 2, 1024))
+
+        ids = list(range(self.meta["next_id"], self.meta["next_id"] + len(vectors)))
+        self.vectors[start:stop] = vectors
+        self.norms[start:stop] = np.linalg.norm(vectors, axis=1)
+        self.ids[start:stop] = ids
+        self.alive[start:stop] = 1
+        with open(os.path.join(self.path, self.ROWS_FILE), "a", encoding="utf-8") as f:
+            for file_id, content, metadata in zip(file_ids, contents, metadata_list):
+                f.write(json.dumps(
+                    {"file_id": file_id, "content": content, "metadata": metadata},
+                    ensure_ascii=False
+                ) + "\n")
+
+        for offset, (file_id, content, metadata) in enumerate(zip(file_ids, contents, metadata_list)):
+            row = start + offset
+            self.file_ids.append(file_id)
+            self.contents.append(content)
+            self.metadata.append(metadata)
+            self.rows_by_file.setdefault(file_id, []).append(row)
+            self.row_by_id[ids[offset]] = row
+
+        self.meta.update(count=stop, capacity=self.capacity, next_id=ids[-1] + 1 if ids else self.meta["next_id"])
+        self.flush()
+        return ids
+
+    def delete(self, ids: List[int]) -> int:
+        deleted = 0
+        for primary_key in ids:
+            row = self.row_by_id.pop(int(primary_key), None)
+            if row is None:
+                continue
+            self.alive[row] = 0
+            self.rows_by_file[self.file_ids[row]].remove(row)
+            deleted += 1
+        self.alive.flush()
+        return deleted
+
+    def flush(self) -> None:
+        for array in (self.vectors, self.norms, self.ids, self.alive):
+            array.flush()
+        self._write_meta(self.path, self.meta)
+
+    def rows_for(self, filter_expr: Optional[str]) -> np.ndarray:
+        """
+        แถวที่ยังไม่ถูกลบและตรงกับ filter
+        รองรับเฉพาะ file_id == "...", file_id in [...], id in [...] และ id >= 0
+        """
+        if not filter_expr or _ALL_ROWS.match(filter_expr):
+            return np.flatnonzero(self.alive[:self.count])
+        file_ids = parse_file_id_filter(filter_expr)
+        if file_ids is not None:
+            rows = [row for file_id in dict.fromkeys(file_ids) for row in self.rows_by_file.get(file_id, [])]
+            return np.array(sorted(rows), dtype=np.int64)
+        match = _ID_IN.match(filter_expr)
+        if match:
+            ids = [int(value) for value in match.group(1).split(",") if value.strip()]
+            return np.array(sorted(self.row_by_id[i] for i in ids if i in self.row_by_id), dtype=np.int64)
+        raise ValueError(f"local vector store ไม่รองรับ filter: {filter_expr}")
+
+    def entity(self, row: int, output_fields: Optional[List[str]]) -> Dict[str, Any]:
+        entity: Dict[str, Any] = {"id": int(self.ids[row])}
+        for field in output_fields or []:
+            if field == "file_id":
+                entity[field] = self.file_ids[row]
+            elif field == "content":
+                entity[field] = self.contents[row]
+            elif field == "metadata":
+                entity[field] = self.metadata[row]
+            elif field == "embedding":
+                entity[field] = self.vectors[row].tolist()
+        return entity
+
+
+class LocalVectorStore:
+    """
+    vector store ที่ทำงานใน process เดียวกับ server โดยไม่ต้องมี Milvus
+    มี async API เดียวกับ MilvusService เหมาะกับการทดสอบ เครื่องนักพัฒนา และการใช้งานขนาดเล็ก
+    ค้นหาแบบ brute-force cosine similarity บนเมทริกซ์ float32 ที่เก็บเป็นไฟล์ memory-mapped
+    """
+
+    backend = "local"
+
+    def __init__(self, data_dir: str):
+        """
+        Args:
+            data_dir: โฟลเดอร์ที่เก็บข้อมูลของทุก collection
+        """
+        self.data_dir = data_dir
+        self._collections: Dict[str, _LocalCollection] = {}
+        self._lock = threading.RLock()
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def _path(self, collection_name: str) -> str:
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", collection_name):
+            raise ValueError(f"ชื่อ collection ไม่ถูกต้อง: {collection_name}")
+        return os.path.join(self.data_dir, collection_name)
+
+    def _collection(self, collection_name: str) -> _LocalCollection:
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                path = self._path(collection_name)
+                if not os.path.isdir(path):
+                    raise ValueError(f"ไม่พบ collection {collection_name}")
+                collection = self._collections[collection_name] = _LocalCollection(path)
+            return collection
+
+    def invalidate_collection(self, collection_name: str) -> None:
+        """ปิด collection ที่เปิดไว้ ครั้งถัดไปจะอ่านจากดิสก์ใหม่"""
+        with self._lock:
+            self._collections.pop(collection_name, None)
+
+    async def _collection_exists(self, collection_name: str) -> bool:
+        return os.path.isdir(self._path(collection_name))
+
+    async def create_collection(
+        self,
+        collection_name: str,
+        dimension: int,
+        description: str = "",
+        layout: Optional[str] = None,
+        storage: Optional[str] = None
+    ) -> None:
+        """
+        สร้าง collection ใหม่ (layout และ storage ไม่มีผลกับ backend นี้ รับไว้เพื่อให้ API ตรงกับ MilvusService)
+        """
+        with self._lock:
+            path = self._path(collection_name)
+            if os.path.isdir(path):
+                raise ValueError(f"Collection {collection_name} มีอยู่แล้ว")
+            self._collections[collection_name] = _LocalCollection.create(path, dimension, description)
+
+    async def ensure_collection(self, collection_name: str, dimension: int, description: str = "") -> None:
+        """สร้าง collection ถ้ายังไม่มี"""
+        with self._lock:
+            if not await self._collection_exists(collection_name):
+                await self.create_collection(collection_name, dimension, description)
+
+    async def create_index(self, collection_name: str, *args, **kwargs) -> Dict[str, Any]:
+        """ไม่ต้องสร้าง index เพราะค้นหาแบบ brute-force เสมอ"""
+        self._collection(collection_name)
+        return {"metric_type": "COSINE", "index_type": "FLAT", "params": {}}
+
+    async def rebuild_index(self, collection_name: str, profile: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        return {"rebuilt": False, "index_params": await self.create_index(collection_name)}
+
+    async def ensure_scalar_indexes(self, collection_name: str, reload: bool = False) -> Dict[str, str]:
+        """file_id มี index ในหน่วยความจำอยู่แล้ว (rows_by_file) จึงไม่ต้องสร้างเพิ่ม"""
+        self._collection(collection_name)
+        return {"file_id": "exists"}
+
+    def layout_of(self, collection_name: str) -> str:
+        return "none"
+
+    async def insert_vectors(
+        self,
+        collection_name: str,
+        file_ids: List[str],
+        contents: List[str],
+        vectors: VectorInput,
+        metadata_list: List[Dict] = None,
+        flush: bool = False
+    ) -> List[int]:
+        """
+        เพิ่ม vectors และข้อมูลที่เกี่ยวข้องเข้าไปใน collection (ข้อมูลถูกบันทึกลงดิสก์ทันทีเสมอ)
+
+        Returns:
+            รายการของ IDs ที่ถูกสร้างขึ้น ตามลำดับของแถว
+        """
+        vectors = as_vector_matrix(vectors)
+        if metadata_list is None:
+            metadata_list = [{} for _ in range(len(vectors))]
+        if not (len(file_ids) == len(contents) == len(vectors) == len(metadata_list)):
+            raise ValueError("จำนวน file_ids, contents, vectors และ metadata ต้องเท่ากัน")
+        if len(vectors) == 0:
+            return []
+
+        with self._lock:
+            collection = self._collection(collection_name)
+            if vectors.shape[1] != collection.dimension:
+                raise ValueError(
+                    f"vectors มี {vectors.shape[1]} มิติ แต่ collection {collection_name} มี {collection.dimension} มิติ"
+                )
+            return collection.append(file_ids, contents, vectors, metadata_list)
+
+    async def flush(self, collection_name: str) -> None:
+        with self._lock:
+            self._collection(collection_name).flush()
+
+    async def search_vectors(
+        self,
+        collection_name: str,
+        query_vectors: VectorInput,
+        limit: int = 10,
+        field_name: str = "embedding",
+        output_fields: List[str] = None,
+        filter_expr: str = None,
+        search_params: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """ค้นหาและรวมผลลัพธ์ของทุก query เป็นรายการเดียว เหมือน MilvusService.search_vectors"""
+        groups = await self.search_vectors_batch(
+            collection_name,
+            query_vectors,
+            limit=limit,
+            field_name=field_name,
+            output_fields=output_fields,
+            filter_expr=filter_expr,
+            search_params=search_params
+        )
+        return [result for group in groups for result in group]
+
+    async def search_vectors_batch(
+        self,
+        collection_name: str,
+        query_vectors: VectorInput,
+        limit: int = 10,
+        field_name: str = "embedding",
+        output_fields: List[str] = None,
+        filter_expr: str = None,
+        search_params: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        ค้นหาด้วย cosine similarity กับทุกแถวที่ตรงกับ filter
+        score และ distance อยู่ในรูปแบบเดียวกับ MilvusService (score คือ similarity, distance คือ 1 - score)
+
+        Returns:
+            รายการของกลุ่มผลลัพธ์ กลุ่มที่ i เป็นผลลัพธ์ของ query แถวที่ i เรียงจากใกล้ที่สุด
+        """
+        queries = as_vector_matrix(query_vectors)
+        if len(queries) == 0:
+            return []
+
+        with self._lock:
+            collection = self._collection(collection_name)
+            rows = collection.rows_for(filter_expr)
+            if len(rows) == 0 or limit <= 0:
+                return [[] for _ in range(len(queries))]
+
+            candidates = collection.vectors[rows]
+            norms = collection.norms[rows] * np.linalg.norm(queries, axis=1)[:, None]
+            similarities = (queries @ candidates.T) / np.maximum(norms, 1e-12)
+
+            k = min(limit, len(rows))
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            groups = []
+            for query_index, columns in enumerate(top):
+                columns = columns[np.argsort(-similarities[query_index, columns], kind="stable")]
+                group = []
+                for column in columns:
+                    similarity = float(similarities[query_index, column])
+                    group.append(with_score(collection.entity(int(rows[column]), output_fields), similarity))
+                groups.append(group)
+            return groups
+
+    async def query_entities(
+        self,
+        collection_name: str,
+        filter_expr: str,
+        output_fields: List[str] = None,
+        batch_size: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """ดึง entities ทั้งหมดที่ตรงกับ filter"""
+        with self._lock:
+            collection = self._collection(collection_name)
+            return [collection.entity(int(row), output_fields) for row in collection.rows_for(filter_expr)]
+
+    async def fetch_vectors(
+        self,
+        collection_name: str,
+        ids: List[int],
+        field_name: str = "embedding"
+    ) -> np.ndarray:
+        """ดึง vectors ที่เก็บไว้ตาม primary keys เรียงตามลำดับของ ids"""
+        if not ids:
+            return np.empty((0, 0), dtype=np.float32)
+        with self._lock:
+            collection = self._collection(collection_name)
+            missing = [i for i in ids if int(i) not in collection.row_by_id]
+            if missing:
+                raise Exception(f"ไม่พบ vectors ของ ids: {missing[:10]}")
+            return np.array(collection.vectors[[collection.row_by_id[int(i)] for i in ids]])
+
+    async def delete_entities(self, collection_name: str, ids: List[int], batch_size: int = 1000) -> int:
+        """ลบ entities ตาม primary keys คืนจำนวนที่ลบ"""
+        with self._lock:
+            return self._collection(collection_name).delete(ids)
+
+    async def drop_collection(self, collection_name: str) -> None:
+        with self._lock:
+            path = self._path(collection_name)
+            self._collections.pop(collection_name, None)
+            if not os.path.isdir(path):
+                raise Exception(f"ไม่สามารถลบ collection ได้: ไม่พบ collection {collection_name}")
+            shutil.rmtree(path)
+
+    def residency_stats(self) -> Dict[str, Any]:
+        """collections ที่เปิดอยู่ (หน้าของไฟล์ memory-mapped ถูกคืนหน่วยความจำโดยระบบปฏิบัติการ)"""
+        with self._lock:
+            collections = [
+                {"name": name, "footprint_bytes": collection.count * collection.dimension * 4}
+                for name, collection in self._collections.items()
+            ]
+        return {
+            "budget_bytes": 0,
+            "resident_bytes": sum(item["footprint_bytes"] for item in collections),
+            "collections": collections
+        }
+
+    async def preload_collections(self, collection_names: Optional[List[str]] = None) -> Dict[str, str]:
+        """เปิด collections ไว้ล่วงหน้า (อ่าน rows และสร้าง index ของ file_id)"""
+        status: Dict[str, str] = {}
+        for name in collection_names or []:
+            try:
+                self._collection(name)
+                status[name] = "loaded"
+            except ValueError:
+                status[name] = "missing"
+        return status
+
+    async def release_idle_collections(self, idle_seconds: float) -> List[str]:
+        """ไม่ต้อง release เพราะระบบปฏิบัติการคืนหน้าของไฟล์ที่ไม่ได้ใช้ให้เอง"""
+        return []
+
+    async def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
+        with self._lock:
+            collection = self._collection(collection_name)
+            return {
+                "row_count": collection.live_count,
+                "index_status": [],
+                "description": collection.meta["description"]
+            }
@@ -1,4 +1,16 @@
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import asyncio
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
 import numpy as np
 from pymilvus import (
     Collection,
@@ -9,40 +21,454 @@ from pymilvus import (
     connections,
     Index
 )
+from core.config import config
+from services.collection_residency import CollectionResidencyManager, estimate_footprint
+from services.full_vector_store import FullPrecisionStore
+from services.index_profiles import build_index_params, build_search_params, profile_for_collection
+from services.keyword_index import KeywordIndex
+from services.vector_storage import (
+    VECTOR_STORAGES,
+    bytes_per_dimension,
+    encode_vectors,
+    rerank,
+    similarity_score,
+    storage_of_data_type,
+    vector_data_type,
+    with_score
+)
+from utils.monitoring import (
+    COLLECTION_EVICTIONS,
+    COLLECTION_LOADS,
+    RESIDENCY_LOOKUPS,
+    RESIDENT_BYTES,
+    RESIDENT_COLLECTIONS
+)
+
+logger = logging.getLogger(__name__)
+
+VectorInput = Union[np.ndarray, List[List[float]], List[float]]
+
+# รูปแบบการแบ่ง partition ของ collection
+# - none: ทุกเอกสารอยู่ใน partition เริ่มต้น การค้นหาตาม file_id เป็นการกรอง scalar ทั้ง collection
+# - partition: หนึ่ง partition ต่อเอกสาร (หรือต่อกลุ่ม เช่น รายวิชา/การสอบ) การค้นหาถูกส่งไปเฉพาะ partitions ที่ตรงกัน
+# - partition_key: ใช้ file_id เป็น partition key ให้ Milvus กระจายและเลือก partitions เอง
+#   รองรับเอกสารจำนวนมากกว่าข้อจำกัดจำนวน partitions ต่อ collection
+PARTITION_LAYOUTS = ("none", "partition", "partition_key")
+DEFAULT_PARTITION = "_default"
+
+_STRING_LITERAL = r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\''
+_FILE_ID_EQUALS = re.compile(rf"^\s*file_id\s*==\s*({_STRING_LITERAL})\s*$")
+_FILE_ID_IN = re.compile(rf"^\s*file_id\s+in\s*\[\s*((?:{_STRING_LITERAL})(?:\s*,\s*(?:{_STRING_LITERAL}))*)\s*\]\s*$")
+
+
+def as_vector_matrix(vectors: VectorInput) -> np.ndarray:
+    """
+    แปลง vectors เป็นเมทริกซ์ float32 แบบ C-contiguous ขนาด (จำนวน vectors, มิติ)
+    ถ้าเป็นเมทริกซ์ float32 อยู่แล้วจะไม่มีการคัดลอกข้อมูล
+    vector เดี่ยว (1 มิติ) จะถูกแปลงเป็นเมทริกซ์ 1 แถว
+    """
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return matrix
+
+
+def quote_string(value: str) -> str:
+    """แปลงค่าเป็น string literal สำหรับ filter expression ของ Milvus โดย escape เครื่องหมายคำพูด"""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _unquote_string(literal: str) -> str:
+    return re.sub(r"\\(.)", r"\1", literal[1:-1])
+
+
+def parse_file_id_filter(filter_expr: Optional[str]) -> Optional[List[str]]:
+    """
+    อ่าน file ids จาก filter ที่อยู่ในรูป file_id == "..." หรือ file_id in ["...", ...] เท่านั้น
+    คืน None ถ้า filter เป็นรูปแบบอื่น (ในกรณีนั้นจะค้นหาทุก partition)
+    """
+    if not filter_expr:
+        return None
+    match = _FILE_ID_EQUALS.match(filter_expr)
+    if match:
+        return [_unquote_string(match.group(1))]
+    match = _FILE_ID_IN.match(filter_expr)
+    if match:
+        return [_unquote_string(literal) for literal in re.findall(_STRING_LITERAL, match.group(1))]
+    return None
+
+
+def partition_name_for(file_id: str, group_separator: Optional[str] = None) -> str:
+    """
+    ชื่อ partition ของเอกสาร ชื่อ partition ของ Milvus ใช้ได้เฉพาะตัวอักษร ตัวเลข และ _
+    จึงแทนอักขระอื่นด้วย _ และต่อท้ายด้วย hash เพื่อไม่ให้ชื่อชนกัน
+    ถ้ากำหนด group_separator เอกสารที่ file_id ขึ้นต้นเหมือนกัน (เช่น "exam1/student42") จะอยู่ partition เดียวกัน
+    """
+    key = file_id.split(group_separator, 1)[0] if group_separator else file_id
+    readable = re.sub(r"[^0-9A-Za-z_]", "_", key)[:64]
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+    return f"p_{readable}_{digest}"
+
+
+def _take(values, rows):
+    """เลือกแถวตาม range (slice ไม่ copy) หรือรายการ index"""
+    if isinstance(rows, range):
+        return values[rows.start:rows.stop]
+    if isinstance(values, np.ndarray):
+        return values[rows]
+    return [values[row] for row in rows]
+
+
+def _contiguous_ranges(rows: List[int]) -> List[Tuple[int, int]]:
+    """รวม index ของแถวเป็นช่วง [start, stop) ที่ต่อเนื่องกัน"""
+    ranges: List[Tuple[int, int]] = []
+    for row in sorted(rows):
+        if ranges and ranges[-1][1] == row:
+            ranges[-1] = (ranges[-1][0], row + 1)
+        else:
+            ranges.append((row, row + 1))
+    return ranges
+
+
+class BulkInsertError(Exception):
+    """
+    การเพิ่ม vectors สำเร็จเพียงบางส่วน
+    inserted_ids คือ ids ของแถวที่เพิ่มสำเร็จ และ failed_ranges คือช่วงแถว [start, stop) ที่ล้มเหลว
+    """
+
+    def __init__(
+        self,
+        message: str,
+        inserted_ids: List[int],
+        failed_ranges: List[Tuple[int, int]],
+        errors: List[str]
+    ):
+        super().__init__(message)
+        self.inserted_ids = inserted_ids
+        self.failed_ranges = failed_ranges
+        self.errors = errors
+
 
 class MilvusService:
     """
     Service class ที่จัดการการทำงานกับ Milvus
     รับผิดชอบการจัดการ collections, vectors, และ indexes
+
+    - เชื่อมต่อด้วย connection aliases หลายตัว และกระจายคำขอที่เข้ามาพร้อมกันแบบ round-robin
+    - cache Collection handles ต่อ (alias, collection) จึงไม่ต้องสร้าง handle (describe collection) ในทุกคำขอ
+      cache ถูกล้างเมื่อสร้างหรือลบ collection หรือเมื่อการเรียกใช้ collection นั้นล้มเหลว
+    - load collections เมื่อถูกค้นหาครั้งแรก และ release collections ที่ใช้งานล่าสุดนานที่สุด (LRU)
+      เมื่อหน่วยความจำที่ประมาณจาก จำนวนแถว x มิติ เกิน MILVUS_MEMORY_BUDGET_BYTES
+      service ถือว่าเป็นผู้ load และ release collections บน Milvus แต่เพียงผู้เดียว
+    - collection ที่เก็บ vectors แบบ float16 หรือ binary ค้นหารอบแรกด้วย vectors ที่บีบอัด
+      แล้ว re-score candidates ด้วย vectors float32 ที่เก็บแยกไว้ใน FullPrecisionStore
+    - แบ่งการ insert ขนาดใหญ่ตามจำนวนแถวและขนาดข้อมูล แล้วส่งแต่ละส่วนพร้อมกันผ่าน thread pool ที่จำกัดขนาด
+    - การเรียก pymilvus ทั้งหมดรันใน thread pool ที่จำกัดขนาด พร้อม timeout ต่อ RPC (MILVUS_TIMEOUT_SECONDS)
+      คำขอที่เข้ามาพร้อมกันจึงทำงานซ้อนกันได้จริง และการยกเลิกคำขอจะยกเลิกงานที่ยังรอคิวอยู่
     """
-    def __init__(self, host: str, port: int):
+
+    backend = "milvus"
+
+    def __init__(self, host: str, port: int, pool_size: Optional[int] = None):
         """
         ตั้งค่าการเชื่อมต่อกับ Milvus server
         
         Args:
             host: Milvus server hostname
             port: Milvus server port
+            pool_size: จำนวน connection aliases (default: MILVUS_CONNECTION_POOL_SIZE)
         """
         self.host = host
         self.port = port
+        self.pool_size = max(1, pool_size or config.MILVUS_CONNECTION_POOL_SIZE)
+        # alias แรกเป็น "default" เพื่อให้โค้ดที่ใช้ connection เริ่มต้นของ pymilvus ยังทำงานได้
+        self.aliases = ["default"] + [f"default-{i}" for i in range(1, self.pool_size)]
+        self._alias_cycle = itertools.cycle(self.aliases)
+        self._alias_lock = threading.Lock()
+        self._create_lock = threading.Lock()
+        self._handles: Dict[Tuple[str, str], Collection] = {}
+        self._handles_lock = threading.Lock()
+        # collections ที่ load อยู่ภายใต้ budget และ lock ต่อ collection สำหรับการ load และ release
+        self.residency = CollectionResidencyManager(config.MILVUS_MEMORY_BUDGET_BYTES)
+        self._residency_locks: Dict[str, threading.Lock] = {}
+        self._preload_thread: Optional[threading.Thread] = None
+        # รูปแบบ partition ของ collections ที่สร้างใหม่ และ partitions ที่รู้ว่ามีอยู่แล้วของแต่ละ collection
+        self.partition_layout = config.MILVUS_PARTITION_LAYOUT
+        if self.partition_layout not in PARTITION_LAYOUTS:
+            raise ValueError(
+                f"MILVUS_PARTITION_LAYOUT ต้องเป็นหนึ่งใน {', '.join(PARTITION_LAYOUTS)}"
+            )
+        self.partition_group_separator = config.MILVUS_PARTITION_GROUP_SEPARATOR
+        self._layout_overrides: Dict[str, str] = {}
+        self._layouts: Dict[str, str] = {}
+        self._partitions: Dict[str, set] = {}
+        self._partition_lock = threading.Lock()
+        self._server_version: Optional[Tuple[int, ...]] = None
+        # รูปแบบการเก็บ vectors ของ collections ที่สร้างใหม่ และของแต่ละ collection ที่อ่านจาก schema
+        self.vector_storage = config.MILVUS_VECTOR_STORAGE
+        if self.vector_storage not in VECTOR_STORAGES:
+            raise ValueError(f"MILVUS_VECTOR_STORAGE ต้องเป็นหนึ่งใน {', '.join(VECTOR_STORAGES)}")
+        self._storages: Dict[str, str] = {}
+        self.rerank_factor = config.MILVUS_RERANK_FACTOR
+        self._full_vector_store: Optional[FullPrecisionStore] = None
+        # index params ของ vector field ของแต่ละ collection ใช้เลือก search params
+        self._index_params: Dict[str, Optional[Dict[str, Any]]] = {}
+        # ขนาดสูงสุดของการ insert หนึ่งครั้ง ต้องไม่เกินข้อจำกัดขนาดข้อความของ gRPC
+        self.insert_max_rows = config.MILVUS_INSERT_MAX_ROWS
+        self.insert_max_bytes = config.MILVUS_INSERT_MAX_BYTES
+        self._insert_executor = ThreadPoolExecutor(
+            max_workers=config.MILVUS_INSERT_CONCURRENCY,
+            thread_name_prefix="milvus-insert"
+        )
+        # การเรียก pymilvus อื่นๆ (ซึ่งเป็น blocking) รันใน thread pool ที่จำกัดขนาด event loop จึงไม่ถูก block
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.MILVUS_EXECUTOR_WORKERS,
+            thread_name_prefix="milvus"
+        )
+        self.timeout = config.MILVUS_TIMEOUT_SECONDS
         self._connect()
 
     def _connect(self) -> None:
-        """เชื่อมต่อกับ Milvus server"""
+        """เชื่อมต่อกับ Milvus server ทุก alias ใน pool"""
         try:
-            connections.connect(
-                alias="default", 
-                host=self.host, 
-                port=self.port
-            )
+            for alias in self.aliases:
+                connections.connect(
+                    alias=alias,
+                    host=self.host,
+                    port=self.port
+                )
         except Exception as e:
             raise ConnectionError(f"ไม่สามารถเชื่อมต่อกับ Milvus server ได้: {str(e)}")
 
+    def _next_alias(self) -> str:
+        """เลือก connection alias ถัดไปแบบ round-robin"""
+        with self._alias_lock:
+            return next(self._alias_cycle)
+
+    async def _run(
+        self,
+        fn: Callable,
+        *args,
+        deadline: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+        **kwargs
+    ):
+        """
+        รันการเรียก pymilvus แบบ blocking ใน thread pool และรอผลโดยไม่ block event loop
+        
+        Args:
+            fn: ฟังก์ชันที่ต้องการรัน
+            deadline: เวลารอสูงสุด (วินาที) ถ้าเกินจะได้ TimeoutError
+                ควรส่ง timeout เดียวกันให้ pymilvus ด้วยเพื่อให้ RPC ใน thread ถูกยกเลิกตามไปด้วย
+            cancel_event: event ที่ถูก set เมื่อการรอถูกยกเลิกหรือหมดเวลา
+                ให้ฟังก์ชันที่เรียก RPC หลายครั้งหยุดก่อน RPC ถัดไป
+            executor: thread pool ที่ใช้ (default: pool ทั่วไปของ service)
+        """
+        future = asyncio.get_running_loop().run_in_executor(
+            executor or self._executor, functools.partial(fn, *args, **kwargs)
+        )
+        try:
+            if deadline is None:
+                return await future
+            return await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError:
+            if cancel_event is not None:
+                cancel_event.set()
+            raise TimeoutError(f"Milvus ไม่ตอบกลับภายใน {deadline} วินาที")
+        except asyncio.CancelledError:
+            # งานที่ยังไม่เริ่มถูกยกเลิกจาก pool ส่วนงานที่กำลังรันจะหยุดเมื่อ RPC หมดเวลาหรือที่ cancel_event
+            if cancel_event is not None:
+                cancel_event.set()
+            raise
+
+    def _timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """timeout ของหนึ่ง RPC (None ที่ส่งเข้ามาใช้ MILVUS_TIMEOUT_SECONDS, ค่า <= 0 คือไม่จำกัด)"""
+        timeout = self.timeout if timeout is None else timeout
+        return timeout if timeout and timeout > 0 else None
+
+    def _collection(self, collection_name: str) -> Collection:
+        """คืน Collection handle จาก cache บน connection alias ถัดไปใน pool"""
+        alias = self._next_alias()
+        key = (alias, collection_name)
+        collection = self._handles.get(key)
+        if collection is None:
+            collection = Collection(collection_name, using=alias)
+            with self._handles_lock:
+                collection = self._handles.setdefault(key, collection)
+        return collection
+
+    @contextmanager
+    def _resident(self, collection_name: str) -> Iterator[Collection]:
+        """
+        คืน Collection handle ที่ load แล้ว (load ถ้ายังไม่ได้ load) ใช้ก่อน search และ query
+        collection ถูก pin ไว้ระหว่างใช้งานจึงไม่ถูก release เพื่อคืนหน่วยความจำให้ collection อื่น
+        """
+        resident = self.residency.acquire(collection_name)
+        RESIDENCY_LOOKUPS.labels(result="hit" if resident else "miss").inc()
+        try:
+            collection = self._collection(collection_name)
+            if not resident:
+                self._load(collection_name, collection, "demand")
+            yield collection
+        finally:
+            self.residency.unpin(collection_name)
+
+    def _residency_lock(self, collection_name: str) -> threading.Lock:
+        with self._handles_lock:
+            return self._residency_locks.setdefault(collection_name, threading.Lock())
+
+    def _footprint(self, collection_name: str, collection: Collection) -> int:
+        """ประมาณหน่วยความจำของ collection จากจำนวนแถวและมิติของ embedding"""
+        dimension = next(
+            (field.params.get("dim", 0) for field in collection.schema.fields if field.name == "embedding"),
+            0
+        )
+        return estimate_footprint(
+            collection.num_entities,
+            dimension,
+            config.MILVUS_MEMORY_OVERHEAD,
+            bytes_per_dimension(self.storage_of(collection_name))
+        )
+
+    def _load(self, collection_name: str, collection: Collection, reason: str) -> None:
+        """load collection แล้ว release collections ที่ใช้งานล่าสุดนานที่สุดจนอยู่ใน budget"""
+        with self._residency_lock(collection_name):
+            if self.residency.is_resident(collection_name):
+                return
+            collection.load()
+            COLLECTION_LOADS.labels(reason=reason).inc()
+            victims = self.residency.admit(collection_name, self._footprint(collection_name, collection))
+        for victim in victims:
+            self._release(victim, "budget")
+        self._update_residency_metrics()
+
+    def _release(self, collection_name: str, reason: str) -> bool:
+        """release collection ที่ถูกเลือก ถ้ายังไม่ถูกใช้งานหรือ load กลับเข้ามาใหม่ระหว่างนั้น"""
+        with self._residency_lock(collection_name):
+            if not self.residency.confirm_release(collection_name, reason):
+                return False
+            try:
+                self._collection(collection_name).release()
+            except Exception as e:
+                # collection อาจถูกลบไปแล้ว การ release ที่ล้มเหลวต้องไม่ทำให้คำขอที่ทำให้เกิดการ release ล้มเหลว
+                logger.warning("ไม่สามารถ release collection %s ได้: %s", collection_name, e)
+                self.invalidate_collection(collection_name)
+                return False
+        COLLECTION_EVICTIONS.labels(reason=reason).inc()
+        return True
+
+    def _update_residency_metrics(self) -> None:
+        RESIDENT_COLLECTIONS.set(self.residency.resident_count)
+        RESIDENT_BYTES.set(self.residency.resident_bytes)
+
+    def invalidate_collection(self, collection_name: str) -> None:
+        """ล้าง handles และข้อมูลของ collection ใน cache (สถานะการ load ยังถูกติดตามต่อ)"""
+        with self._handles_lock:
+            for key in [key for key in self._handles if key[1] == collection_name]:
+                del self._handles[key]
+            self._layouts.pop(collection_name, None)
+            self._partitions.pop(collection_name, None)
+            self._index_params.pop(collection_name, None)
+            self._storages.pop(collection_name, None)
+
+    @property
+    def full_vectors(self) -> FullPrecisionStore:
+        """ที่เก็บ vectors float32 ของ collections ที่บีบอัด (เปิดเมื่อใช้ครั้งแรก)"""
+        if self._full_vector_store is None:
+            with self._handles_lock:
+                if self._full_vector_store is None:
+                    self._full_vector_store = FullPrecisionStore(config.FULL_VECTOR_STORE_PATH)
+        return self._full_vector_store
+
+    def storage_of(self, collection_name: str) -> str:
+        """รูปแบบการเก็บ vectors ของ collection (float, float16 หรือ binary) จากชนิดของ embedding field"""
+        storage = self._storages.get(collection_name)
+        if storage is None:
+            collection = self._collection(collection_name)
+            storage = next(
+                (storage_of_data_type(field.dtype) for field in collection.schema.fields if field.name == "embedding"),
+                "float"
+            )
+            self._storages[collection_name] = storage
+        return storage
+
+    def index_params_of(self, collection_name: str, field_name: str = "embedding") -> Optional[Dict[str, Any]]:
+        """index params ของ vector field (None ถ้ายังไม่มี index)"""
+        if collection_name not in self._index_params:
+            collection = self._collection(collection_name)
+            self._index_params[collection_name] = next(
+                (dict(index.params) for index in collection.indexes if index.field_name == field_name),
+                None
+            )
+        return self._index_params[collection_name]
+
+    def layout_of(self, collection_name: str) -> str:
+        """
+        รูปแบบ partition ของ collection
+        collection ที่มี partition key บน file_id เป็น partition_key เสมอ
+        นอกนั้นใช้ค่าที่กำหนดตอนสร้างหรือ migrate ใน process นี้ หรือ MILVUS_PARTITION_LAYOUT
+        """
+        layout = self._layouts.get(collection_name)
+        if layout is None:
+            collection = self._collection(collection_name)
+            if any(getattr(field, "is_partition_key", False) for field in collection.schema.fields):
+                layout = "partition_key"
+            else:
+                layout = self._layout_overrides.get(collection_name, self.partition_layout)
+                if layout == "partition_key":
+                    # collection เดิมที่สร้างก่อนเปลี่ยนเป็น partition key ยังไม่ได้ migrate
+                    layout = "none"
+            self._layouts[collection_name] = layout
+        return layout
+
+    def _known_partitions(self, collection_name: str) -> set:
+        partitions = self._partitions.get(collection_name)
+        if partitions is None:
+            collection = self._collection(collection_name)
+            partitions = {partition.name for partition in collection.partitions}
+            self._partitions[collection_name] = partitions
+        return partitions
+
+    def _ensure_partition(self, collection_name: str, partition_name: str) -> None:
+        """สร้าง partition ถ้ายังไม่มี และ load ถ้า collection ถูก load อยู่แล้ว"""
+        if partition_name in self._known_partitions(collection_name):
+            return
+        with self._partition_lock:
+            partitions = self._known_partitions(collection_name)
+            if partition_name in partitions:
+                return
+            collection = self._collection(collection_name)
+            if not collection.has_partition(partition_name):
+                partition = collection.create_partition(partition_name)
+                if self.residency.is_resident(collection_name):
+                    partition.load()
+            partitions.add(partition_name)
+
+    def _route_partitions(self, collection_name: str, filter_expr: Optional[str]) -> Optional[List[str]]:
+        """
+        เลือก partitions ที่ต้องค้นหาจาก filter ของ file_id (เฉพาะ layout แบบ partition)
+        คืน None เมื่อต้องค้นหาทุก partition
+        partition เริ่มต้นถูกรวมเสมอ เพราะเอกสารที่เพิ่มก่อนเปิดใช้ layout นี้ยังอยู่ในนั้น
+        collection แบบ partition_key ไม่ต้องเลือกเอง เพราะ Milvus ตัด partitions จาก filter ให้อัตโนมัติ
+        """
+        if self.layout_of(collection_name) != "partition":
+            return None
+        file_ids = parse_file_id_filter(filter_expr)
+        if file_ids is None:
+            return None
+        known = self._known_partitions(collection_name)
+        wanted = {partition_name_for(file_id, self.partition_group_separator) for file_id in file_ids}
+        return [DEFAULT_PARTITION] + sorted((wanted & known) - {DEFAULT_PARTITION})
+
     async def create_collection(
         self,
         collection_name: str,
         dimension: int,
-        description: str = ""
+        description: str = "",
+        layout: Optional[str] = None,
+        storage: Optional[str] = None
     ) -> Collection:
         """
         สร้าง collection ใหม่สำหรับเก็บ vectors
@@ -51,18 +477,42 @@ class MilvusService:
             collection_name: ชื่อของ collection
             dimension: ขนาดมิติของ vector
             description: คำอธิบาย collection (optional)
+            layout: รูปแบบ partition (default: MILVUS_PARTITION_LAYOUT)
+            storage: รูปแบบการเก็บ vectors (default: MILVUS_VECTOR_STORAGE)
             
         Returns:
             Collection object ที่สร้างขึ้น
         """
-        if utility.has_collection(collection_name):
+        return await self._run(self._create_collection, collection_name, dimension, description, layout, storage)
+
+    def _create_collection(
+        self,
+        collection_name: str,
+        dimension: int,
+        description: str,
+        layout: Optional[str],
+        storage: Optional[str]
+    ) -> Collection:
+        if utility.has_collection(collection_name, using=self.aliases[0]):
             raise ValueError(f"Collection {collection_name} มีอยู่แล้ว")
+        layout = layout or self.partition_layout
+        if layout not in PARTITION_LAYOUTS:
+            raise ValueError(f"layout ต้องเป็นหนึ่งใน {', '.join(PARTITION_LAYOUTS)}")
+        storage = storage or self.vector_storage
+        vector_type = vector_data_type(storage, dimension)
+        self.invalidate_collection(collection_name)
+        self._layout_overrides[collection_name] = layout
 
         fields = [
             FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-            FieldSchema(name="file_id", dtype=DataType.VARCHAR, max_length=200),
+            FieldSchema(
+                name="file_id",
+                dtype=DataType.VARCHAR,
+                max_length=200,
+                is_partition_key=layout == "partition_key"
+            ),
             FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dimension),
+            FieldSchema(name="embedding", dtype=vector_type, dim=dimension),
             FieldSchema(name="metadata", dtype=DataType.JSON)
         ]
 
@@ -71,39 +521,170 @@ class MilvusService:
             description=description
         )
 
-        collection = Collection(
+        options = {}
+        if layout == "partition_key":
+            options["num_partitions"] = config.MILVUS_PARTITION_KEY_PARTITIONS
+
+        return Collection(
             name=collection_name,
             schema=schema,
-            using='default'
+            using=self.aliases[0],
+            **options
         )
 
-        return collection
+    async def _collection_exists(self, collection_name: str) -> bool:
+        """ตรวจสอบว่ามี collection นี้อยู่ใน Milvus หรือไม่"""
+        return await self._run(utility.has_collection, collection_name, using=self._next_alias())
+
+    async def ensure_collection(
+        self,
+        collection_name: str,
+        dimension: int,
+        description: str = ""
+    ) -> Collection:
+        """
+        คืน collection ที่มีอยู่ หรือสร้างใหม่พร้อม index ถ้ายังไม่มี
+        
+        Args:
+            collection_name: ชื่อของ collection
+            dimension: ขนาดมิติของ vector
+            description: คำอธิบาย collection (optional)
+            
+        Returns:
+            Collection object
+        """
+        return await self._run(self._ensure_collection, collection_name, dimension, description)
+
+    def _ensure_collection(self, collection_name: str, dimension: int, description: str) -> Collection:
+        """
+        ตรวจสอบและสร้าง collection ทั้งหมดใน worker thread เดียวภายใต้ lock
+        lock จึงไม่ถูกถือข้าม await และ requests จากหลาย event loops ไม่สร้าง collection ซ้ำกัน
+        """
+        with self._create_lock:
+            if not utility.has_collection(collection_name, using=self.aliases[0]):
+                self._create_collection(collection_name, dimension, description, None, None)
+                # สร้าง scalar indexes ก่อน vector index เพราะการสร้าง vector index จะ load collection
+                self._create_scalar_indexes(collection_name, False)
+                self._build_index(collection_name, "embedding", None, "COSINE", None, None)
+        return self._collection(collection_name)
+
+    def server_version(self) -> Tuple[int, ...]:
+        """เวอร์ชันของ Milvus server เช่น (2, 3, 3)"""
+        if self._server_version is None:
+            version = utility.get_server_version(using=self.aliases[0])
+            self._server_version = tuple(int(part) for part in re.findall(r"\d+", version)[:3])
+        return self._server_version
+
+    async def ensure_scalar_indexes(self, collection_name: str, reload: bool = False) -> Dict[str, str]:
+        """
+        สร้าง scalar indexes ที่ยังไม่มี เพื่อให้การกรองด้วย file_id และ metadata ไม่ต้อง scan ทุกแถว
+        - file_id: MILVUS_SCALAR_INDEX_TYPE หรือ INVERTED (Milvus 2.4+) / Trie (Milvus 2.3)
+        - metadata: index ของแต่ละ path ใน MILVUS_METADATA_INDEX_PATHS (JSON path index ต้องใช้ Milvus 2.5+)
+        
+        Args:
+            collection_name: ชื่อของ collection
+            reload: release และ load collection ใหม่ให้ segments ที่ load อยู่ใช้ index ใหม่ทันที
+                (collection จะค้นหาไม่ได้ระหว่าง load)
+            
+        Returns:
+            สถานะของแต่ละ index: created, exists, unsupported หรือ failed พร้อมเหตุผล
+        """
+        return await self._run(self._create_scalar_indexes, collection_name, reload)
+
+    def _create_scalar_indexes(self, collection_name: str, reload: bool) -> Dict[str, str]:
+        collection = self._collection(collection_name)
+        existing = {index.index_name for index in collection.indexes}
+        existing |= {index.field_name for index in collection.indexes if index.field_name == "file_id"}
+        version = self.server_version()
+
+        targets = [(
+            "file_id",
+            "file_id",
+            {"index_type": config.MILVUS_SCALAR_INDEX_TYPE or ("INVERTED" if version >= (2, 4) else "Trie")}
+        )]
+        for path, cast_type in config.MILVUS_METADATA_INDEX_PATHS.items():
+            targets.append((
+                f"metadata_{path}",
+                "metadata",
+                {
+                    "index_type": "INVERTED",
+                    "params": {"json_path": f'metadata["{path}"]', "json_cast_type": cast_type}
+                }
+            ))
+
+        status: Dict[str, str] = {}
+        created = False
+        for index_name, field_name, index_params in targets:
+            if index_name in existing:
+                status[index_name] = "exists"
+                continue
+            if field_name == "metadata" and version < (2, 5):
+                status[index_name] = f"unsupported: JSON path index ต้องใช้ Milvus 2.5+ (server {'.'.join(map(str, version))})"
+                continue
+            try:
+                collection.create_index(field_name=field_name, index_params=index_params, index_name=index_name)
+                status[index_name] = "created"
+                created = True
+            except Exception as e:
+                status[index_name] = f"failed: {str(e)}"
+
+        if created and reload and self.residency.is_resident(collection_name):
+            collection.release()
+            collection.load()
+        return status
 
     async def create_index(
         self,
         collection_name: str,
         field_name: str = "embedding",
-        index_type: str = "IVF_FLAT",
+        profile: Optional[str] = None,
         metric_type: str = "COSINE",
-        params: Dict[str, Any] = {"nlist": 1024}
-    ) -> None:
+        index_type: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         สร้าง index สำหรับ vector field
         
         Args:
             collection_name: ชื่อของ collection
             field_name: ชื่อ field ที่ต้องการสร้าง index (default: "embedding")
-            index_type: ประเภทของ index (default: "IVF_FLAT")
+            profile: index profile (default: MILVUS_INDEX_PROFILES ของ collection หรือ MILVUS_INDEX_PROFILE)
+                params เช่น nlist ถูกคำนวณจากจำนวนแถวปัจจุบัน
             metric_type: วิธีการคำนวณระยะห่าง (default: "COSINE")
-            params: พารามิเตอร์เพิ่มเติมสำหรับ index
+            index_type: ระบุประเภท index เองแทน profile (optional)
+            params: พารามิเตอร์ของ index เมื่อระบุ index_type
+            
+        Returns:
+            index params ที่ใช้สร้าง
         """
-        collection = Collection(collection_name)
-        
-        index_params = {
-            "metric_type": metric_type,
-            "index_type": index_type,
-            "params": params
-        }
+        return await self._run(
+            self._build_index, collection_name, field_name, profile, metric_type, index_type, params
+        )
+
+    def _build_index(
+        self,
+        collection_name: str,
+        field_name: str,
+        profile: Optional[str],
+        metric_type: str,
+        index_type: Optional[str],
+        params: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        collection = self._collection(collection_name)
+
+        if index_type is None:
+            index_params = build_index_params(
+                profile or profile_for_collection(collection_name),
+                collection.num_entities,
+                metric_type,
+                self.storage_of(collection_name)
+            )
+        else:
+            index_params = {
+                "metric_type": metric_type,
+                "index_type": index_type,
+                "params": params or {}
+            }
 
         try:
             collection.create_index(
@@ -111,108 +692,538 @@ class MilvusService:
                 index_params=index_params
             )
             # Load collection เข้า memory เพื่อให้พร้อมใช้งาน
-            collection.load()
+            self._load(collection_name, collection, "index")
+            self._index_params[collection_name] = index_params
+            return index_params
         except Exception as e:
+            self.invalidate_collection(collection_name)
             raise Exception(f"ไม่สามารถสร้าง index ได้: {str(e)}")
 
+    async def rebuild_index(
+        self,
+        collection_name: str,
+        profile: Optional[str] = None,
+        field_name: str = "embedding"
+    ) -> Dict[str, Any]:
+        """
+        สร้าง index ใหม่ตาม profile และจำนวนแถวปัจจุบัน เช่น เมื่อ collection โตจนเกิน MILVUS_FLAT_MAX_ROWS
+        หรือ nlist เดิมไม่เหมาะกับจำนวนแถวแล้ว collection จะค้นหาไม่ได้ระหว่างสร้าง index ใหม่
+        
+        Args:
+            collection_name: ชื่อของ collection
+            profile: index profile ใหม่ (default: profile ที่ตั้งค่าไว้ของ collection)
+            field_name: ชื่อ vector field (default: "embedding")
+            
+        Returns:
+            index params ที่ใช้ และ rebuilt=False ถ้า index เดิมตรงกับ profile อยู่แล้ว
+        """
+        return await self._run(self._rebuild_index, collection_name, profile, field_name)
+
+    def _rebuild_index(self, collection_name: str, profile: Optional[str], field_name: str) -> Dict[str, Any]:
+        collection = self._collection(collection_name)
+        collection.flush()
+        current = self.index_params_of(collection_name, field_name)
+        metric_type = (current or {}).get("metric_type", "COSINE")
+        wanted = build_index_params(
+            profile or profile_for_collection(collection_name),
+            collection.num_entities,
+            metric_type,
+            self.storage_of(collection_name)
+        )
+        if current and current.get("index_type") == wanted["index_type"] and current.get("params") == wanted["params"]:
+            return {"rebuilt": False, "index_params": current}
+
+        try:
+            with self._residency_lock(collection_name):
+                collection.release()
+                self.residency.forget(collection_name)
+            self._update_residency_metrics()
+            for index in collection.indexes:
+                if index.field_name == field_name:
+                    index.drop()
+        except Exception as e:
+            self.invalidate_collection(collection_name)
+            raise Exception(f"ไม่สามารถลบ index เดิมได้: {str(e)}")
+
+        index_params = self._build_index(
+            collection_name, field_name, None, wanted["metric_type"], wanted["index_type"], wanted["params"]
+        )
+        return {"rebuilt": True, "index_params": index_params}
+
     async def insert_vectors(
         self,
         collection_name: str,
         file_ids: List[str],
         contents: List[str],
-        vectors: List[List[float]],
-        metadata_list: List[Dict] = None
+        vectors: VectorInput,
+        metadata_list: List[Dict] = None,
+        flush: bool = False,
+        timeout: Optional[float] = None
     ) -> List[int]:
         """
         เพิ่ม vectors และข้อมูลที่เกี่ยวข้องเข้าไปใน collection
+        ข้อมูลขนาดใหญ่จะถูกแบ่งเป็นหลายส่วนตาม MILVUS_INSERT_MAX_ROWS และ MILVUS_INSERT_MAX_BYTES
+        และส่งพร้อมกันหลายส่วน โดยไม่ block event loop ระหว่างรอ Milvus
+        ถ้าการรอถูกยกเลิก ส่วนที่ยังไม่เริ่มส่งจะถูกยกเลิกด้วย
         
         Args:
             collection_name: ชื่อของ collection
             file_ids: รายการของ file IDs
             contents: รายการของเนื้อหาข้อความ
-            vectors: รายการของ vectors
+            vectors: เมทริกซ์ float32 (แนะนำ) หรือรายการของ vectors
             metadata_list: รายการของ metadata (optional)
+            flush: seal ข้อมูลทันทีหลังเพิ่มเสร็จ (default: ปล่อยให้ Milvus seal เอง
+                เหมาะกับการนำเข้าจำนวนมากที่เรียก flush ครั้งเดียวตอนท้าย)
+            timeout: timeout ของการส่งแต่ละส่วน (default: MILVUS_TIMEOUT_SECONDS)
+                นับจากเริ่มส่ง ไม่รวมเวลารอคิวของ thread pool
             
         Returns:
-            รายการของ IDs ที่ถูกสร้างขึ้น
+            รายการของ IDs ที่ถูกสร้างขึ้น ตามลำดับของแถว
+
+        Raises:
+            BulkInsertError: ถ้ามีบางส่วนล้มเหลว พร้อม ids ของส่วนที่สำเร็จ
+                ส่วนที่หมดเวลาถูกนับว่าล้มเหลว แม้ Milvus อาจบันทึกไปแล้ว
         """
-        collection = Collection(collection_name)
+        vectors = as_vector_matrix(vectors)
         
         if metadata_list is None:
             metadata_list = [{} for _ in range(len(vectors))]
 
+        rpc_timeout = self._timeout(timeout)
+        storage = await self._run(self.storage_of, collection_name)
+        if await self._run(self.layout_of, collection_name) == "partition":
+            batches = self._plan_partitioned_batches(file_ids, contents, vectors, metadata_list)
+        else:
+            batches = [
+                (None, range(start, stop))
+                for start, stop in self._plan_insert_batches(file_ids, contents, vectors, metadata_list)
+            ]
+        outcomes = await asyncio.gather(*(
+            self._run(
+                self._insert_rows,
+                collection_name,
+                [_take(file_ids, rows), _take(contents, rows), _take(vectors, rows), _take(metadata_list, rows)],
+                partition_name,
+                rpc_timeout,
+                storage,
+                executor=self._insert_executor
+            )
+            for partition_name, rows in batches
+        ), return_exceptions=True)
+
+        ids_by_row: List[Optional[int]] = [None] * len(vectors)
+        failed_rows: List[int] = []
+        errors: List[str] = []
+        for (_, rows), outcome in zip(batches, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                failed_rows.extend(rows)
+                errors.append(str(outcome))
+            else:
+                for row, primary_key in zip(rows, outcome):
+                    ids_by_row[row] = primary_key
+        inserted_ids = [primary_key for primary_key in ids_by_row if primary_key is not None]
+
+        if storage != "float" and inserted_ids:
+            # เก็บ vectors เต็มความละเอียดของแถวที่เพิ่มสำเร็จไว้สำหรับ re-score
+            inserted_rows = [row for row, primary_key in enumerate(ids_by_row) if primary_key is not None]
+            await self._run(self.full_vectors.add, collection_name, inserted_ids, vectors[inserted_rows])
+
+        if failed_rows:
+            self.invalidate_collection(collection_name)
+            failed_ranges = _contiguous_ranges(failed_rows)
+            raise BulkInsertError(
+                f"ไม่สามารถเพิ่ม vectors ได้ {len(failed_rows)} จาก {len(vectors)} แถว: {errors[0]}",
+                inserted_ids,
+                failed_ranges,
+                errors
+            )
+
+        if flush:
+            await self.flush(collection_name, timeout=timeout)
+        return inserted_ids
+
+    def _plan_insert_batches(
+        self,
+        file_ids: List[str],
+        contents: List[str],
+        vectors: np.ndarray,
+        metadata_list: List[Dict]
+    ) -> List[Tuple[int, int]]:
+        """แบ่งแถวเป็นช่วง [start, stop) ที่แต่ละช่วงไม่เกินจำนวนแถวและขนาดข้อมูลที่กำหนด"""
+        vector_bytes = vectors.shape[1] * vectors.itemsize if vectors.ndim == 2 else 0
+        ranges: List[Tuple[int, int]] = []
+        start = 0
+        batch_bytes = 0
+        for row in range(len(vectors)):
+            row_bytes = (
+                vector_bytes
+                + len(contents[row].encode("utf-8"))
+                + len(file_ids[row].encode("utf-8"))
+                + len(json.dumps(metadata_list[row]))
+                + 16  # primary key และ overhead ของแต่ละแถว
+            )
+            if row > start and (
+                row - start >= self.insert_max_rows
+                or batch_bytes + row_bytes > self.insert_max_bytes
+            ):
+                ranges.append((start, row))
+                start, batch_bytes = row, 0
+            batch_bytes += row_bytes
+        if start < len(vectors):
+            ranges.append((start, len(vectors)))
+        return ranges
+
+    def _plan_partitioned_batches(
+        self,
+        file_ids: List[str],
+        contents: List[str],
+        vectors: np.ndarray,
+        metadata_list: List[Dict]
+    ) -> List[Tuple[str, List[int]]]:
+        """จัดกลุ่มแถวตาม partition ของเอกสาร แล้วแบ่งแต่ละกลุ่มตามขนาดเหมือน _plan_insert_batches"""
+        groups: Dict[str, List[int]] = {}
+        for row, file_id in enumerate(file_ids):
+            groups.setdefault(partition_name_for(file_id, self.partition_group_separator), []).append(row)
+
+        batches: List[Tuple[str, List[int]]] = []
+        for partition_name, rows in groups.items():
+            ranges = self._plan_insert_batches(
+                _take(file_ids, rows), _take(contents, rows), _take(vectors, rows), _take(metadata_list, rows)
+            )
+            batches.extend((partition_name, rows[start:stop]) for start, stop in ranges)
+        return batches
+
+    def _insert_rows(
+        self,
+        collection_name: str,
+        columns: List,
+        partition_name: Optional[str] = None,
+        timeout: Optional[float] = None,
+        storage: str = "float"
+    ) -> List[int]:
+        """insert หนึ่งส่วนใน worker thread บน connection alias ถัดไป"""
+        collection = self._collection(collection_name)
+        if partition_name:
+            self._ensure_partition(collection_name, partition_name)
+        columns = [*columns[:2], encode_vectors(columns[2], storage), *columns[3:]]
+        return list(collection.insert(columns, partition_name=partition_name, timeout=timeout).primary_keys)
+
+    async def flush(self, collection_name: str, timeout: Optional[float] = None) -> None:
+        """
+        seal ข้อมูลที่เพิ่มล่าสุดของ collection ให้ถูกบันทึกถาวรและนับใน num_entities
+        
+        Args:
+            collection_name: ชื่อของ collection
+            timeout: เวลารอสูงสุด (default: MILVUS_TIMEOUT_SECONDS)
+        """
+        rpc_timeout = self._timeout(timeout)
         try:
-            mr = collection.insert([
-                file_ids,
-                contents,
-                vectors,
-                metadata_list
-            ])
-            return mr.primary_keys
+            collection = await self._run(self._collection, collection_name)
+            await self._run(collection.flush, timeout=rpc_timeout, deadline=rpc_timeout)
+        except TimeoutError:
+            raise
         except Exception as e:
-            raise Exception(f"ไม่สามารถเพิ่ม vectors ได้: {str(e)}")
+            self.invalidate_collection(collection_name)
+            raise Exception(f"ไม่สามารถ flush collection ได้: {str(e)}")
 
     async def search_vectors(
         self,
         collection_name: str,
-        query_vectors: List[List[float]],
+        query_vectors: VectorInput,
         limit: int = 10,
         field_name: str = "embedding",
         output_fields: List[str] = None,
-        filter_expr: str = None
+        filter_expr: str = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
     ) -> List[Dict[str, Any]]:
         """
         ค้นหา vectors ที่ใกล้เคียงที่สุด
+        ผลลัพธ์ของทุก query ถูกรวมเป็นรายการเดียว ใช้ search_vectors_batch เมื่อต้องแยกผลลัพธ์ตาม query
         
         Args:
             collection_name: ชื่อของ collection
-            query_vectors: vectors ที่ต้องการค้นหา
+            query_vectors: เมทริกซ์ float32 หรือรายการของ vectors ที่ต้องการค้นหา
             limit: จำนวนผลลัพธ์ที่ต้องการ (default: 10)
             field_name: ชื่อ field ที่ต้องการค้นหา (default: "embedding")
             output_fields: รายการ fields ที่ต้องการในผลลัพธ์
             filter_expr: expression สำหรับกรองผลลัพธ์
+            search_params: search params ของคำขอนี้ เช่น {"nprobe": 32} หรือ {"ef": 128}
+            timeout: เวลารอสูงสุด (default: MILVUS_TIMEOUT_SECONDS)
             
         Returns:
             รายการของผลการค้นหา พร้อมระยะห่างและข้อมูลที่เกี่ยวข้อง
         """
-        collection = Collection(collection_name)
-        collection.load()  # Make sure collection is loaded
+        groups = await self.search_vectors_batch(
+            collection_name,
+            query_vectors,
+            limit=limit,
+            field_name=field_name,
+            output_fields=output_fields,
+            filter_expr=filter_expr,
+            search_params=search_params,
+            timeout=timeout
+        )
+        return [result for group in groups for result in group]
 
-        search_params = {
-            "metric_type": "COSINE",
-            "params": {"nprobe": 16}
-        }
+    async def search_vectors_batch(
+        self,
+        collection_name: str,
+        query_vectors: VectorInput,
+        limit: int = 10,
+        field_name: str = "embedding",
+        output_fields: List[str] = None,
+        filter_expr: str = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        ค้นหาหลาย queries ในคำขอเดียวไปยัง Milvus และคืนผลลัพธ์แยกตาม query
+        
+        Args:
+            collection_name: ชื่อของ collection
+            query_vectors: เมทริกซ์ float32 ขนาด (จำนวน queries, มิติ) หรือรายการของ vectors
+            limit: จำนวนผลลัพธ์ที่ต้องการต่อ query (default: 10)
+            field_name: ชื่อ field ที่ต้องการค้นหา (default: "embedding")
+            output_fields: รายการ fields ที่ต้องการในผลลัพธ์
+            filter_expr: expression สำหรับกรองผลลัพธ์ (ใช้กับทุก query)
+            search_params: search params ของคำขอนี้ แทนที่ค่าของ collection ใน MILVUS_SEARCH_PARAMS
+            timeout: เวลารอสูงสุดรวมเวลารอคิว (default: MILVUS_TIMEOUT_SECONDS) เกินแล้วได้ TimeoutError
+            
+        Returns:
+            รายการของกลุ่มผลลัพธ์ กลุ่มที่ i เป็นผลลัพธ์ของ query แถวที่ i เรียงจากใกล้ที่สุด
+            score คือ cosine similarity (ค่ามากกว่าดีกว่า) และ distance คือ 1 - score ทุกรูปแบบการเก็บ
+            ผลลัพธ์ของ collection ที่บีบอัดถูก re-score ด้วย vectors เต็มความละเอียด
+        """
+        query_matrix = as_vector_matrix(query_vectors)
+        if len(query_matrix) == 0:
+            return []
 
+        rpc_timeout = self._timeout(timeout)
         try:
+            return await self._run(
+                self._search,
+                collection_name,
+                query_matrix,
+                limit,
+                field_name,
+                output_fields,
+                filter_expr,
+                search_params,
+                rpc_timeout,
+                deadline=rpc_timeout
+            )
+        except TimeoutError:
+            raise
+        except Exception as e:
+            self.invalidate_collection(collection_name)
+            raise Exception(f"ไม่สามารถค้นหา vectors ได้: {str(e)}")
+
+    def _search(
+        self,
+        collection_name: str,
+        query_matrix: np.ndarray,
+        limit: int,
+        field_name: str,
+        output_fields: Optional[List[str]],
+        filter_expr: Optional[str],
+        search_params: Optional[Dict[str, Any]],
+        timeout: Optional[float]
+    ) -> List[List[Dict[str, Any]]]:
+        """ค้นหาใน worker thread"""
+        storage = self.storage_of(collection_name)
+        # collection ที่บีบอัดค้นหา candidates มากกว่า limit แล้ว re-score ด้วย vectors เต็มความละเอียด
+        reranked = storage != "float" and self.rerank_factor > 0
+        candidates = min(limit * self.rerank_factor, 16384) if reranked else limit
+        # load เฉพาะเมื่อยังไม่ได้ load ไม่ต้องเรียก load ทุกครั้งที่ค้นหา
+        with self._resident(collection_name) as collection:
+            param = build_search_params(
+                collection_name,
+                self.index_params_of(collection_name, field_name),
+                candidates,
+                search_params
+            )
             results = collection.search(
-                data=query_vectors,
+                data=encode_vectors(query_matrix, storage),
                 anns_field=field_name,
-                param=search_params,
-                limit=limit,
+                param=param,
+                limit=candidates,
                 output_fields=output_fields,
-                expr=filter_expr
+                expr=filter_expr,
+                partition_names=self._route_partitions(collection_name, filter_expr),
+                timeout=timeout
             )
+        groups = [
+            [self._hit_to_dict(hit, output_fields, param["metric_type"], query_matrix.shape[1]) for hit in hits]
+            for hits in results
+        ]
+        if reranked:
+            groups = rerank(query_matrix, groups, lambda ids: self.full_vectors.get(collection_name, ids), limit)
+        return groups
+
+    @staticmethod
+    def _hit_to_dict(hit, output_fields: Optional[List[str]], metric_type: str, dimension: int) -> Dict[str, Any]:
+        """แปลงผลการค้นหาหนึ่งรายการเป็น dictionary โดย score คือ similarity ตาม similarity_score"""
+        result = with_score({"id": hit.id}, similarity_score(hit.distance, metric_type, dimension))
+        
+        # Add output fields if available
+        if output_fields:
+            for field in output_fields:
+                result[field] = hit.entity.get(field)
+        return result
 
-            search_results = []
-            for hits in results:
-                for hit in hits:
-                    result = {
-                        "id": hit.id,
-                        "distance": hit.distance,
-                        "score": 1 - hit.distance  # Convert distance to similarity score
-                    }
-                    
-                    # Add output fields if available
-                    if output_fields:
-                        for field in output_fields:
-                            result[field] = hit.entity.get(field)
-                            
-                    search_results.append(result)
-
-            return search_results
+    async def query_entities(
+        self,
+        collection_name: str,
+        filter_expr: str,
+        output_fields: List[str] = None,
+        batch_size: int = 1000,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        ดึง entities ทั้งหมดที่ตรงกับ filter โดยอ่านทีละ batch ด้วย query iterator
+        จึงไม่ติดข้อจำกัดจำนวนแถวต่อ query ของ Milvus
+        
+        Args:
+            collection_name: ชื่อของ collection
+            filter_expr: expression สำหรับกรอง เช่น 'file_id == "doc-1"'
+            output_fields: รายการ fields ที่ต้องการ (primary key ถูกคืนเสมอ)
+            batch_size: จำนวนแถวต่อการอ่านหนึ่งครั้ง
+            timeout: เวลารอสูงสุดของการดึงข้อมูลทั้งหมดรวมเวลารอคิว (default: MILVUS_TIMEOUT_SECONDS)
+                เกินแล้วได้ TimeoutError และการอ่าน batch ถัดไปถูกยกเลิก
             
+        Returns:
+            รายการของ entities ในรูปแบบ dictionary
+        """
+        cancel_event = threading.Event()
+        rpc_timeout = self._timeout(timeout)
+        try:
+            return await self._run(
+                self._query,
+                collection_name,
+                filter_expr,
+                output_fields,
+                batch_size,
+                rpc_timeout,
+                cancel_event,
+                deadline=rpc_timeout,
+                cancel_event=cancel_event
+            )
+        except TimeoutError:
+            raise
         except Exception as e:
-            raise Exception(f"ไม่สามารถค้นหา vectors ได้: {str(e)}")
+            self.invalidate_collection(collection_name)
+            raise Exception(f"ไม่สามารถดึงข้อมูลจาก collection ได้: {str(e)}")
+
+    def _query(
+        self,
+        collection_name: str,
+        filter_expr: str,
+        output_fields: Optional[List[str]],
+        batch_size: int,
+        timeout: Optional[float],
+        cancel_event: threading.Event
+    ) -> List[Dict[str, Any]]:
+        """อ่าน entities ทีละ batch ใน worker thread และหยุดเมื่อผู้เรียกยกเลิก"""
+        with self._resident(collection_name) as collection:
+            iterator = collection.query_iterator(
+                batch_size=batch_size,
+                expr=filter_expr,
+                output_fields=output_fields,
+                partition_names=self._route_partitions(collection_name, filter_expr),
+                timeout=timeout
+            )
+            entities: List[Dict[str, Any]] = []
+            try:
+                while not cancel_event.is_set():
+                    batch = iterator.next()
+                    if not batch:
+                        break
+                    entities.extend(batch)
+            finally:
+                iterator.close()
+        return entities
+
+    async def fetch_vectors(
+        self,
+        collection_name: str,
+        ids: List[int],
+        field_name: str = "embedding"
+    ) -> np.ndarray:
+        """
+        ดึง vectors ที่เก็บไว้ตาม primary keys
+        
+        Args:
+            collection_name: ชื่อของ collection
+            ids: รายการ primary keys
+            field_name: ชื่อ vector field (default: "embedding")
+            
+        Returns:
+            เมทริกซ์ float32 ที่แถวเรียงตามลำดับของ ids
+        """
+        if not ids:
+            return np.empty((0, 0), dtype=np.float32)
+
+        if await self._run(self.storage_of, collection_name) != "float":
+            # vectors ใน Milvus ถูกบีบอัด จึงอ่านจากที่เก็บเต็มความละเอียด
+            by_id = await self._run(self.full_vectors.get, collection_name, list(ids))
+            missing = [i for i in ids if i not in by_id]
+            if missing:
+                raise Exception(f"ไม่พบ vectors ของ ids: {missing[:10]}")
+            return as_vector_matrix([by_id[i] for i in ids])
+
+        entities = await self.query_entities(
+            collection_name,
+            f"id in {list(map(int, ids))}",
+            output_fields=[field_name]
+        )
+        by_id = {entity["id"]: entity[field_name] for entity in entities}
+        missing = [i for i in ids if i not in by_id]
+        if missing:
+            raise Exception(f"ไม่พบ vectors ของ ids: {missing[:10]}")
+        return as_vector_matrix([by_id[i] for i in ids])
+
+    async def delete_entities(
+        self,
+        collection_name: str,
+        ids: List[int],
+        batch_size: int = 1000,
+        timeout: Optional[float] = None
+    ) -> int:
+        """
+        ลบ entities ตาม primary keys โดยแบ่งเป็นหลาย expression เพื่อไม่ให้ expression ยาวเกินไป
+        ถ้าถูกยกเลิกระหว่างทาง batch ที่ลบไปแล้วจะไม่ถูกย้อนกลับ
+        
+        Args:
+            collection_name: ชื่อของ collection
+            ids: รายการ primary keys ที่ต้องการลบ
+            batch_size: จำนวน ids ต่อการลบหนึ่งครั้ง
+            timeout: timeout ของการลบแต่ละ batch (default: MILVUS_TIMEOUT_SECONDS)
+            
+        Returns:
+            จำนวน entities ที่ลบ
+        """
+        rpc_timeout = self._timeout(timeout)
+        deleted = 0
+        try:
+            collection = await self._run(self._collection, collection_name)
+            compressed = await self._run(self.storage_of, collection_name) != "float"
+            for start in range(0, len(ids), batch_size):
+                batch = [int(i) for i in ids[start:start + batch_size]]
+                result = await self._run(
+                    collection.delete, f"id in {batch}", timeout=rpc_timeout, deadline=rpc_timeout
+                )
+                deleted += result.delete_count
+                if compressed:
+                    await self._run(self.full_vectors.delete, collection_name, batch)
+            return deleted
+        except TimeoutError:
+            raise
+        except Exception as e:
+            self.invalidate_collection(collection_name)
+            raise Exception(f"ไม่สามารถลบ entities ได้: {str(e)}")
 
     async def drop_collection(self, collection_name: str) -> None:
         """
@@ -222,9 +1233,15 @@ class MilvusService:
             collection_name: ชื่อของ collection ที่ต้องการลบ
         """
         try:
-            utility.drop_collection(collection_name)
+            await self._run(utility.drop_collection, collection_name, using=self._next_alias())
+            if os.path.exists(config.FULL_VECTOR_STORE_PATH):
+                await self._run(self.full_vectors.drop, collection_name)
         except Exception as e:
             raise Exception(f"ไม่สามารถลบ collection ได้: {str(e)}")
+        finally:
+            self.invalidate_collection(collection_name)
+            self.residency.forget(collection_name)
+            self._update_residency_metrics()
 
     async def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
         """
@@ -236,13 +1253,212 @@ class MilvusService:
         Returns:
             ข้อมูลสถิติของ collection
         """
-        collection = Collection(collection_name)
         try:
-            stats = {
-                "row_count": collection.num_entities,
-                "index_status": collection.indexes,
-                "description": collection.schema.description
-            }
-            return stats
+            return await self._run(self._collection_stats, collection_name)
         except Exception as e:
-            raise Exception(f"ไม่สามารถดึงข้อมูลสถิติได้: {str(e)}")
\ No newline at end of file
+            self.invalidate_collection(collection_name)
+            raise Exception(f"ไม่สามารถดึงข้อมูลสถิติได้: {str(e)}")
+
+    def _collection_stats(self, collection_name: str) -> Dict[str, Any]:
+        """อ่านสถิติใน worker thread (num_entities และ indexes เป็น RPC) และแปลง indexes เป็น dictionary ที่แปลงเป็น JSON ได้"""
+        collection = self._collection(collection_name)
+        return {
+            "row_count": collection.num_entities,
+            "index_status": [
+                {"field": index.field_name, "params": dict(index.params)}
+                for index in collection.indexes
+            ],
+            "description": collection.schema.description
+        }
+
+    def residency_stats(self) -> Dict[str, Any]:
+        """collections ที่ load อยู่ หน่วยความจำที่ประมาณไว้ และสถิติ hit, miss และการ release"""
+        return self.residency.snapshot()
+
+    async def preload_collections(self, collection_names: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        load collections ไว้ล่วงหน้าก่อนถูกค้นหา
+        
+        Args:
+            collection_names: collections ที่ต้องการ load (อาจ release collections อื่นเพื่อให้อยู่ใน budget)
+                ถ้าไม่ระบุ ใช้ MILVUS_PRELOAD_COLLECTIONS แล้วตามด้วย collections ที่ถูกใช้งานบ่อยที่สุด
+                ซึ่ง load เฉพาะเมื่อยังมีหน่วยความจำเหลือใน budget
+            
+        Returns:
+            สถานะของแต่ละ collection: loaded, resident, missing, skipped หรือ failed
+        """
+        status: Dict[str, str] = {}
+        explicit = collection_names if collection_names is not None else config.MILVUS_PRELOAD_COLLECTIONS
+        for name in explicit:
+            status[name] = await self._run(self._preload, name, False)
+        if collection_names is None:
+            for name in self.residency.hot():
+                if name not in status:
+                    status[name] = await self._run(self._preload, name, True)
+        return status
+
+    def _preload(self, collection_name: str, only_if_fits: bool) -> str:
+        if self.residency.is_resident(collection_name):
+            return "resident"
+        try:
+            if not utility.has_collection(collection_name, using=self._next_alias()):
+                return "missing"
+            collection = self._collection(collection_name)
+            if only_if_fits and not self.residency.fits(self._footprint(collection_name, collection)):
+                return "skipped: เกิน budget"
+            self._load(collection_name, collection, "preload")
+            return "loaded"
+        except Exception as e:
+            self.invalidate_collection(collection_name)
+            return f"failed: {str(e)}"
+
+    def start_preload(self) -> None:
+        """load MILVUS_PRELOAD_COLLECTIONS ใน background thread เพื่อไม่ให้การเริ่ม server ต้องรอ"""
+        if self._preload_thread is not None:
+            return
+        self._preload_thread = threading.Thread(
+            target=lambda: asyncio.run(self.preload_collections()), name="milvus-preload", daemon=True
+        )
+        self._preload_thread.start()
+
+    async def release_idle_collections(self, idle_seconds: float) -> List[str]:
+        """
+        release collections ที่ไม่ถูกค้นหานานกว่า idle_seconds
+        
+        Returns:
+            ชื่อ collections ที่ถูก release
+        """
+        released = []
+        for name in self.residency.idle(idle_seconds):
+            if await self._run(self._release, name, "idle"):
+                released.append(name)
+        self._update_residency_metrics()
+        return released
+
+    async def migrate_collection_layout(
+        self,
+        collection_name: str,
+        layout: str,
+        batch_size: int = 1000,
+        storage: Optional[str] = None,
+        keyword_index: Optional[KeywordIndex] = None
+    ) -> Dict[str, Any]:
+        """
+        ย้ายข้อมูลของ collection ไปยัง partition layout หรือรูปแบบการเก็บ vectors ใหม่
+        คัดลอกทุกแถว (รวม vectors เดิม ไม่ต้อง embed ใหม่) ไปยัง collection ชั่วคราวที่สร้างด้วย layout ใหม่
+        ตรวจสอบจำนวนแถว แล้วสลับชื่อ collection เดิมไปเป็น backup
+        primary keys ของทุกแถวจะเปลี่ยน เพราะ collection ใช้ auto_id
+        keyword index จึงถูกสร้างใหม่ด้วย ids ใหม่ระหว่างคัดลอก และสลับชื่อพร้อมกับ collection
+        
+        Args:
+            collection_name: ชื่อของ collection
+            layout: รูปแบบ partition ใหม่ (none, partition หรือ partition_key)
+            batch_size: จำนวนแถวต่อการอ่านและเพิ่มหนึ่งครั้ง
+            storage: รูปแบบการเก็บ vectors ใหม่ (default: รูปแบบเดิมของ collection)
+            keyword_index: keyword index ที่อ้างอิง primary keys ของ collection นี้ (optional)
+            
+        Returns:
+            จำนวนแถวที่ย้าย และชื่อ collection backup
+        """
+        if layout not in PARTITION_LAYOUTS:
+            raise ValueError(f"layout ต้องเป็นหนึ่งใน {', '.join(PARTITION_LAYOUTS)}")
+        if storage is not None and storage not in VECTOR_STORAGES:
+            raise ValueError(f"storage ต้องเป็นหนึ่งใน {', '.join(VECTOR_STORAGES)}")
+        alias = self.aliases[0]
+        target_name = f"{collection_name}_migrating"
+        backup_name = f"{collection_name}_backup_{int(time.time())}"
+
+        # pin collection ต้นทางไว้ไม่ให้ถูก release เพื่อคืนหน่วยความจำระหว่างคัดลอก
+        source_residency = self._resident(collection_name)
+        source = await self._run(source_residency.__enter__)
+        try:
+            await self._run(source.flush)
+            embedding_field = next(field for field in source.schema.fields if field.name == "embedding")
+            dimension = embedding_field.params["dim"]
+            source_storage = await self._run(self.storage_of, collection_name)
+            storage = storage or source_storage
+            # vectors ที่บีบอัดใน Milvus ถูกแทนด้วย vectors เต็มความละเอียดจากที่เก็บแยก
+            fields = ["file_id", "content", "metadata"]
+            if source_storage == "float":
+                fields.append("embedding")
+
+            # collection ชั่วคราวที่ค้างจากการ migrate ครั้งก่อนที่ล้มเหลว
+            if await self._run(utility.has_collection, target_name, using=alias):
+                await self.drop_collection(target_name)
+            if keyword_index is not None:
+                await self._run(keyword_index.drop, target_name)
+            await self.create_collection(
+                target_name, dimension, source.schema.description, layout=layout, storage=storage
+            )
+
+            copied = 0
+            try:
+                iterator = await self._run(
+                    source.query_iterator, batch_size=batch_size, expr="id >= 0", output_fields=fields
+                )
+                try:
+                    while True:
+                        batch = await self._run(iterator.next)
+                        if not batch:
+                            break
+                        if source_storage == "float":
+                            embeddings = [row["embedding"] for row in batch]
+                        else:
+                            embeddings = await self.fetch_vectors(collection_name, [row["id"] for row in batch])
+                        file_ids = [row["file_id"] for row in batch]
+                        contents = [row["content"] for row in batch]
+                        ids = await self.insert_vectors(
+                            target_name, file_ids, contents, embeddings, [row["metadata"] for row in batch]
+                        )
+                        if keyword_index is not None:
+                            await self._run(keyword_index.add, target_name, file_ids, ids, contents)
+                        copied += len(batch)
+                finally:
+                    iterator.close()
+
+                await self.flush(target_name)
+                await self.ensure_scalar_indexes(target_name)
+                await self.create_index(target_name, profile=profile_for_collection(collection_name))
+                target = await self._run(self._collection, target_name)
+                target_rows = await self._run(lambda: target.num_entities)
+                source_rows = await self._run(lambda: source.num_entities)
+                if target_rows != source_rows:
+                    raise Exception(
+                        f"จำนวนแถวไม่ตรงกัน: ต้นทาง {source_rows} ปลายทาง {target_rows}"
+                    )
+            except Exception:
+                await self.drop_collection(target_name)
+                if keyword_index is not None:
+                    await self._run(keyword_index.drop, target_name)
+                raise
+
+            await self._run(utility.rename_collection, collection_name, backup_name, using=alias)
+            await self._run(utility.rename_collection, target_name, collection_name, using=alias)
+            if source_storage != "float":
+                await self._run(self.full_vectors.rename, collection_name, backup_name)
+            if storage != "float":
+                await self._run(self.full_vectors.rename, target_name, collection_name)
+            if keyword_index is not None:
+                await self._run(keyword_index.rename, collection_name, backup_name)
+                await self._run(keyword_index.rename, target_name, collection_name)
+        finally:
+            source_residency.__exit__(None, None, None)
+        for name in (collection_name, target_name, backup_name):
+            self.invalidate_collection(name)
+            self.residency.forget(name)
+        self._layout_overrides.pop(target_name, None)
+        self._layout_overrides[collection_name] = layout
+        # collection backup ไม่ถูกค้นหาแล้ว จึงคืนหน่วยความจำ ส่วน collection ใหม่ถูกนับเมื่อถูกใช้งานครั้งถัดไป
+        try:
+            await self._run(lambda: self._collection(backup_name).release())
+        except Exception as e:
+            logger.warning("ไม่สามารถ release collection %s ได้: %s", backup_name, e)
+        self._update_residency_metrics()
+
+        return {
+            "collection": collection_name,
+            "layout": layout,
+            "storage": storage,
+            "rows": copied,
+            "backup_collection": backup_name
+        }
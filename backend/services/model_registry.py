@@ -0,0 +1,138 @@
+# services/model_registry.py
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.monitoring import MODEL_LOAD_TIME, MODEL_WARMUP_TIME
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    ที่เก็บโมเดลร่วมกันทั้ง process
+    โมเดลจะถูกโหลดเมื่อถูกเรียกใช้ครั้งแรกเท่านั้น และโหลดเพียงครั้งเดียวแม้ถูกเรียกพร้อมกันจากหลาย threads
+    การ import แอปพลิเคชันจึงไม่ต้องรอโหลดโมเดลและไม่ใช้หน่วยความจำจนกว่าจะต้องใช้จริง
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._load_times: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+        # warmup hooks ที่ต้องรันให้เสร็จก่อนที่ service จะพร้อมรับ requests
+        self._warmups: Dict[str, Callable[[], Any]] = {}
+        self._warmup_status: Dict[str, Dict] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        คืนโมเดลตาม key โดยเรียก loader เพื่อโหลดเมื่อยังไม่เคยโหลด
+        
+        Args:
+            key: ชื่อที่ใช้ระบุโมเดล เช่น "sentence-transformer:all-MiniLM-L6-v2"
+            loader: ฟังก์ชันที่โหลดและคืนโมเดล
+            
+        Returns:
+            instance ของโมเดลที่ใช้ร่วมกันทั้ง process
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._registry_lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+            model = self._models.get(key)
+            if model is None:
+                started = time.perf_counter()
+                model = loader()
+                elapsed = time.perf_counter() - started
+                self._models[key] = model
+                self._load_times[key] = elapsed
+                MODEL_LOAD_TIME.labels(model=key).set(elapsed)
+                logger.info(f"Loaded model {key} in {elapsed:.2f}s")
+        return model
+
+    def is_loaded(self, key: str) -> bool:
+        """ตรวจสอบว่าโมเดลถูกโหลดแล้วหรือยัง"""
+        return key in self._models
+
+    def register_warmup(self, name: str, warmup: Callable[[], Any]) -> None:
+        """
+        ลงทะเบียนฟังก์ชัน warmup เช่นการ encode หรือ generate ข้อความสั้นๆ
+        ฟังก์ชันเดียวกันที่ลงทะเบียนซ้ำด้วยชื่อเดิมจะถูกแทนที่
+        """
+        with self._registry_lock:
+            self._warmups[name] = warmup
+            self._warmup_status.setdefault(name, {"status": "pending"})
+
+    def run_warmup(self) -> Dict[str, Dict]:
+        """
+        รัน warmup ทุกตัวที่ลงทะเบียนไว้ตามลำดับ
+        ความล้มเหลวของตัวหนึ่งไม่หยุดตัวอื่น แต่จะทำให้ service ไม่อยู่ในสถานะพร้อม
+        
+        Returns:
+            สถานะของ warmup แต่ละตัว
+        """
+        with self._registry_lock:
+            warmups = list(self._warmups.items())
+
+        for name, warmup in warmups:
+            self._warmup_status[name] = {"status": "running"}
+            started = time.perf_counter()
+            try:
+                warmup()
+                elapsed = time.perf_counter() - started
+                MODEL_WARMUP_TIME.labels(model=name).set(elapsed)
+                self._warmup_status[name] = {"status": "ready", "seconds": round(elapsed, 3)}
+            except Exception as e:
+                logger.exception(f"Warmup of {name} failed")
+                self._warmup_status[name] = {"status": "failed", "error": str(e)}
+        return self.warmup_status()
+
+    def start_warmup(self) -> None:
+        """รัน warmup ใน background thread เพื่อไม่ให้การเริ่ม server ต้องรอโหลดโมเดล"""
+        with self._registry_lock:
+            if self._warmup_thread is not None:
+                return
+            self._warmup_thread = threading.Thread(
+                target=self.run_warmup, name="model-warmup", daemon=True
+            )
+        self._warmup_thread.start()
+
+    def warmup_status(self) -> Dict[str, Dict]:
+        """สถานะของ warmup แต่ละตัว: pending, running, ready หรือ failed"""
+        return {name: dict(status) for name, status in self._warmup_status.items()}
+
+    def is_ready(self) -> bool:
+        """service พร้อมเมื่อ warmup ทุกตัวที่ลงทะเบียนไว้ทำงานสำเร็จ"""
+        return all(status["status"] == "ready" for status in self._warmup_status.values())
+
+    def loaded_models(self) -> List[str]:
+        return list(self._models)
+
+
+# instance เดียวที่ใช้ร่วมกันทั้ง process
+model_registry = ModelRegistry()
+
+
+def get_sentence_transformer(model_name: str):
+    """โหลด SentenceTransformer ครั้งแรกที่ถูกเรียก แล้วใช้ instance เดิมในครั้งต่อไป"""
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    return model_registry.get(f"sentence-transformer:{model_name}", load)
+
+
+def get_llama(model_path: str, **kwargs):
+    """โหลดโมเดล GGUF ด้วย llama.cpp ครั้งแรกที่ถูกเรียก แล้วใช้ instance เดิมในครั้งต่อไป"""
+    def load():
+        from llama_cpp import Llama
+        return Llama(model_path=model_path, **kwargs)
+
+    return model_registry.get(f"llama:{model_path}", load)
@@ -1,35 +1,270 @@
 # services/pdf_service.py
 from pypdf import PdfReader
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Iterable, Iterator, AsyncIterator, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 import numpy as np
+import asyncio
+import atexit
+import io
+import itertools
+import os
+import tempfile
+import threading
+from core.config import config
+from services.embedding_worker import EmbeddingWorker
+from services.embedding_backends import get_embedding_backend
+from services.text_chunker import TextChunker
+from utils.embedding_cache import EmbeddingCache
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """
+    แปลง embeddings เป็นเมทริกซ์ float32 แบบ C-contiguous และ normalize ให้แต่ละแถวมีความยาวเท่ากับ 1
+    """
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+# ไฟล์ PDF ระบุได้ทั้งพาธบนดิสก์ หรือข้อมูลของไฟล์ในหน่วยความจำ (เช่น buffer ของไฟล์อัพโหลด)
+PdfSource = Union[str, bytes, memoryview]
+
+
+def open_pdf(source: PdfSource) -> PdfReader:
+    """เปิด PdfReader จากพาธของไฟล์ หรือจากข้อมูลในหน่วยความจำโดยไม่ต้องเขียนลงดิสก์"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return PdfReader(io.BytesIO(source))
+    return PdfReader(source)
+
+
+# PdfReader ของไฟล์ล่าสุดใน worker process แต่ละตัว: (พาธ, mtime, ขนาด) -> reader
+_worker_reader: Optional[Tuple[Tuple[str, int, int], PdfReader]] = None
+
+
+def _extract_page_range(source: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """
+    อ่านข้อความของหน้า [start, stop) ใน worker process
+    ต้องเป็นฟังก์ชันระดับ module เพื่อให้ส่งไปยัง ProcessPoolExecutor ได้
+    แต่ละ process เปิดไฟล์ครั้งเดียวต่อเอกสาร แล้วใช้ reader เดิมกับทุกช่วงหน้าที่ได้รับ
+    """
+    global _worker_reader
+    stat = os.stat(source)
+    key = (source, stat.st_mtime_ns, stat.st_size)
+    if _worker_reader is None or _worker_reader[0] != key:
+        _worker_reader = (key, open_pdf(source))
+    reader = _worker_reader[1]
+    return [
+        (page_index + 1, reader.pages[page_index].extract_text() or "")
+        for page_index in range(start, stop)
+    ]
+
 
 class PDFProcessingService:
     def __init__(self):
         # ใช้ MiniLM-L6-v2 model สำหรับสร้าง embeddings เพราะมีความสมดุลระหว่างประสิทธิภาพและขนาด
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        # กำหนดความยาวสูงสุดของ chunk เพื่อไม่ให้ข้อความยาวเกินไป
-        self.max_chunk_length = 512
+        # โมเดลถูกโหลดเมื่อใช้งานครั้งแรกผ่าน model registry และใช้ร่วมกันทั้ง process
+        self.model_name = 'all-MiniLM-L6-v2'
+        # backend ที่ใช้รันโมเดล: torch หรือ ONNX Runtime (onnx, onnx-int8) สำหรับเครื่องที่ไม่มี GPU
+        self.backend_name = config.EMBEDDING_BACKEND
+        # แบ่ง chunks ตามจำนวน tokens ของโมเดล เพื่อไม่ให้ข้อความเกิน max_seq_length แล้วถูกตัดทิ้ง
+        self.max_tokens = config.CHUNK_MAX_TOKENS
+        self.overlap_tokens = config.CHUNK_OVERLAP_TOKENS
+        self._chunker: Optional[TextChunker] = None
+        # จำนวน chunks ต่อหนึ่ง batch ในโหมด streaming เพื่อจำกัดการใช้หน่วยความจำ
+        self.embedding_batch_size = config.PDF_EMBEDDING_BATCH_SIZE
+        # การอ่าน PDF แบบขนานหลาย process สำหรับเอกสารขนาดใหญ่
+        self.parallel_page_threshold = config.PDF_PARALLEL_PAGE_THRESHOLD
+        self.parallel_workers = config.PDF_PARALLEL_WORKERS or os.cpu_count() or 1
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        # cache ของ embeddings ระดับ chunk สำหรับข้อความที่ซ้ำกันบ่อย เช่น หัวกระดาษและคำสั่งข้อสอบ
+        # สร้างเมื่อใช้งานครั้งแรกเพราะต้องรู้มิติของโมเดล
+        self.embedding_cache_enabled = config.EMBEDDING_CACHE_ENABLED
+        self._embedding_cache: Optional[EmbeddingCache] = None
+        self._lazy_lock = threading.Lock()
+        # ทุกการสร้าง embeddings ผ่าน worker นี้ เพื่อรวมคำขอพร้อมกันเป็น batch และไม่ block event loop
+        self.embedding_worker = EmbeddingWorker(
+            self._encode,
+            max_batch_size=config.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=config.EMBEDDING_BATCH_MAX_WAIT_MS
+        )
 
-    async def extract_text_from_pdf(self, file_path: str) -> str:
+    @property
+    def backend(self):
+        """embedding backend ที่ใช้ร่วมกันทั้ง process (โหลดเมื่อเรียกครั้งแรก)"""
+        return get_embedding_backend(self.backend_name, self.model_name)
+
+    @property
+    def embedding_model_id(self) -> str:
+        """ชื่อที่ระบุทั้งโมเดลและ backend เพราะ vectors จาก backend แบบ int8 ไม่เท่ากับของ torch ทุกประการ"""
+        if self.backend_name == "torch":
+            return self.model_name
+        return f"{self.model_name}@{self.backend_name}"
+
+    @property
+    def chunker(self) -> TextChunker:
+        """TextChunker ที่ใช้ tokenizer ของโมเดล (สร้างเมื่อเรียกครั้งแรก)"""
+        if self._chunker is None:
+            with self._lazy_lock:
+                if self._chunker is None:
+                    backend = self.backend
+                    self._chunker = TextChunker(
+                        backend.tokenizer,
+                        max_tokens=min(self.max_tokens, backend.max_seq_length),
+                        overlap_tokens=self.overlap_tokens
+                    )
+        return self._chunker
+
+    @property
+    def embedding_cache(self) -> Optional[EmbeddingCache]:
+        """cache ของ embeddings หรือ None เมื่อปิดการใช้งาน (สร้างเมื่อเรียกครั้งแรก)"""
+        if self.embedding_cache_enabled and self._embedding_cache is None:
+            with self._lazy_lock:
+                if self._embedding_cache is None:
+                    self._embedding_cache = EmbeddingCache(
+                        model_name=self.embedding_model_id,
+                        dimension=self.embedding_dimension,
+                        cache_dir=config.EMBEDDING_CACHE_DIR,
+                        memory_items=config.EMBEDDING_CACHE_MEMORY_ITEMS,
+                        disk_capacity=config.EMBEDDING_CACHE_DISK_CAPACITY
+                    )
+        return self._embedding_cache
+
+    def close(self) -> None:
+        """ปิด worker processes ของการอ่าน PDF แบบขนาน (ถูกเรียกอัตโนมัติเมื่อ process จบ)"""
+        with self._lazy_lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            atexit.unregister(self.close)
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def warmup(self) -> None:
+        """โหลดโมเดลและ tokenizer แล้ว encode ข้อความสั้นๆ หนึ่งครั้ง เพื่อให้ request แรกไม่ต้องรอ"""
+        self.chunker.chunk_text("warmup")
+        self._encode(["warmup"])
+
+    @property
+    def processing_signature(self) -> str:
         """
-        อ่านไฟล์ PDF และแปลงเป็นข้อความ
+        ค่าที่ระบุการตั้งค่าของการประมวลผล ใช้แยก cache เมื่อเปลี่ยนโมเดลหรือวิธีแบ่ง chunks
+        คำนวณจากการตั้งค่าเท่านั้น จึงไม่ต้องโหลดโมเดล
+        """
+        return f"{self.embedding_model_id}:{self.max_tokens}:{self.overlap_tokens}:page_aligned"
+
+    def iter_pdf_pages(
+        self,
+        file_path: PdfSource,
+        parallel: Optional[bool] = None
+    ) -> Iterator[Tuple[int, str]]:
+        """
+        อ่านไฟล์ PDF ทีละหน้าในรูปแบบ generator
+        ข้อความของแต่ละหน้าจะถูกสร้างเมื่อถูกเรียกใช้เท่านั้น จึงไม่ต้องถือข้อความทั้งเอกสารไว้ในหน่วยความจำ
         
         Args:
-            file_path: พาธของไฟล์ PDF
+            file_path: พาธของไฟล์ PDF หรือข้อมูลของไฟล์ (bytes)
+            parallel: บังคับเปิด/ปิดการอ่านแบบหลาย process
+                (default: เปิดอัตโนมัติเมื่อจำนวนหน้าถึง PDF_PARALLEL_PAGE_THRESHOLD)
             
-        Returns:
-            ข้อความทั้งหมดจากไฟล์ PDF
+        Yields:
+            tuple ของ (หมายเลขหน้าเริ่มจาก 1, ข้อความของหน้านั้น)
         """
         try:
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text.strip()
+            reader = open_pdf(file_path)
+            page_count = len(reader.pages)
+
+            if parallel is None:
+                parallel = (
+                    self.parallel_workers > 1
+                    and page_count >= self.parallel_page_threshold
+                )
+
+            if parallel:
+                yield from self._iter_pages_parallel(file_path, page_count)
+                return
+
+            for page_number, page in enumerate(reader.pages, start=1):
+                yield page_number, page.extract_text() or ""
         except Exception as e:
             raise Exception(f"ไม่สามารถอ่านไฟล์ PDF ได้: {str(e)}")
 
+    def _iter_pages_parallel(self, file_path: PdfSource, page_count: int) -> Iterator[Tuple[int, str]]:
+        """
+        แบ่งช่วงหน้าให้ worker processes อ่านพร้อมกัน แล้วส่งผลลัพธ์คืนตามลำดับหน้า
+        จำกัดจำนวนช่วงที่ส่งล่วงหน้าไว้เพื่อไม่ให้ผลลัพธ์ค้างในหน่วยความจำมากเกินไป
+        ไฟล์ในหน่วยความจำถูกเขียนลงไฟล์ชั่วคราวครั้งเดียว แล้วส่งเฉพาะพาธให้ workers
+        แทนการ pickle ข้อมูลทั้งไฟล์ไปกับทุกช่วงหน้า และแต่ละ worker เปิดไฟล์เพียงครั้งเดียว
+        """
+        with self._lazy_lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.parallel_workers)
+                atexit.register(self.close)
+            pool = self._process_pool
+
+        spilled_path = None
+        if isinstance(file_path, (bytes, bytearray, memoryview)):
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+                temp_file.write(file_path)
+            file_path = spilled_path = temp_file.name
+
+        # แบ่งเป็นช่วงย่อยหลายช่วงต่อ worker เพื่อให้ได้หน้าแรกๆ กลับมาเร็วและกระจายงานได้สม่ำเสมอ
+        # ช่วงที่ส่งไปยัง worker เดิมใช้ reader ที่เปิดไว้แล้ว จึงไม่ต้อง parse ไฟล์ซ้ำทุกช่วง
+        range_size = max(1, -(-page_count // (self.parallel_workers * 4)))
+        ranges = iter([
+            (start, min(start + range_size, page_count))
+            for start in range(0, page_count, range_size)
+        ])
+
+        pending = deque()
+        try:
+            for start, stop in ranges:
+                pending.append(pool.submit(_extract_page_range, file_path, start, stop))
+                if len(pending) >= self.parallel_workers * 2:
+                    break
+
+            while pending:
+                pages = pending.popleft().result()
+                next_range = next(ranges, None)
+                if next_range is not None:
+                    pending.append(pool.submit(_extract_page_range, file_path, *next_range))
+                yield from pages
+        finally:
+            if spilled_path is not None:
+                # รอช่วงที่กำลังอ่านอยู่ให้เสร็จก่อนลบไฟล์ชั่วคราว (เช่น เมื่อผู้เรียกหยุดอ่านกลางทาง)
+                for future in pending:
+                    future.cancel()
+                for future in pending:
+                    if not future.cancelled():
+                        future.exception()
+                os.remove(spilled_path)
+
+    async def extract_text_from_pdf(self, file_path: PdfSource) -> str:
+        """
+        อ่านไฟล์ PDF และแปลงเป็นข้อความ
+        
+        Args:
+            file_path: พาธของไฟล์ PDF หรือข้อมูลของไฟล์ (bytes)
+            
+        Returns:
+            ข้อความทั้งหมดจากไฟล์ PDF
+        """
+        # รวมข้อความด้วย join ครั้งเดียวแทนการต่อ string ทีละหน้า
+        return "\n".join(text for _, text in self.iter_pdf_pages(file_path)).strip()
+
+    def iter_chunks(self, pages: Iterable[Tuple[int, str]], page_aligned: bool = False) -> Iterator[Dict]:
+        """
+        แบ่งข้อความที่ได้จากแต่ละหน้าเป็น chunks แบบ streaming
+        chunk ที่ยังไม่เต็มจะต่อข้ามหน้าได้ เหมือนกับการแบ่งข้อความทั้งเอกสารในครั้งเดียว
+        
+        Args:
+            pages: iterable ของ (หมายเลขหน้า, ข้อความ)
+            page_aligned: ไม่ให้ chunk ต่อข้ามหน้า (ใช้กับการนำเข้าเอกสารแบบ incremental)
+            
+        Yields:
+            Dictionary ที่มีข้อความของ chunk, หมายเลขหน้าที่ chunk เริ่มต้น, ตำแหน่งในข้อความ และจำนวน tokens
+        """
+        return self.chunker.iter_chunks(pages, page_aligned=page_aligned)
+
     def split_text_into_chunks(self, text: str) -> List[str]:
         """
         แบ่งข้อความเป็นส่วนย่อยๆ เพื่อให้เหมาะกับการสร้าง embeddings
@@ -40,71 +275,155 @@ class PDFProcessingService:
         Returns:
             รายการของข้อความที่แบ่งแล้ว
         """
-        # แบ่งตามย่อหน้า
-        paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
-        chunks = []
-        
-        current_chunk = ""
-        for paragraph in paragraphs:
-            # ถ้า paragraph เดียวยาวเกินไป ให้แบ่งตามประโยค
-            if len(paragraph) > self.max_chunk_length:
-                sentences = paragraph.split('. ')
-                for sentence in sentences:
-                    if len(current_chunk) + len(sentence) <= self.max_chunk_length:
-                        current_chunk += sentence + '. '
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk.strip())
-                        current_chunk = sentence + '. '
-            else:
-                if len(current_chunk) + len(paragraph) <= self.max_chunk_length:
-                    current_chunk += paragraph + '\n'
-                else:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = paragraph + '\n'
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-            
-        return chunks
+        return [chunk["text"] for chunk in self.chunker.chunk_text(text)]
 
-    async def create_embeddings(self, chunks: List[str]) -> List[np.ndarray]:
+    @property
+    def embedding_dimension(self) -> int:
+        """ขนาดมิติของ embeddings ที่โมเดลสร้าง"""
+        return self.backend.dimension
+
+    async def create_embedding_matrix(self, chunks: List[str]) -> np.ndarray:
         """
-        สร้าง embeddings จากข้อความ
+        สร้าง embeddings จากข้อความในรูปแบบเมทริกซ์ float32 ที่ normalize แล้ว
+        เมทริกซ์เป็น C-contiguous ขนาด (จำนวน chunks, มิติ) ส่งต่อให้ MilvusService ได้โดยตรง
         
         Args:
             chunks: รายการของข้อความที่ต้องการแปลงเป็น embeddings
             
         Returns:
-            รายการของ embeddings vectors
+            เมทริกซ์ embeddings ขนาด (len(chunks), embedding_dimension)
         """
+        if not chunks:
+            return np.empty((0, self.embedding_dimension), dtype=np.float32)
+
         try:
-            embeddings = self.model.encode(chunks)
-            return embeddings.tolist()
+            if self.embedding_cache is None:
+                embeddings = await self._encode_async(chunks)
+            else:
+                # สร้าง embeddings เฉพาะข้อความที่ไม่พบใน cache แล้วเติมกลับตามลำดับเดิม
+                embeddings, misses = self.embedding_cache.lookup(chunks)
+                if misses:
+                    encoded = await self._encode_async([text for text, _ in misses.values()])
+                    embeddings = self.embedding_cache.store(embeddings, misses, encoded)
+            return normalize_embeddings(embeddings)
         except Exception as e:
             raise Exception(f"ไม่สามารถสร้าง embeddings ได้: {str(e)}")
 
-    async def process_pdf_file(self, file_path: str) -> Dict:
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """เรียกโมเดลโดยตรง ใช้โดย embedding worker ใน background thread"""
+        return self.backend.encode(texts)
+
+    async def _encode_async(self, texts: List[str]) -> np.ndarray:
+        """ส่งข้อความให้ embedding worker และรอผลลัพธ์โดยไม่ block event loop"""
+        return await asyncio.wrap_future(self.embedding_worker.submit(texts))
+
+    async def create_embeddings(self, chunks: List[str]) -> List[List[float]]:
         """
-        ประมวลผลไฟล์ PDF ทั้งหมด ตั้งแต่การอ่านไฟล์จนถึงการสร้าง embeddings
+        สร้าง embeddings จากข้อความในรูปแบบ list ของ Python floats
+        คงไว้เพื่อความเข้ากันได้กับโค้ดเดิม โค้ดใหม่ควรใช้ create_embedding_matrix
         
         Args:
-            file_path: พาธของไฟล์ PDF
+            chunks: รายการของข้อความที่ต้องการแปลงเป็น embeddings
             
         Returns:
-            Dictionary ที่มีข้อความและ embeddings
+            รายการของ embeddings vectors
         """
-        # อ่านข้อความจาก PDF
-        text = await self.extract_text_from_pdf(file_path)
-        
-        # แบ่งข้อความเป็นส่วนย่อย
-        chunks = self.split_text_into_chunks(text)
+        return (await self.create_embedding_matrix(chunks)).tolist()
+
+    async def stream_pdf_file(
+        self,
+        file_path: PdfSource,
+        batch_size: Optional[int] = None,
+        pages: Optional[Iterable[Tuple[int, str]]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        ประมวลผลไฟล์ PDF แบบ streaming: อ่านทีละหน้า แบ่ง chunks และสร้าง embeddings ทีละ batch
+        หน่วยความจำที่ใช้ขึ้นกับขนาด batch ไม่ใช่จำนวนหน้าของเอกสาร
+        การอ่าน PDF และแบ่ง chunks รันใน executor ทีละ batch จึงไม่ block event loop
+        chunks ถูกแบ่งแบบไม่ต่อข้ามหน้า ตรงกับ processing_signature ที่ใช้แยก cache
         
-        # สร้าง embeddings
-        embeddings = await self.create_embeddings(chunks)
+        Args:
+            file_path: พาธของไฟล์ PDF หรือข้อมูลของไฟล์ (bytes)
+            batch_size: จำนวน chunks ต่อ batch (default: PDF_EMBEDDING_BATCH_SIZE)
+            pages: iterable ของ (หมายเลขหน้า, ข้อความ) ที่อ่านไว้แล้ว (optional)
+            
+        Yields:
+            Dictionary ที่มี chunks, หมายเลขหน้าและตำแหน่งของแต่ละ chunk และ embeddings ของ batch นั้น
+        """
+        batch_size = batch_size or self.embedding_batch_size
+        if pages is None:
+            pages = self.iter_pdf_pages(file_path)
+
+        loop = asyncio.get_running_loop()
+        chunks = self.iter_chunks(pages, page_aligned=True)
+        try:
+            while True:
+                batch = await loop.run_in_executor(None, list, itertools.islice(chunks, batch_size))
+                if not batch:
+                    break
+                yield await self._embed_batch(batch)
+        finally:
+            # ปิด generator ของหน้า (เช่น รอ worker processes และลบไฟล์ชั่วคราว) เมื่อผู้เรียกหยุดอ่านกลางทาง
+            for iterator in (chunks, pages):
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    await loop.run_in_executor(None, close)
+
+    async def _embed_batch(self, batch: List[Dict]) -> Dict:
+        """สร้าง embeddings ให้ chunks หนึ่ง batch"""
+        chunks = [chunk["text"] for chunk in batch]
+        return {
+            "chunks": chunks,
+            "pages": [chunk["page"] for chunk in batch],
+            "offsets": [(chunk["start"], chunk["end"]) for chunk in batch],
+            "embeddings": await self.create_embedding_matrix(chunks)
+        }
+
+    async def process_pdf_file(self, file_path: PdfSource) -> Dict:
+        """
+        ประมวลผลไฟล์ PDF ทั้งหมด ตั้งแต่การอ่านไฟล์จนถึงการสร้าง embeddings
+        สร้างอยู่บน stream_pdf_file และรวมผลลัพธ์ทุก batch ไว้ใน dictionary เดียว
         
+        Args:
+            file_path: พาธของไฟล์ PDF หรือข้อมูลของไฟล์ (bytes)
+            
+        Returns:
+            Dictionary ที่มีข้อความ, chunks, เมทริกซ์ embeddings และตำแหน่งเริ่มต้นของแต่ละหน้าในข้อความ
+        """
+        page_texts: List[str] = []
+        page_offsets: List[int] = []
+        offset = 0
+
+        def collect_pages() -> Iterator[Tuple[int, str]]:
+            # เก็บข้อความของแต่ละหน้าไว้สำหรับผลลัพธ์ "text" ระหว่างที่ส่งต่อให้ chunker
+            nonlocal offset
+            for page_number, page_text in self.iter_pdf_pages(file_path):
+                page_texts.append(page_text)
+                page_offsets.append(offset)
+                offset += len(page_text) + 1
+                yield page_number, page_text
+
+        chunks: List[str] = []
+        chunk_pages: List[int] = []
+        chunk_offsets: List[Tuple[int, int]] = []
+        embedding_batches: List[np.ndarray] = []
+        async for batch in self.stream_pdf_file(file_path, pages=collect_pages()):
+            chunks.extend(batch["chunks"])
+            chunk_pages.extend(batch["pages"])
+            chunk_offsets.extend(batch["offsets"])
+            embedding_batches.append(batch["embeddings"])
+
+        embeddings = (
+            np.concatenate(embedding_batches)
+            if embedding_batches
+            else np.empty((0, self.embedding_dimension), dtype=np.float32)
+        )
+
         return {
-            "text": text,
+            "text": "\n".join(page_texts),
             "chunks": chunks,
+            "chunk_pages": chunk_pages,
+            "chunk_offsets": chunk_offsets,
+            "page_offsets": page_offsets,
             "embeddings": embeddings
         }
\ No newline at end of file
@@ -1,20 +1,67 @@
 # services/search_service.py
-from typing import List, Dict
+from typing import Any, Dict, List, Optional
+import asyncio
 import numpy as np
-from services.milvus_service import MilvusService
+from core.config import config
+from services.keyword_index import KeywordIndex
+from services.milvus_service import MilvusService, quote_string
 from services.pdf_service import PDFProcessingService
 
+
+def reciprocal_rank_fusion(
+    ranked_lists: Dict[str, List[Dict]],
+    limit: int,
+    k: Optional[int] = None
+) -> List[Dict]:
+    """
+    รวมผลลัพธ์หลายรายการด้วย reciprocal rank fusion: คะแนน = ผลรวมของ 1 / (k + อันดับ) จากทุกรายการ
+    ใช้เฉพาะอันดับ จึงรวมคะแนนที่ต่างหน่วยกันได้ (cosine similarity กับ BM25)
+    
+    Args:
+        ranked_lists: ผลลัพธ์ของแต่ละวิธี เช่น {"vector": [...], "keyword": [...]} เรียงจากเกี่ยวข้องมากที่สุด
+        limit: จำนวนผลลัพธ์ที่ต้องการ
+        k: ค่าคงที่ที่ลดน้ำหนักของอันดับต้นๆ (default: HYBRID_RRF_K)
+        
+    Returns:
+        ผลลัพธ์ที่รวมแล้ว score คือคะแนน RRF และ ranks คืออันดับ (เริ่มที่ 1) ในแต่ละวิธี
+    """
+    k = config.HYBRID_RRF_K if k is None else k
+    fused: Dict[Any, Dict] = {}
+    for source, results in ranked_lists.items():
+        for rank, result in enumerate(results, start=1):
+            entry = fused.get(result["id"])
+            if entry is None:
+                entry = fused[result["id"]] = {**result, "score": 0.0, "ranks": {}}
+            entry["score"] += 1.0 / (k + rank)
+            entry["ranks"][source] = rank
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:limit]
+
+
+def file_id_filter(file_ids: Optional[List[str]]) -> Optional[str]:
+    """filter expression ของ Milvus สำหรับจำกัดการค้นหาเฉพาะเอกสารที่ระบุ"""
+    if file_ids is None:
+        return None
+    return f"file_id in [{', '.join(quote_string(i) for i in file_ids)}]"
+
+
 class SearchService:
-    def __init__(self, milvus_service: MilvusService, pdf_service: PDFProcessingService):
+    def __init__(
+        self,
+        milvus_service: MilvusService,
+        pdf_service: PDFProcessingService,
+        keyword_index: Optional[KeywordIndex] = None
+    ):
         self.milvus_service = milvus_service
         self.pdf_service = pdf_service
+        self.keyword_index = keyword_index
 
     async def semantic_search(
         self,
         query: str,
         collection_name: str,
         limit: int = 5,
-        threshold: float = 0.7
+        threshold: float = 0.7,
+        search_params: Optional[Dict[str, Any]] = None
     ) -> List[Dict]:
         """
         ค้นหาเอกสารที่เกี่ยวข้องกับ query โดยใช้ semantic search
@@ -24,22 +71,98 @@ class SearchService:
             collection_name: ชื่อ collection ที่ต้องการค้นหา
             limit: จำนวนผลลัพธ์สูงสุด
             threshold: คะแนนความเหมือนขั้นต่ำ (0-1)
+            search_params: search params ของ Milvus สำหรับคำขอนี้ เช่น {"nprobe": 32}
+        """
+        results = await self.semantic_search_batch([query], collection_name, limit, threshold, search_params)
+        return results[0]
+
+    async def semantic_search_batch(
+        self,
+        queries: List[str],
+        collection_name: str,
+        limit: int = 5,
+        threshold: float = 0.7,
+        search_params: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict]]:
+        """
+        ค้นหาหลาย queries พร้อมกัน: สร้าง embeddings ใน batch เดียวและค้นหาใน Milvus ครั้งเดียว
+        
+        Args:
+            queries: รายการข้อความที่ต้องการค้นหา
+            collection_name: ชื่อ collection ที่ต้องการค้นหา
+            limit: จำนวนผลลัพธ์สูงสุดต่อ query
+            threshold: คะแนนความเหมือนขั้นต่ำ (0-1)
+            search_params: search params ของ Milvus สำหรับคำขอนี้ เช่น {"nprobe": 32}
+            
+        Returns:
+            รายการผลลัพธ์ของแต่ละ query ตามลำดับของ queries
         """
-        # สร้าง embedding สำหรับ query
-        query_embedding = await self.pdf_service.create_embeddings([query])
+        if not queries:
+            return []
+
+        # สร้าง embeddings ของทุก query ในครั้งเดียว
+        query_embeddings = await self.pdf_service.create_embedding_matrix(queries)
         
         # ค้นหาใน Milvus
-        results = await self.milvus_service.search_vectors(
+        groups = await self.milvus_service.search_vectors_batch(
             collection_name=collection_name,
-            query_vectors=query_embedding,
+            query_vectors=query_embeddings,
             limit=limit,
-            output_fields=["file_id", "content"]
+            output_fields=["file_id", "content"],
+            search_params=search_params
         )
 
         # กรองผลลัพธ์ตาม threshold
-        filtered_results = [
-            result for result in results 
-            if result["score"] >= threshold
+        return [
+            [result for result in results if result["score"] >= threshold]
+            for results in groups
         ]
 
-        return filtered_results
\ No newline at end of file
+    async def hybrid_search_batch(
+        self,
+        queries: List[str],
+        collection_name: str,
+        limit: int = 5,
+        file_ids: Optional[List[str]] = None,
+        candidates: Optional[int] = None,
+        search_params: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict]]:
+        """
+        ค้นหาด้วย vector และ BM25 แล้วรวมอันดับด้วย reciprocal rank fusion
+        ช่วยให้ chunks ที่มีคำเฉพาะ (ชื่อสูตร ศัพท์เทคนิคภาษาไทย) ขึ้นมาอยู่ในอันดับต้นแม้ embedding จะจัดอันดับไว้ต่ำ
+        ถ้าไม่มี keyword index จะคืนผลของ vector search เพียงอย่างเดียว
+        
+        Args:
+            queries: รายการข้อความที่ต้องการค้นหา
+            collection_name: ชื่อ collection ที่ต้องการค้นหา
+            limit: จำนวนผลลัพธ์สูงสุดต่อ query หลังรวมอันดับ
+            file_ids: ค้นหาเฉพาะเอกสารเหล่านี้ (optional)
+            candidates: จำนวนผลลัพธ์จากแต่ละวิธีก่อนรวม (default: HYBRID_CANDIDATES)
+            search_params: search params ของ Milvus สำหรับคำขอนี้
+            
+        Returns:
+            รายการผลลัพธ์ของแต่ละ query ตามลำดับของ queries
+        """
+        if not queries:
+            return []
+        candidates = max(candidates or config.HYBRID_CANDIDATES, limit)
+
+        query_embeddings = await self.pdf_service.create_embedding_matrix(queries)
+        vector_groups = await self.milvus_service.search_vectors_batch(
+            collection_name=collection_name,
+            query_vectors=query_embeddings,
+            limit=candidates,
+            output_fields=["file_id", "content"],
+            filter_expr=file_id_filter(file_ids),
+            search_params=search_params
+        )
+        if self.keyword_index is None:
+            return [results[:limit] for results in vector_groups]
+
+        keyword_groups = await asyncio.get_running_loop().run_in_executor(
+            None, self.keyword_index.search_batch, collection_name, queries, candidates, file_ids
+        )
+        return [
+            reciprocal_rank_fusion({"vector": vector_results, "keyword": keyword_results}, limit)
+            for vector_results, keyword_results in zip(vector_groups, keyword_groups)
+        ]
@@ -0,0 +1,181 @@
+# services/text_chunker.py
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class TextChunker:
+    """
+    แบ่งข้อความเป็น chunks ตามจำนวน tokens ของโมเดล embedding
+    - วัดความยาวด้วย tokenizer ของโมเดลจริง เพื่อไม่ให้ chunk ถูกตัดทิ้งเมื่อเกิน max_seq_length
+    - แบ่งประโยคได้ทั้งภาษาอังกฤษ (. ! ?) และภาษาไทย (ช่องว่างระหว่างตัวอักษรไทย)
+    - รองรับ overlap ระหว่าง chunks ที่ติดกัน
+    - เก็บตำแหน่ง (offset) ของแต่ละ chunk ในข้อความต้นฉบับ และสร้างข้อความของ chunk จากการ slice
+      ตามตำแหน่งแทนการต่อ string ซ้ำๆ ทำให้ใช้เวลาเป็นเชิงเส้นตามความยาวข้อความ
+
+    tokenizer ต้องเรียกใช้แบบเดียวกับ Hugging Face tokenizer คือ
+    tokenizer(texts, add_special_tokens=False, return_offsets_mapping=...) -> {"input_ids", "offset_mapping"}
+    """
+
+    # ขอบเขตประโยค: ขึ้นบรรทัดใหม่, หลังเครื่องหมายจบประโยค หรือช่องว่างระหว่างตัวอักษรไทย
+    _sentence_boundary = re.compile(
+        r"\n+"
+        r"|(?<=[.!?\u2026])\s+"
+        r"|(?<=[\u0E00-\u0E7F])[ \t\u00A0]+(?=[\u0E00-\u0E7F])"
+    )
+
+    def __init__(self, tokenizer, max_tokens: int = 256, overlap_tokens: int = 0):
+        """
+        Args:
+            tokenizer: tokenizer ของโมเดล embedding
+            max_tokens: จำนวน tokens สูงสุดต่อ chunk รวม special tokens ของโมเดล
+            overlap_tokens: จำนวน tokens ที่ต้องการให้ chunk ถัดไปซ้อนกับ chunk ก่อนหน้า
+        """
+        special_tokens = getattr(tokenizer, "num_special_tokens_to_add", lambda: 2)()
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.token_budget = max(1, max_tokens - special_tokens)
+        if not 0 <= overlap_tokens < self.token_budget:
+            raise ValueError("overlap_tokens ต้องไม่ติดลบและน้อยกว่าจำนวน tokens ต่อ chunk")
+        self.overlap_tokens = overlap_tokens
+
+    def split_sentences(self, text: str) -> List[Tuple[int, int]]:
+        """
+        หาตำแหน่งของประโยคในข้อความ
+        
+        Args:
+            text: ข้อความที่ต้องการแบ่ง
+            
+        Returns:
+            รายการของ (ตำแหน่งเริ่มต้น, ตำแหน่งสิ้นสุด) ของแต่ละประโยค โดยตัดช่องว่างหัวท้ายออกแล้ว
+        """
+        spans = []
+        start = 0
+        for boundary in self._sentence_boundary.finditer(text):
+            spans.append((start, boundary.start()))
+            start = boundary.end()
+        spans.append((start, len(text)))
+
+        trimmed = []
+        for start, end in spans:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if start < end:
+                trimmed.append((start, end))
+        return trimmed
+
+    def _sentence_pieces(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        แปลงประโยคเป็นชิ้นที่มีจำนวน tokens ไม่เกิน token_budget
+        ประโยคที่ยาวเกินจะถูกตัดตามตำแหน่งของ tokens
+        
+        Yields:
+            (ตำแหน่งเริ่มต้น, ตำแหน่งสิ้นสุด, จำนวน tokens)
+        """
+        spans = self.split_sentences(text)
+        if not spans:
+            return
+
+        token_ids = self.tokenizer(
+            [text[start:end] for start, end in spans],
+            add_special_tokens=False
+        )["input_ids"]
+
+        for (start, end), ids in zip(spans, token_ids):
+            if len(ids) <= self.token_budget:
+                yield start, end, len(ids)
+                continue
+
+            offsets = self.tokenizer(
+                text[start:end],
+                add_special_tokens=False,
+                return_offsets_mapping=True
+            )["offset_mapping"]
+            step = self.token_budget - self.overlap_tokens
+            for first in range(0, len(offsets), step):
+                window = offsets[first:first + self.token_budget]
+                yield start + window[0][0], start + window[-1][1], len(window)
+                if first + self.token_budget >= len(offsets):
+                    break
+
+    def iter_chunks(self, pages: Iterable[Tuple[int, str]], page_aligned: bool = False) -> Iterator[Dict]:
+        """
+        แบ่งข้อความของหลายหน้าเป็น chunks แบบ streaming
+        chunk ที่ยังไม่เต็มจะต่อข้ามหน้าได้ ตำแหน่งของ chunk อ้างอิงกับข้อความที่นำทุกหน้ามาต่อกันด้วย "\\n"
+        
+        Args:
+            pages: iterable ของ (หมายเลขหน้า, ข้อความ)
+            page_aligned: ปิด chunk ที่ท้ายทุกหน้า ทำให้การแก้ไขหน้าหนึ่งไม่เปลี่ยน chunks ของหน้าอื่น
+            
+        Yields:
+            Dictionary ที่มี text, page (หน้าที่ chunk เริ่มต้น), start, end และ token_count
+        """
+        # แต่ละรายการคือ (หมายเลขหน้า, ข้อความของหน้า, ตำแหน่งของหน้า, start, end, จำนวน tokens)
+        pending: List[Tuple[int, str, int, int, int, int]] = []
+        pending_tokens = 0
+        page_offset = 0
+
+        for page_number, page_text in pages:
+            for start, end, token_count in self._sentence_pieces(page_text):
+                if pending and pending_tokens + token_count > self.token_budget:
+                    yield self._build_chunk(pending, pending_tokens)
+                    pending, pending_tokens = self._overlap_tail(pending, token_count)
+
+                pending.append((page_number, page_text, page_offset, start, end, token_count))
+                pending_tokens += token_count
+
+            page_offset += len(page_text) + 1
+
+            if page_aligned and pending:
+                yield self._build_chunk(pending, pending_tokens)
+                pending, pending_tokens = [], 0
+
+        if pending:
+            yield self._build_chunk(pending, pending_tokens)
+
+    def _overlap_tail(
+        self,
+        pending: List[Tuple[int, str, int, int, int, int]],
+        next_tokens: int
+    ) -> Tuple[List[Tuple[int, str, int, int, int, int]], int]:
+        """เลือกประโยคท้ายของ chunk ก่อนหน้าที่จะใช้เป็น overlap ของ chunk ถัดไป"""
+        limit = min(self.overlap_tokens, self.token_budget - next_tokens)
+        tail_tokens = 0
+        first = len(pending)
+        while first > 0 and tail_tokens + pending[first - 1][5] <= limit:
+            first -= 1
+            tail_tokens += pending[first][5]
+        return pending[first:], tail_tokens
+
+    @staticmethod
+    def _build_chunk(pending: List[Tuple[int, str, int, int, int, int]], token_count: int) -> Dict:
+        """สร้าง chunk จากตำแหน่งของประโยค ประโยคในหน้าเดียวกันจะถูก slice ครั้งเดียว"""
+        parts = []
+        group_start = 0
+        for index in range(1, len(pending) + 1):
+            if index == len(pending) or pending[index][0] != pending[group_start][0]:
+                page_text = pending[group_start][1]
+                parts.append(page_text[pending[group_start][3]:pending[index - 1][4]])
+                group_start = index
+
+        first, last = pending[0], pending[-1]
+        return {
+            "text": "\n".join(parts),
+            "page": first[0],
+            "start": first[2] + first[3],
+            "end": last[2] + last[4],
+            "token_count": token_count
+        }
+
+    def chunk_text(self, text: str) -> List[Dict]:
+        """
+        แบ่งข้อความเดียวเป็น chunks
+        
+        Args:
+            text: ข้อความที่ต้องการแบ่ง
+            
+        Returns:
+            รายการของ chunks พร้อมตำแหน่งในข้อความ
+        """
+        return list(self.iter_chunks([(1, text)]))
@@ -0,0 +1,117 @@
+# services/vector_storage.py
+import math
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from pymilvus import DataType
+
+# รูปแบบการเก็บ embedding ใน Milvus
+# - float: FLOAT_VECTOR 4 bytes ต่อมิติ
+# - float16: FLOAT16_VECTOR 2 bytes ต่อมิติ (ต้องใช้ pymilvus และ Milvus 2.4+)
+# - binary: BINARY_VECTOR 1 bit ต่อมิติ (เก็บเฉพาะเครื่องหมายของแต่ละมิติ) ค้นหาด้วย HAMMING
+# รูปแบบที่บีบอัดใช้ค้นหารอบแรก แล้ว re-score candidates ด้วย vectors float32 จาก FullPrecisionStore
+VECTOR_STORAGES = ("float", "float16", "binary")
+
+_BYTES_PER_DIMENSION = {"float": 4.0, "float16": 2.0, "binary": 1 / 8}
+
+
+def vector_data_type(storage: str, dimension: int):
+    """ชนิดของ vector field ใน Milvus ของรูปแบบการเก็บ"""
+    if storage not in VECTOR_STORAGES:
+        raise ValueError(f"รูปแบบการเก็บ vectors ต้องเป็นหนึ่งใน {', '.join(VECTOR_STORAGES)}")
+    if storage == "float":
+        return DataType.FLOAT_VECTOR
+    if storage == "binary":
+        if dimension % 8:
+            raise ValueError(f"มิติของ binary vector ต้องหารด้วย 8 ลงตัว (ได้ {dimension})")
+        return DataType.BINARY_VECTOR
+    data_type = getattr(DataType, "FLOAT16_VECTOR", None)
+    if data_type is None:
+        raise ValueError("pymilvus รุ่นนี้ไม่รองรับ FLOAT16_VECTOR (ต้องใช้ pymilvus และ Milvus 2.4+)")
+    return data_type
+
+
+def storage_of_data_type(data_type) -> str:
+    """รูปแบบการเก็บจากชนิดของ vector field ใน schema"""
+    if data_type == DataType.BINARY_VECTOR:
+        return "binary"
+    if data_type == getattr(DataType, "FLOAT16_VECTOR", None):
+        return "float16"
+    return "float"
+
+
+def bytes_per_dimension(storage: str) -> float:
+    return _BYTES_PER_DIMENSION[storage]
+
+
+def encode_vectors(vectors: np.ndarray, storage: str) -> Any:
+    """
+    แปลงเมทริกซ์ float32 เป็นรูปแบบที่ Milvus รับสำหรับ insert และ search
+    binary ใช้ 1 เมื่อค่าของมิตินั้นมากกว่า 0 ซึ่งรักษามุมระหว่าง vectors ได้ดีสำหรับ embeddings ที่ normalize แล้ว
+    """
+    if storage == "float":
+        return vectors
+    if storage == "float16":
+        return list(np.asarray(vectors, dtype=np.float16))
+    return [row.tobytes() for row in np.packbits(np.asarray(vectors) > 0, axis=1)]
+
+
+def similarity_score(distance: float, metric_type: str, dimension: int) -> float:
+    """
+    แปลงค่า distance ที่ Milvus คืนเป็น score ในสเกลของ cosine similarity (ค่ามากกว่าดีกว่าเสมอ)
+    ผลลัพธ์ทุกแบบของ vector store จึงใช้ threshold เดียวกันได้ไม่ว่าจะเก็บ vectors แบบใด
+    - COSINE และ IP: Milvus คืน similarity อยู่แล้ว (embeddings ถูก normalize)
+    - L2: ระยะยกกำลังสองของ vectors ที่ normalize แล้วเท่ากับ 2 - 2 * cosine
+    - HAMMING: สัดส่วนบิตเครื่องหมายที่ต่างกันประมาณมุมระหว่าง vectors จึงได้ cos(pi * distance / มิติ)
+    - JACCARD: 1 - distance
+    """
+    if metric_type == "L2":
+        return 1 - distance / 2
+    if metric_type == "HAMMING":
+        return math.cos(math.pi * distance / dimension)
+    if metric_type == "JACCARD":
+        return 1 - distance
+    return distance
+
+
+def with_score(hit: Dict[str, Any], score: float) -> Dict[str, Any]:
+    """ใส่ score (similarity) และ distance (1 - score) ให้ผลการค้นหาหนึ่งรายการ ในรูปแบบเดียวกันทุก vector store"""
+    hit["score"] = score
+    hit["distance"] = 1 - score
+    return hit
+
+
+def rerank(
+    query_matrix: np.ndarray,
+    groups: List[List[Dict[str, Any]]],
+    lookup: Callable[[List[int]], Dict[int, np.ndarray]],
+    limit: int
+) -> List[List[Dict[str, Any]]]:
+    """
+    re-score candidates ของแต่ละ query ด้วย cosine similarity ของ vectors เต็มความละเอียด
+
+    Args:
+        query_matrix: เมทริกซ์ float32 ของ queries
+        groups: candidates ของแต่ละ query จากการค้นหารอบแรก
+        lookup: ฟังก์ชันที่คืน vectors float32 ตาม ids
+        limit: จำนวนผลลัพธ์ต่อ query
+
+    Returns:
+        ผลลัพธ์เรียงตาม similarity โดย distance คือ 1 - similarity และ score คือ similarity
+        candidates ที่ไม่มี vector เต็มความละเอียดถูกเรียงไว้ท้ายตามลำดับเดิม
+    """
+    vectors = lookup(list({hit["id"] for group in groups for hit in group}))
+    reranked: List[List[Dict[str, Any]]] = []
+    for query, group in zip(query_matrix, groups):
+        query_norm = float(np.linalg.norm(query)) or 1.0
+        scored, missing = [], []
+        for hit in group:
+            vector = vectors.get(hit["id"])
+            if vector is None:
+                missing.append(hit)
+                continue
+            similarity = float(np.dot(vector, query) / ((float(np.linalg.norm(vector)) or 1.0) * query_norm))
+            scored.append(with_score(dict(hit), similarity))
+        scored.sort(key=lambda hit: hit["score"], reverse=True)
+        reranked.append((scored + missing)[:limit])
+    return reranked
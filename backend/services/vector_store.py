@@ -0,0 +1,26 @@
+# services/vector_store.py
+from core.config import config
+
+VECTOR_STORE_BACKENDS = ("milvus", "local")
+
+
+def create_vector_store(backend: str = None):
+    """
+    สร้าง vector store ตาม VECTOR_STORE_BACKEND
+    
+    Args:
+        backend: "milvus" (Milvus server) หรือ "local" (ไฟล์ memory-mapped ใน LOCAL_VECTOR_STORE_DIR)
+        
+    Returns:
+        MilvusService หรือ LocalVectorStore ซึ่งมี async API เดียวกัน
+    """
+    backend = backend or config.VECTOR_STORE_BACKEND
+    if backend == "milvus":
+        from services.milvus_service import MilvusService
+        return MilvusService(host=config.MILVUS_HOST, port=config.MILVUS_PORT)
+    if backend == "local":
+        from services.local_vector_store import LocalVectorStore
+        return LocalVectorStore(config.LOCAL_VECTOR_STORE_DIR)
+    raise ValueError(
+        f"VECTOR_STORE_BACKEND ไม่ถูกต้อง: {backend} (ต้องเป็นหนึ่งใน {', '.join(VECTOR_STORE_BACKENDS)})"
+    )
@@ -0,0 +1,31 @@
+# test/test_bulk_ingestion.py
+import sys
+import os
+import io
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.bulk_ingestion import BulkIngestionService
+
+
+def test_manifest_entries_can_share_one_uploaded_file():
+    """หลายรายการใน manifest ที่อ้างถึงไฟล์เดียวกันต้องอ่านข้อมูลครบทุกรายการ แม้ stream ของคำขออ่านได้ครั้งเดียว"""
+    service = BulkIngestionService(pipeline=None, workers=1)
+    files = {
+        "a.pdf": SimpleNamespace(stream=io.BytesIO(b"%PDF-1.4 a")),
+        "b.pdf": SimpleNamespace(stream=io.BytesIO(b"%PDF-1.4 b"))
+    }
+    manifest = [
+        {"file": "a.pdf", "document_id": "a", "file_type": "teacher"},
+        {"file": "a.pdf", "document_id": "a", "file_type": "student"},
+        {"file": "b.pdf", "document_id": "b", "file_type": "student"}
+    ]
+    spools = []
+    try:
+        entries = service.entries_from_uploads(manifest, files, spools)
+        assert [entry["load"]() for entry in entries] == [b"%PDF-1.4 a", b"%PDF-1.4 a", b"%PDF-1.4 b"]
+        assert len(spools) == 2
+    finally:
+        for spool in spools:
+            spool.close()
+        service.shutdown()
@@ -0,0 +1,40 @@
+# test/test_collection_residency.py
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.collection_residency import CollectionResidencyManager, estimate_footprint
+
+
+def test_admit_evicts_least_recently_used_unpinned_collections():
+    """เมื่อเกิน budget ต้องเลือก release collections ที่ใช้งานล่าสุดนานที่สุดและไม่ได้ถูกใช้งานอยู่"""
+    residency = CollectionResidencyManager(budget_bytes=300)
+    for name in ("a", "b", "c"):
+        residency.acquire(name)
+        assert residency.admit(name, 100) == []
+        residency.unpin(name)
+
+    # a ถูกใช้ล่าสุดและ b กำลังถูกใช้งาน จึงต้อง release c ก่อน
+    residency.acquire("a")
+    residency.unpin("a")
+    residency.acquire("b")
+    assert residency.admit("d", 150) == ["c", "a"]
+    assert residency.resident_bytes == 250
+    assert residency.confirm_release("c", "budget")
+
+    # collection ที่ถูก pin ระหว่างที่รอ release ต้องไม่ถูก release
+    residency.acquire("a")
+    assert not residency.confirm_release("a", "budget")
+    assert residency.snapshot()["evictions"] == {"budget": 1}
+    assert residency.hot() == ["a", "c"]
+
+
+def test_idle_and_estimate_footprint():
+    """collections ที่ไม่ถูกใช้งานนานพอต้องถูกเลือก และขนาดต้องคิดจากแถว x มิติ x 4 bytes"""
+    residency = CollectionResidencyManager()
+    residency.admit("a", 10)
+    residency.acquire("b")
+    residency.admit("b", 10)
+    assert residency.idle(0) == ["a"]
+    assert not residency.is_resident("a")
+    assert estimate_footprint(1000, 768, 1.5) == 1000 * 768 * 4 * 3 // 2
@@ -0,0 +1,64 @@
+# test/test_embedding_cache.py
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from utils.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    """โฟลเดอร์ชั่วคราวสำหรับชั้นดิสก์ของ cache"""
+    return str(tmp_path / "embeddings")
+
+
+def test_lookup_deduplicates_and_stitches_in_order(cache_dir):
+    """ข้อความซ้ำต้องถูกสร้าง embedding ครั้งเดียว และผลลัพธ์ต้องเรียงตามลำดับเดิม"""
+    cache = EmbeddingCache("test-model", 4, cache_dir, memory_items=10, disk_capacity=10)
+    texts = ["หัวกระดาษ", "คำตอบ", "หัวกระดาษ  "]
+
+    result, misses = cache.lookup(texts)
+    assert len(misses) == 2, "ข้อความที่ต่างกันแค่ช่องว่างต้องใช้ key เดียวกัน"
+
+    vectors = np.arange(8, dtype=np.float32).reshape(2, 4)
+    result = cache.store(result, misses, vectors)
+
+    np.testing.assert_array_equal(result[0], vectors[0])
+    np.testing.assert_array_equal(result[1], vectors[1])
+    np.testing.assert_array_equal(result[2], vectors[0])
+
+
+def test_disk_tier_survives_reopen(cache_dir):
+    """embeddings ที่เขียนลงดิสก์ต้องอ่านได้จาก instance ใหม่"""
+    cache = EmbeddingCache("test-model", 4, cache_dir, memory_items=10, disk_capacity=10)
+    result, misses = cache.lookup(["a", "b"])
+    cache.store(result, misses, np.ones((2, 4), dtype=np.float32))
+
+    reopened = EmbeddingCache("test-model", 4, cache_dir, memory_items=10, disk_capacity=10)
+    result, misses = reopened.lookup(["a", "b"])
+
+    assert not misses
+    assert reopened.stats()["disk_hits"] == 2
+    np.testing.assert_array_equal(result, np.ones((2, 4), dtype=np.float32))
+
+
+def test_disk_tier_is_bounded(cache_dir):
+    """ชั้นดิสก์ต้องเขียนทับรายการเก่าสุดเมื่อเต็ม"""
+    cache = EmbeddingCache("test-model", 4, cache_dir, memory_items=1, disk_capacity=2)
+    for text in ["a", "b", "c"]:
+        result, misses = cache.lookup([text])
+        cache.store(result, misses, np.zeros((1, 4), dtype=np.float32))
+
+    _, misses = cache.lookup(["a"])
+    assert len(misses) == 1
+    assert cache.stats()["disk_items"] == 2
+
+
+def test_model_name_is_part_of_key(cache_dir):
+    """embeddings ของโมเดลหนึ่งต้องไม่ถูกใช้กับอีกโมเดล"""
+    cache = EmbeddingCache("model-a", 4, None)
+    other = EmbeddingCache("model-b", 4, None)
+    assert cache.make_key("text") != other.make_key("text")
@@ -0,0 +1,58 @@
+# test/test_ingestion_jobs.py
+import sys
+import os
+import asyncio
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ingestion_jobs import IngestionJobManager
+
+
+class SlowPipeline:
+    """แทน IngestionPipeline ที่นำเข้าเอกสารนานตามที่กำหนดโดยไม่รายงานความคืบหน้า"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.release = threading.Event()
+
+    async def ingest(self, source, document_id, file_type, **kwargs):
+        await asyncio.get_running_loop().run_in_executor(None, self.release.wait, self.seconds)
+        return {"document_id": document_id, "page_count": 1, "chunk_count": 0, "vector_count": 0}
+
+
+def test_running_job_keeps_its_lease_without_progress(tmp_path):
+    """งานที่ทำงานนานกว่า lease โดยไม่รายงานความคืบหน้าต้องไม่ถูก worker อื่นจองซ้ำ"""
+    manager = IngestionJobManager(SlowPipeline(1.0), str(tmp_path), lease_seconds=0.3)
+    job_id = manager.submit(b"%PDF", "doc-1", "teacher")
+    job = manager._claim_next()
+    worker = threading.Thread(target=manager._run_job, args=(job,))
+    worker.start()
+
+    time.sleep(0.6)
+    assert manager._claim_next() is None
+
+    worker.join()
+    assert manager.get(job_id)["status"] == IngestionJobManager.COMPLETED
+    assert not os.path.exists(job["file_path"])
+
+
+def test_reclaimed_job_is_not_completed_by_the_previous_attempt(tmp_path):
+    """worker ที่เสียงานให้การจองครั้งใหม่ต้องไม่บันทึกผลหรือลบไฟล์ที่การจองใหม่กำลังใช้"""
+    pipeline = SlowPipeline(5.0)
+    manager = IngestionJobManager(pipeline, str(tmp_path), lease_seconds=60.0)
+    job_id = manager.submit(b"%PDF", "doc-1", "teacher")
+    stale = manager._claim_next()
+    worker = threading.Thread(target=manager._run_job, args=(stale,))
+    worker.start()
+
+    # จำลองว่า lease หมดอายุแล้วมี worker อื่นจองงานต่อ
+    with manager._connect() as connection:
+        connection.execute("UPDATE jobs SET updated_at = 0 WHERE id = ?", (job_id,))
+    current = manager._claim_next()
+    assert current["id"] == job_id and current["attempt_token"] != stale["attempt_token"]
+    pipeline.release.set()
+    worker.join()
+
+    assert manager.get(job_id)["status"] == IngestionJobManager.RUNNING
+    assert os.path.exists(current["file_path"])
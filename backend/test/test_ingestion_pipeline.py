@@ -0,0 +1,133 @@
+# test/test_ingestion_pipeline.py
+import sys
+import os
+import re
+import asyncio
+import hashlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from services.ingestion_pipeline import IngestionPipeline
+from services.keyword_index import KeywordIndex
+from services.local_vector_store import LocalVectorStore
+from services.text_chunker import TextChunker
+from utils.ingestion_cache import IngestionCache
+
+
+class WhitespaceTokenizer:
+    """tokenizer อย่างง่ายที่นับหนึ่งคำเป็นหนึ่ง token (เหมือนใน test_text_chunker)"""
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        matches = [list(re.finditer(r"\S+", text)) for text in batch]
+        result = {"input_ids": [[0] * len(m) for m in matches]}
+        if return_offsets_mapping:
+            result["offset_mapping"] = [[(t.start(), t.end()) for t in m] for m in matches]
+        if single:
+            result = {key: value[0] for key, value in result.items()}
+        return result
+
+
+class FakePdfService:
+    """
+    แทน PDFProcessingService โดยรับเอกสารเป็นรายการ (หมายเลขหน้า, ข้อความ) แทนไฟล์ PDF
+    และสร้าง embeddings จาก hash ของข้อความ พร้อมนับจำนวน chunks ที่ถูกสร้าง embeddings
+    """
+
+    embedding_dimension = 8
+
+    def __init__(self):
+        self.chunker = TextChunker(WhitespaceTokenizer(), max_tokens=6)
+        self.embedded = 0
+
+    def iter_pdf_pages(self, source):
+        return iter(source)
+
+    def iter_chunks(self, pages, page_aligned=False):
+        return self.chunker.iter_chunks(pages, page_aligned=page_aligned)
+
+    async def create_embedding_matrix(self, chunks):
+        self.embedded += len(chunks)
+        seeds = [int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) for text in chunks]
+        return np.stack([np.random.default_rng(seed).standard_normal(8) for seed in seeds]).astype(np.float32)
+
+
+def make_pipeline(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "vectors"))
+    keyword_index = KeywordIndex(str(tmp_path / "keywords.sqlite3"))
+    pdf_service = FakePdfService()
+    return IngestionPipeline(pdf_service, store, batch_size=4, keyword_index=keyword_index), store, keyword_index
+
+
+def test_ingesting_same_document_twice_keeps_one_set_of_rows(tmp_path):
+    """การนำเข้า document_id เดิมซ้ำ (เช่น retry หรืออัปโหลดซ้ำ) ต้องแทนที่ chunks เดิม ไม่ใช่เพิ่มซ้ำ"""
+    pipeline, store, keyword_index = make_pipeline(tmp_path)
+    document = [(1, "alpha beta gamma delta epsilon zeta eta theta"), (2, "iota kappa lambda mu")]
+
+    first = asyncio.run(pipeline.ingest(document, "doc-1", "teacher"))
+    second = asyncio.run(pipeline.ingest(document, "doc-1", "teacher"))
+
+    assert second["replaced_count"] == first["vector_count"]
+    entities = asyncio.run(store.query_entities("teacher_documents", 'file_id == "doc-1"'))
+    assert sorted(entity["id"] for entity in entities) == sorted(second["ids"])
+    hits = keyword_index.search_batch("teacher_documents", ["kappa"], limit=10)[0]
+    assert len(hits) == 1 and hits[0]["id"] in second["ids"]
+
+
+def test_reingest_only_touches_the_edited_page(tmp_path):
+    """แก้ไขหน้าแรกให้ยาวขึ้นต้องสร้าง embeddings เฉพาะหน้านั้น chunks ของหน้าอื่นต้องไม่ถูกนับว่าย้ายตำแหน่ง"""
+    pipeline, store, _ = make_pipeline(tmp_path)
+    page_two = "iota kappa lambda mu nu xi omicron pi rho sigma"
+    asyncio.run(pipeline.ingest([(1, "alpha beta gamma delta"), (2, page_two)], "doc-1", "teacher"))
+    embedded_before = pipeline.pdf_service.embedded
+
+    result = asyncio.run(pipeline.reingest(
+        [(1, "omega alpha beta gamma delta"), (2, page_two)], "doc-1", "teacher"
+    ))
+
+    assert result["relocated_count"] == 0
+    assert result["unchanged_count"] == 3
+    assert result["embedded_count"] == pipeline.pdf_service.embedded - embedded_before == 2
+    assert result["deleted_count"] == 1
+    entities = asyncio.run(store.query_entities("teacher_documents", 'file_id == "doc-1"', output_fields=["metadata"]))
+    assert sorted(entity["metadata"]["page"] for entity in entities) == [1, 1, 2, 2, 2]
+
+
+def test_cancelled_wait_for_document_lock_does_not_leak_it(tmp_path):
+    """การยกเลิก coroutine ที่กำลังรอ lock ของเอกสารต้องไม่ทำให้ lock ค้างอยู่"""
+    pipeline, _, _ = make_pipeline(tmp_path)
+    lock = IngestionPipeline._document_lock("teacher_documents", "doc-cancel")
+
+    async def scenario():
+        lock.acquire()
+        waiter = asyncio.create_task(pipeline.ingest([(1, "alpha beta")], "doc-cancel", "teacher"))
+        await asyncio.sleep(0.1)
+        waiter.cancel()
+        lock.release()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        # executor thread อาจได้ lock หลังจาก coroutine ถูกยกเลิกแล้ว ต้องถูกปล่อยคืนเอง
+        await asyncio.sleep(0.2)
+        return await asyncio.wait_for(pipeline.ingest([(1, "alpha beta")], "doc-cancel", "teacher"), 2)
+
+    assert asyncio.run(scenario())["vector_count"] == 1
+
+
+def test_empty_document_cache_hit_does_not_create_collection(tmp_path):
+    """เอกสารว่างที่อ่านจาก cache ต้องไม่สร้าง collection ด้วยมิติ 0"""
+    pipeline, store, _ = make_pipeline(tmp_path)
+    cache = IngestionCache(str(tmp_path / "cache"), 1 << 20)
+
+    first = asyncio.run(pipeline.ingest([], "doc-empty", "teacher", ingestion_cache=cache, content_hash="empty"))
+    second = asyncio.run(pipeline.ingest([], "doc-empty", "teacher", ingestion_cache=cache, content_hash="empty"))
+
+    assert not first["cache_hit"] and second["cache_hit"]
+    assert second["vector_count"] == 0
+    assert cache.get("empty")["embeddings"].shape == (0, FakePdfService.embedding_dimension)
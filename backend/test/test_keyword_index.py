@@ -0,0 +1,54 @@
+# test/test_keyword_index.py
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.keyword_index import KeywordIndex
+from services.search_service import reciprocal_rank_fusion
+
+
+def test_thai_terms_match_without_word_boundaries(tmp_path):
+    """คำภาษาไทยในคำถามต้องพบ chunk ที่มีคำนั้นแม้ไม่มีการเว้นวรรค และลบตาม ids ได้"""
+    index = KeywordIndex(str(tmp_path / "keywords.sqlite3"))
+    index.add(
+        "docs",
+        ["a", "a", "b"],
+        [10, 11, 12],
+        ["การสังเคราะห์ด้วยแสงเกิดในคลอโรพลาสต์", "ไมโทซิสและไมโอซิส", "Newton's second law F=ma"]
+    )
+
+    groups = index.search_batch("docs", ["คลอโรพลาสต์คืออะไร", "second law"], limit=2)
+    assert groups[0][0]["id"] == 10
+    assert groups[1][0]["id"] == 12
+
+    assert index.search_batch("docs", ["second law"], file_ids=["a"]) == [[]]
+    index.delete("docs", [12])
+    assert index.search_batch("docs", ["second law"]) == [[]]
+
+
+def test_rank_fusion_rewards_agreement():
+    """chunk ที่ติดอันดับในทั้งสองรายการต้องอยู่เหนือ chunk ที่อยู่อันดับหนึ่งเพียงรายการเดียว"""
+    fused = reciprocal_rank_fusion(
+        {
+            "vector": [{"id": 1}, {"id": 2}, {"id": 3}],
+            "keyword": [{"id": 3}, {"id": 2}]
+        },
+        limit=2,
+        k=60
+    )
+    assert [entry["id"] for entry in fused] == [3, 2]
+    assert fused[0]["ranks"] == {"vector": 3, "keyword": 1}
+
+
+def test_rename_moves_index_to_new_collection_name(tmp_path):
+    """rename ต้องย้าย chunks ไปอยู่กับชื่อใหม่และแทนที่ index เดิมของชื่อนั้น (ใช้ตอน migrate collection)"""
+    index = KeywordIndex(str(tmp_path / "keywords.sqlite3"))
+    index.add("docs", ["a"], [1], ["old photosynthesis"])
+    index.add("docs_migrating", ["a"], [101], ["new photosynthesis"])
+
+    index.rename("docs", "docs_backup")
+    index.rename("docs_migrating", "docs")
+
+    assert [hit["id"] for hit in index.search_batch("docs", ["photosynthesis"])[0]] == [101]
+    assert [hit["id"] for hit in index.search_batch("docs_backup", ["photosynthesis"])[0]] == [1]
+    assert index.search_batch("docs_migrating", ["photosynthesis"]) == [[]]
@@ -0,0 +1,59 @@
+# test/test_local_vector_store.py
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from services.local_vector_store import LocalVectorStore
+from services.milvus_service import quote_string
+
+
+@pytest.fixture
+def store(tmp_path):
+    """local vector store ที่มี collection ขนาด 3 มิติหนึ่งตัว"""
+    store = LocalVectorStore(str(tmp_path / "vectors"))
+    asyncio.run(store.create_collection("docs", 3))
+    return store
+
+
+def test_search_ranks_by_cosine_and_filters_by_file_id(store):
+    """ผลลัพธ์ต้องเรียงตาม cosine similarity และกรองด้วย file_id ได้"""
+    vectors = np.array([[1, 0, 0], [0, 1, 0], [1, 1, 0]], dtype=np.float32)
+    ids = asyncio.run(store.insert_vectors("docs", ["a", "b", "a"], ["x", "y", "z"], vectors))
+
+    groups = asyncio.run(store.search_vectors_batch(
+        "docs", [[1, 0.1, 0], [0, 1, 0]], limit=2, output_fields=["file_id", "content"]
+    ))
+    assert [hit["id"] for hit in groups[0]] == [ids[0], ids[2]]
+    assert groups[0][0]["score"] == pytest.approx(1 - groups[0][0]["distance"])
+    assert groups[1][0]["content"] == "y"
+
+    results = asyncio.run(store.search_vectors(
+        "docs", [0, 1, 0], limit=5, filter_expr=f"file_id == {quote_string('a')}"
+    ))
+    assert [hit["id"] for hit in results] == [ids[2], ids[0]]
+
+
+def test_data_survives_reopen_and_delete(store):
+    """ข้อมูลต้องอ่านได้จาก instance ใหม่ และแถวที่ลบต้องไม่ถูกค้นพบ"""
+    vectors = np.random.default_rng(0).random((1500, 3), dtype=np.float32)
+    ids = asyncio.run(store.insert_vectors("docs", ["a"] * 1500, ["t"] * 1500, vectors, [{"i": i} for i in range(1500)]))
+    asyncio.run(store.delete_entities("docs", ids[:10]))
+
+    reopened = LocalVectorStore(store.data_dir)
+    assert asyncio.run(reopened.get_collection_stats("docs"))["row_count"] == 1490
+    np.testing.assert_array_equal(asyncio.run(reopened.fetch_vectors("docs", ids[10:12])), vectors[10:12])
+
+    entities = asyncio.run(reopened.query_entities("docs", f"id in {ids[:12]}", output_fields=["metadata"]))
+    assert [entity["metadata"]["i"] for entity in entities] == [10, 11]
+
+
+def test_unsupported_filter_is_rejected(store):
+    """filter ที่อยู่นอกชุดที่รองรับต้องไม่ถูกละเลยอย่างเงียบๆ"""
+    asyncio.run(store.insert_vectors("docs", ["a"], ["x"], [[1, 0, 0]]))
+    with pytest.raises(ValueError):
+        asyncio.run(store.search_vectors("docs", [1, 0, 0], filter_expr='content like "x%"'))
@@ -0,0 +1,115 @@
+# test/test_text_chunker.py
+import sys
+import os
+import re
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from services.text_chunker import TextChunker
+
+
+class WhitespaceTokenizer:
+    """
+    tokenizer อย่างง่ายที่นับหนึ่งคำ (คั่นด้วยช่องว่าง) เป็นหนึ่ง token
+    มี interface เดียวกับ Hugging Face tokenizer ในส่วนที่ TextChunker ใช้
+    """
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        matches = [list(re.finditer(r"\S+", text)) for text in batch]
+        result = {"input_ids": [[0] * len(m) for m in matches]}
+        if return_offsets_mapping:
+            result["offset_mapping"] = [[(t.start(), t.end()) for t in m] for m in matches]
+        if single:
+            result = {key: value[0] for key, value in result.items()}
+        return result
+
+
+@pytest.fixture
+def tokenizer():
+    return WhitespaceTokenizer()
+
+
+def test_chunks_respect_token_budget(tokenizer):
+    """chunk ต้องมีจำนวน tokens ไม่เกิน max_tokens ลบ special tokens"""
+    chunker = TextChunker(tokenizer, max_tokens=8, overlap_tokens=0)
+    text = "one two three. four five six. seven eight nine. ten."
+
+    chunks = chunker.chunk_text(text)
+
+    assert [chunk["text"] for chunk in chunks] == [
+        "one two three. four five six.",
+        "seven eight nine. ten."
+    ]
+    assert all(chunk["token_count"] <= 6 for chunk in chunks)
+
+
+def test_offsets_point_back_into_source(tokenizer):
+    """ตำแหน่งของ chunk ต้องชี้กลับไปยังข้อความต้นฉบับได้ถูกต้อง"""
+    chunker = TextChunker(tokenizer, max_tokens=6, overlap_tokens=0)
+    text = "alpha beta.  gamma delta.\nepsilon zeta eta."
+
+    for chunk in chunker.chunk_text(text):
+        assert text[chunk["start"]:chunk["end"]] == chunk["text"]
+
+
+def test_thai_sentences_split_on_spaces(tokenizer):
+    """ข้อความภาษาไทยต้องถูกแบ่งประโยคที่ช่องว่างระหว่างตัวอักษรไทย"""
+    chunker = TextChunker(tokenizer, max_tokens=3, overlap_tokens=0)
+    text = "การวิเคราะห์ความต้องการ การออกแบบระบบ การทดสอบ"
+
+    assert len(chunker.split_sentences(text)) == 3
+    assert [chunk["text"] for chunk in chunker.chunk_text(text)] == text.split(" ")
+
+
+def test_overlap_repeats_trailing_sentence(tokenizer):
+    """chunk ถัดไปต้องเริ่มด้วยประโยคท้ายของ chunk ก่อนหน้าเมื่อกำหนด overlap"""
+    chunker = TextChunker(tokenizer, max_tokens=6, overlap_tokens=2)
+    text = "a b. c d. e f. g h."
+
+    chunks = [chunk["text"] for chunk in chunker.chunk_text(text)]
+
+    assert chunks == ["a b. c d.", "c d. e f.", "e f. g h."]
+
+
+def test_long_sentence_is_split_by_tokens(tokenizer):
+    """ประโยคที่ยาวเกินจำนวน tokens ต่อ chunk ต้องถูกตัดตามตำแหน่ง tokens"""
+    chunker = TextChunker(tokenizer, max_tokens=5, overlap_tokens=1)
+    text = "w1 w2 w3 w4 w5 w6 w7"
+
+    chunks = [chunk["text"] for chunk in chunker.chunk_text(text)]
+
+    assert chunks == ["w1 w2 w3", "w3 w4 w5", "w5 w6 w7"]
+
+
+def test_chunks_continue_across_pages(tokenizer):
+    """chunk ที่ยังไม่เต็มต้องต่อข้ามหน้าได้ และเก็บหมายเลขหน้าที่เริ่มต้น"""
+    chunker = TextChunker(tokenizer, max_tokens=10, overlap_tokens=0)
+    pages = [(1, "first page."), (2, "second page.")]
+
+    chunks = list(chunker.iter_chunks(pages))
+
+    assert len(chunks) == 1
+    assert chunks[0]["text"] == "first page.\nsecond page."
+    assert chunks[0]["page"] == 1
+    assert "first page.\nsecond page."[chunks[0]["start"]:chunks[0]["end"]] == chunks[0]["text"]
+
+
+def test_page_aligned_chunks_do_not_cross_pages(tokenizer):
+    """เมื่อ page_aligned=True การแก้ไขหน้าหนึ่งต้องไม่เปลี่ยน chunks ของหน้าอื่น"""
+    chunker = TextChunker(tokenizer, max_tokens=10, overlap_tokens=2)
+    original = [(1, "first page."), (2, "second page."), (3, "third page.")]
+    revised = [(1, "first page."), (2, "second page was fixed."), (3, "third page.")]
+
+    before = list(chunker.iter_chunks(original, page_aligned=True))
+    after = list(chunker.iter_chunks(revised, page_aligned=True))
+
+    assert [chunk["page"] for chunk in before] == [1, 2, 3]
+    assert before[0]["text"] == after[0]["text"]
+    assert before[2]["text"] == after[2]["text"]
+    assert before[1]["text"] != after[1]["text"]
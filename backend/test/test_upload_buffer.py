@@ -0,0 +1,53 @@
+# test/test_upload_buffer.py
+import sys
+import os
+import hashlib
+import io
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from core.config import config
+from utils.upload_buffer import SpooledUploadRequest, UploadSpool, buffer_upload
+
+
+def make_app():
+    app = Flask(__name__)
+    app.request_class = SpooledUploadRequest
+    return app
+
+
+def test_spooled_uploads_are_passed_through_without_copying(monkeypatch):
+    """ไฟล์ที่พักไว้ระหว่างอ่านคำขอต้องถูกส่งต่อเป็น buffer หรือพาธเดิม พร้อม hash ที่คำนวณไว้แล้ว"""
+    monkeypatch.setattr(config, "UPLOAD_MEMORY_THRESHOLD_BYTES", 1024)
+    small, large = b"%PDF small", b"%PDF " + b"x" * 4096
+    app = make_app()
+    data = {"small": (io.BytesIO(small), "small.pdf"), "large": (io.BytesIO(large), "large.pdf")}
+
+    with app.test_request_context("/", method="POST", data=data):
+        from flask import request
+        with buffer_upload(request.files["small"]) as upload:
+            assert isinstance(upload.source, memoryview) and upload.source == small
+            assert upload.content_hash == hashlib.sha256(small).hexdigest()
+        with buffer_upload(request.files["large"]) as upload:
+            path = upload.source
+            assert path == request.files["large"].stream.path
+            with open(path, "rb") as f:
+                assert f.read() == large
+            assert upload.content_hash == hashlib.sha256(large).hexdigest()
+    # ไฟล์ชั่วคราวถูกลบเมื่อคำขอจบ
+    assert not os.path.exists(path)
+
+
+def test_request_memory_budget_is_shared_between_files(monkeypatch):
+    """ไฟล์ที่เกิน budget รวมของคำขอต้องถูกพักบนดิสก์ แม้แต่ละไฟล์จะเล็กกว่า threshold ต่อไฟล์"""
+    monkeypatch.setattr(config, "UPLOAD_MEMORY_THRESHOLD_BYTES", 1024)
+    monkeypatch.setattr(config, "UPLOAD_REQUEST_MEMORY_BYTES", 1500)
+    app = make_app()
+    data = {f"f{i}": (io.BytesIO(b"x" * 600), f"f{i}.pdf") for i in range(3)}
+
+    with app.test_request_context("/", method="POST", data=data):
+        from flask import request
+        spools = [request.files[f"f{i}"].stream for i in range(3)]
+        assert all(isinstance(spool, UploadSpool) for spool in spools)
+        assert sum(spool.path is None for spool in spools) == 2
@@ -0,0 +1,140 @@
+# test/test_vector_storage.py
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+from pymilvus import DataType
+
+import services.milvus_service as milvus_module
+from core.config import config
+from services.full_vector_store import FullPrecisionStore
+from services.index_profiles import build_index_params
+from services.local_vector_store import LocalVectorStore
+from services.search_service import SearchService
+from services.vector_storage import encode_vectors, rerank
+
+
+def test_binary_encoding_packs_sign_bits():
+    """binary vector ต้องเก็บ 1 bit ต่อมิติ ตามเครื่องหมายของแต่ละค่า"""
+    vectors = np.array([[0.5, -1, 0, 2, -0.1, 3, 1, -2] * 2], dtype=np.float32)
+    encoded = encode_vectors(vectors, "binary")
+    assert encoded == [bytes([0b10010110, 0b10010110])]
+    assert build_index_params("auto", 100, "COSINE", storage="binary")["metric_type"] == "HAMMING"
+
+
+def test_rerank_rescores_candidates_with_full_vectors(tmp_path):
+    """candidates ต้องถูกเรียงใหม่ด้วย cosine ของ vectors เต็มความละเอียดและตัดเหลือ limit"""
+    store = FullPrecisionStore(str(tmp_path / "full.sqlite3"))
+    store.add("docs", [1, 2, 3], np.array([[1, 0], [0.6, 0.8], [0, 1]], dtype=np.float32))
+    candidates = [[{"id": 3, "distance": 0}, {"id": 9, "distance": 1}, {"id": 2, "distance": 1}, {"id": 1, "distance": 2}]]
+
+    groups = rerank(np.array([[1, 0.1]], dtype=np.float32), candidates, lambda ids: store.get("docs", ids), 3)
+    assert [hit["id"] for hit in groups[0]] == [1, 2, 3]
+    assert groups[0][0]["score"] == pytest.approx(1 / np.sqrt(1.01))
+
+    store.rename("docs", "docs_backup")
+    assert sorted(store.get("docs_backup", [1, 2, 3, 4])) == [1, 2, 3]
+    assert store.get("docs", [1]) == {}
+
+
+class FakeCollection:
+    """
+    แทน pymilvus Collection ของ Milvus server โดยคำนวณ distance แบบเดียวกับ Milvus
+    COSINE คืน cosine similarity และ HAMMING คืนจำนวนบิตที่ต่างกัน
+    """
+
+    def __init__(self, storage: str, vectors: np.ndarray):
+        self.vectors = vectors
+        self.dtype = DataType.BINARY_VECTOR if storage == "binary" else DataType.FLOAT_VECTOR
+        metric = "HAMMING" if storage == "binary" else "COSINE"
+        field = SimpleNamespace(name="embedding", dtype=self.dtype, params={"dim": vectors.shape[1]})
+        self.schema = SimpleNamespace(fields=[field], description="")
+        self.indexes = [SimpleNamespace(
+            field_name="embedding", params={"metric_type": metric, "index_type": "FLAT", "params": {}}
+        )]
+        self.num_entities = len(vectors)
+        self.stored = encode_vectors(vectors, storage)
+
+    def load(self):
+        pass
+
+    def search(self, data, anns_field, param, limit, **kwargs):
+        groups = []
+        for query in data:
+            if self.dtype == DataType.BINARY_VECTOR:
+                bits = np.unpackbits(np.frombuffer(query, dtype=np.uint8))
+                distances = [int(np.sum(bits != np.unpackbits(np.frombuffer(row, dtype=np.uint8)))) for row in self.stored]
+                order = np.argsort(distances, kind="stable")
+            else:
+                distances = self.vectors @ query / np.linalg.norm(query)
+                order = np.argsort(-distances, kind="stable")
+            groups.append([
+                SimpleNamespace(id=int(row), distance=float(distances[row]), entity={"file_id": "a", "content": str(row)})
+                for row in order[:limit]
+            ])
+        return groups
+
+
+def test_threshold_filtering_matches_between_float_and_binary_storage(tmp_path, monkeypatch):
+    """score ต้องมากกว่าดีกว่าเสมอและใช้ threshold เดียวกันได้ ไม่ว่า collection จะเก็บ vectors แบบใด"""
+    monkeypatch.setattr(config, "FULL_VECTOR_STORE_PATH", str(tmp_path / "full.sqlite3"))
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((20, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = vectors[:1] + rng.normal(0, 0.3, (1, 64)).astype(np.float32)
+
+    async def embed(texts):
+        return query
+
+    pdf_service = SimpleNamespace(create_embedding_matrix=embed)
+    results = {}
+    for storage, rerank_factor in (("float", 4), ("binary", 4), ("binary", 0)):
+        with patch.object(milvus_module, "connections"), patch.object(milvus_module, "utility"), \
+                patch.object(milvus_module, "Collection", return_value=FakeCollection(storage, vectors)):
+            milvus = milvus_module.MilvusService("localhost", 19530)
+            milvus.rerank_factor = rerank_factor
+            if storage == "binary":
+                milvus.full_vectors.add("docs", list(range(20)), vectors)
+            results[storage, rerank_factor] = asyncio.run(
+                SearchService(milvus, pdf_service).semantic_search("q", "docs", limit=5, threshold=0.1)
+            )
+
+    float_hits, binary_hits = results["float", 4], results["binary", 4]
+    assert float_hits and float_hits[0]["id"] == 0
+    assert [hit["id"] for hit in binary_hits] == [hit["id"] for hit in float_hits]
+    assert [hit["score"] for hit in binary_hits] == pytest.approx([hit["score"] for hit in float_hits])
+    assert all(hit["distance"] == pytest.approx(1 - hit["score"]) for hit in float_hits)
+
+    # ไม่ re-score: score ประมาณจาก HAMMING แต่ยังเรียงจากมากไปน้อยและอยู่ในสเกลเดียวกัน
+    approximate = results["binary", 0]
+    assert approximate[0]["id"] == 0
+    assert [hit["score"] for hit in approximate] == sorted((hit["score"] for hit in approximate), reverse=True)
+    assert approximate[0]["score"] == pytest.approx(float_hits[0]["score"], abs=0.2)
+
+
+def test_local_and_milvus_backends_return_the_same_scores(tmp_path):
+    """query เดียวกันต้องได้ ids, score และ distance เดียวกันจาก vector store ทั้งสองแบบ"""
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((30, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = vectors[3] + rng.normal(0, 0.2, 16).astype(np.float32)
+
+    local = LocalVectorStore(str(tmp_path / "vectors"))
+    asyncio.run(local.create_collection("docs", 16))
+    asyncio.run(local.insert_vectors("docs", ["a"] * 30, [str(i) for i in range(30)], vectors))
+    local_hits = asyncio.run(local.search_vectors("docs", query, limit=5, output_fields=["content"]))
+
+    with patch.object(milvus_module, "connections"), patch.object(milvus_module, "utility"), \
+            patch.object(milvus_module, "Collection", return_value=FakeCollection("float", vectors)):
+        milvus = milvus_module.MilvusService("localhost", 19530)
+        milvus_hits = asyncio.run(milvus.search_vectors("docs", query, limit=5, output_fields=["content"]))
+
+    assert [hit["content"] for hit in local_hits] == [hit["content"] for hit in milvus_hits]
+    assert [hit["score"] for hit in local_hits] == pytest.approx([hit["score"] for hit in milvus_hits], abs=1e-5)
+    assert [hit["distance"] for hit in local_hits] == pytest.approx([hit["distance"] for hit in milvus_hits], abs=1e-5)
+    assert local_hits[0]["score"] > local_hits[-1]["score"]
@@ -0,0 +1,205 @@
+# utils/embedding_cache.py
+import fcntl
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Cache ของ embeddings ระดับ chunk แบบสองชั้น
+    - ชั้นหน่วยความจำ: LRU ภายใน process
+    - ชั้นดิสก์: เมทริกซ์ float32 แบบ memory-mapped ขนาดคงที่ เขียนวนแบบ ring buffer
+    key คือ SHA-256 ของ (ชื่อโมเดล, ข้อความที่ normalize แล้ว)
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    KEYS_FILE = "keys.bin"
+    CURSOR_FILE = "cursor.i64"
+    LOCK_FILE = "lock"
+    KEY_SIZE = 32
+
+    _whitespace = re.compile(r"\s+")
+
+    def __init__(
+        self,
+        model_name: str,
+        dimension: int,
+        cache_dir: Optional[str] = None,
+        memory_items: int = 10000,
+        disk_capacity: int = 200000
+    ):
+        """
+        Args:
+            model_name: ชื่อโมเดลที่ใช้สร้าง embeddings (เป็นส่วนหนึ่งของ key)
+            dimension: ขนาดมิติของ embedding
+            cache_dir: โฟลเดอร์ของชั้นดิสก์ (None = ใช้เฉพาะชั้นหน่วยความจำ)
+            memory_items: จำนวน embeddings สูงสุดในชั้นหน่วยความจำ
+            disk_capacity: จำนวนแถวสูงสุดของเมทริกซ์บนดิสก์
+        """
+        self.model_name = model_name
+        self.dimension = dimension
+        self.memory_items = memory_items
+        self.disk_capacity = disk_capacity
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._disk_rows: Dict[bytes, int] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._disk_dir = None
+        if cache_dir and disk_capacity > 0:
+            model_slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+            self._disk_dir = os.path.join(cache_dir, f"{model_slug}-{dimension}")
+            self._open_disk_tier()
+
+    def _open_disk_tier(self) -> None:
+        """เปิด (หรือสร้าง) ไฟล์ memory-mapped ของชั้นดิสก์และสร้าง index ของ keys"""
+        os.makedirs(self._disk_dir, exist_ok=True)
+
+        def open_memmap(file_name: str, dtype, shape):
+            path = os.path.join(self._disk_dir, file_name)
+            mode = "r+" if os.path.exists(path) else "w+"
+            return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+        self._lock_path = os.path.join(self._disk_dir, self.LOCK_FILE)
+        self._vectors = open_memmap(self.VECTORS_FILE, np.float32, (self.disk_capacity, self.dimension))
+        self._keys = open_memmap(self.KEYS_FILE, np.uint8, (self.disk_capacity, self.KEY_SIZE))
+        self._cursor = open_memmap(self.CURSOR_FILE, np.int64, (1,))
+
+        for row in np.flatnonzero(self._keys.any(axis=1)):
+            self._disk_rows[self._keys[row].tobytes()] = int(row)
+
+    def make_key(self, text: str) -> bytes:
+        """สร้าง key จากชื่อโมเดลและข้อความที่ตัดช่องว่างซ้ำซ้อนออกแล้ว"""
+        normalized = self._whitespace.sub(" ", text).strip()
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode("utf-8")).digest()
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, "OrderedDict[bytes, Tuple[str, List[int]]]"]:
+        """
+        ค้นหา embeddings ของข้อความทั้งหมด
+        
+        Args:
+            texts: รายการข้อความ
+            
+        Returns:
+            tuple ของ (เมทริกซ์ผลลัพธ์ที่เติมเฉพาะแถวที่พบใน cache,
+            OrderedDict ของ key ที่ไม่พบ -> (ข้อความ, ตำแหน่งในรายการ)) ข้อความซ้ำจะถูกรวมเป็น key เดียว
+        """
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+        misses: "OrderedDict[bytes, Tuple[str, List[int]]]" = OrderedDict()
+
+        with self._lock:
+            for position, text in enumerate(texts):
+                key = self.make_key(text)
+                if key in misses:
+                    misses[key][1].append(position)
+                    continue
+
+                vector = self._get_locked(key)
+                if vector is None:
+                    misses[key] = (text, [position])
+                    self.misses += 1
+                else:
+                    result[position] = vector
+
+        return result, misses
+
+    def _get_locked(self, key: bytes) -> Optional[np.ndarray]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+
+        row = self._disk_rows.get(key)
+        if row is None:
+            return None
+
+        vector = np.array(self._vectors[row])
+        # ตรวจสอบ key ซ้ำหลังคัดลอก เพราะแถวนี้อาจถูกเขียนทับโดย process อื่น
+        if self._keys[row].tobytes() != key:
+            del self._disk_rows[key]
+            return None
+
+        self.disk_hits += 1
+        self._remember_locked(key, vector)
+        return vector
+
+    def _remember_locked(self, key: bytes, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def store(
+        self,
+        result: np.ndarray,
+        misses: "OrderedDict[bytes, Tuple[str, List[int]]]",
+        vectors: np.ndarray
+    ) -> np.ndarray:
+        """
+        เก็บ embeddings ที่คำนวณใหม่ลง cache และเติมลงในเมทริกซ์ผลลัพธ์ตามลำดับเดิม
+        
+        Args:
+            result: เมทริกซ์ที่ได้จาก lookup
+            misses: key ที่ไม่พบจาก lookup
+            vectors: embeddings ของข้อความใน misses ตามลำดับเดียวกัน
+            
+        Returns:
+            เมทริกซ์ผลลัพธ์ที่ครบทุกแถว
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for (key, (_, positions)), vector in zip(misses.items(), vectors):
+                result[positions] = vector
+                self._remember_locked(key, np.array(vector))
+
+            if self._disk_dir is not None and len(misses):
+                self._write_disk_locked(list(misses.keys()), vectors)
+
+        return result
+
+    def _write_disk_locked(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """เขียน embeddings ต่อท้าย ring buffer โดยล็อกไฟล์เพื่อให้หลาย process ใช้ร่วมกันได้"""
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                cursor = int(self._cursor[0])
+                for key, vector in zip(keys, vectors):
+                    row = cursor % self.disk_capacity
+                    self._disk_rows.pop(self._keys[row].tobytes(), None)
+                    # ล้าง key ก่อนเขียน vector เพื่อไม่ให้ผู้อ่านได้ข้อมูลที่เขียนไม่ครบ
+                    self._keys[row] = 0
+                    self._vectors[row] = vector
+                    self._keys[row] = np.frombuffer(key, dtype=np.uint8)
+                    self._disk_rows[key] = row
+                    cursor += 1
+                self._cursor[0] = cursor
+                self._vectors.flush()
+                self._keys.flush()
+                self._cursor.flush()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, float]:
+        """สถิติการใช้งาน cache"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": len(self._disk_rows)
+            }
@@ -0,0 +1,129 @@
+# utils/ingestion_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class IngestionCache:
+    """
+    Cache แบบถาวรบนดิสก์สำหรับผลการประมวลผลเอกสาร PDF
+    ใช้ SHA-256 ของไฟล์ที่อัพโหลดเป็น key เพื่อข้ามการอ่าน แบ่ง chunks และสร้าง embeddings
+    เมื่อมีการอัพโหลดไฟล์เดิมซ้ำ ขนาดรวมของ cache ถูกจำกัดด้วยการลบรายการที่ใช้ล่าสุดนานที่สุดออกก่อน
+    """
+
+    META_FILE = "meta.json"
+    EMBEDDINGS_FILE = "embeddings.npy"
+
+    def __init__(self, cache_dir: str, max_bytes: int, namespace: str = ""):
+        """
+        Args:
+            cache_dir: โฟลเดอร์ที่ใช้เก็บ cache
+            max_bytes: ขนาดรวมสูงสุดของ cache (bytes)
+            namespace: ค่าที่ระบุการตั้งค่าการประมวลผล รายการที่สร้างด้วยค่าต่างกันจะไม่ถูกใช้ร่วมกัน
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.namespace = hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:16]
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """สร้าง content hash จากข้อมูลของไฟล์"""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+        """สร้าง content hash จากไฟล์บนดิสก์โดยอ่านทีละส่วน"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{self.namespace}-{content_hash}")
+
+    def get(self, content_hash: str) -> Optional[Dict]:
+        """
+        ดึงผลการประมวลผลที่เคยเก็บไว้
+        
+        Args:
+            content_hash: SHA-256 ของไฟล์
+            
+        Returns:
+            Dictionary ที่มี chunks, chunk_pages, chunk_offsets, page_offsets และ embeddings หรือ None ถ้าไม่พบ
+        """
+        entry_path = self._entry_path(content_hash)
+        try:
+            with open(os.path.join(entry_path, self.META_FILE), encoding="utf-8") as f:
+                result = json.load(f)
+            result["embeddings"] = np.load(os.path.join(entry_path, self.EMBEDDINGS_FILE))
+            # อัพเดทเวลาการใช้งานล่าสุดเพื่อใช้ในการเลือกรายการที่จะลบ
+            os.utime(entry_path)
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def put(self, content_hash: str, result: Dict) -> None:
+        """
+        บันทึกผลการประมวลผลลง cache แล้วลบรายการเก่าถ้าขนาดรวมเกินกำหนด
+        
+        Args:
+            content_hash: SHA-256 ของไฟล์
+            result: ผลลัพธ์จาก PDFProcessingService.process_pdf_file
+        """
+        entry_path = self._entry_path(content_hash)
+        # เขียนลงโฟลเดอร์ชั่วคราวก่อนแล้วค่อย rename เพื่อไม่ให้ผู้อ่านเห็นข้อมูลที่เขียนไม่ครบ
+        temp_path = f"{entry_path}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(temp_path)
+        try:
+            meta = {
+                "chunks": result["chunks"],
+                "chunk_pages": result.get("chunk_pages", []),
+                "chunk_offsets": result.get("chunk_offsets", []),
+                "page_offsets": result.get("page_offsets", [])
+            }
+            with open(os.path.join(temp_path, self.META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            np.save(
+                os.path.join(temp_path, self.EMBEDDINGS_FILE),
+                np.asarray(result["embeddings"], dtype=np.float32)
+            )
+            with self._lock:
+                if os.path.exists(entry_path):
+                    shutil.rmtree(temp_path, ignore_errors=True)
+                else:
+                    os.replace(temp_path, entry_path)
+                self._evict()
+        except Exception:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+
+    def _evict(self) -> None:
+        """ลบรายการที่ไม่ได้ใช้นานที่สุดจนกว่าขนาดรวมจะไม่เกิน max_bytes"""
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if ".tmp-" in name or not os.path.isdir(path):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(path, file_name))
+                for file_name in os.listdir(path)
+            )
+            entries.append((os.path.getmtime(path), size, path))
+            total_size += size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
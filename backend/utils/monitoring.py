@@ -1,5 +1,5 @@
 from functools import wraps
-from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 import time
 from typing import Optional
 import logging
@@ -38,6 +38,65 @@ RESPONSE_TIME = Histogram(
     ['endpoint']
 )
 
+UPLOAD_READ_TIME = Histogram(
+    'upload_read_seconds',
+    'Time spent reading uploaded files from the request',
+    ['storage'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+UPLOAD_DISK_IO_TIME = Histogram(
+    'upload_disk_io_seconds',
+    'Time spent writing and removing temporary files for large uploads',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+MODEL_LOAD_TIME = Gauge(
+    'model_cold_start_seconds',
+    'Time spent loading a model on first use',
+    ['model']
+)
+
+MODEL_WARMUP_TIME = Gauge(
+    'model_warmup_seconds',
+    'Time spent on the warmup inference of a model',
+    ['model']
+)
+
+UPLOAD_BYTES = Counter(
+    'upload_bytes_total',
+    'Total uploaded bytes by where they were buffered',
+    ['storage']
+)
+
+RESIDENT_COLLECTIONS = Gauge(
+    'milvus_resident_collections',
+    'Number of collections currently loaded on Milvus query nodes'
+)
+
+RESIDENT_BYTES = Gauge(
+    'milvus_resident_bytes',
+    'Estimated memory used by loaded collections'
+)
+
+COLLECTION_LOADS = Counter(
+    'milvus_collection_loads_total',
+    'Total collection loads by reason',
+    ['reason']
+)
+
+COLLECTION_EVICTIONS = Counter(
+    'milvus_collection_evictions_total',
+    'Total collections released to stay within the memory budget or because they were idle',
+    ['reason']
+)
+
+RESIDENCY_LOOKUPS = Counter(
+    'milvus_residency_lookups_total',
+    'Collection accesses by whether the collection was already loaded',
+    ['result']
+)
+
 # ตั้งค่า OpenTelemetry tracing
 def setup_tracing(service_name: str = "milvus-service"):
     """ตั้งค่า distributed tracing"""
@@ -0,0 +1,209 @@
+# utils/upload_buffer.py
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional, Union
+
+from flask import Request
+from werkzeug.datastructures import FileStorage
+
+from core.config import config
+from utils.monitoring import UPLOAD_BYTES, UPLOAD_DISK_IO_TIME, UPLOAD_READ_TIME
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadMemoryBudget:
+    """จำนวน bytes ที่ไฟล์อัพโหลดทุกไฟล์ในคำขอเดียวกันใช้เก็บในหน่วยความจำได้รวมกัน"""
+
+    def __init__(self, max_bytes: int):
+        self.remaining = max_bytes
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int) -> bool:
+        with self._lock:
+            if size > self.remaining:
+                return False
+            self.remaining -= size
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.remaining += size
+
+
+class UploadSpool:
+    """
+    ที่พักไฟล์อัพโหลดระหว่างที่ werkzeug อ่าน multipart body
+    - คำนวณ SHA-256 ไปพร้อมกับการเขียน จึงไม่ต้องอ่านไฟล์ซ้ำเพื่อหา hash
+    - เก็บในหน่วยความจำจนกว่าไฟล์จะใหญ่เกิน max_size หรือคำขอใช้หน่วยความจำเกิน budget
+      แล้วย้ายไปไฟล์ชั่วคราวที่มีชื่อ เพื่อส่งพาธต่อได้โดยไม่ต้องคัดลอกอีกครั้ง
+    ไฟล์ชั่วคราวถูกลบเมื่อปิด (คำขอจบ) ถ้ายังไม่ถูกย้ายไปที่อื่น
+    """
+
+    def __init__(self, max_size: int, budget: UploadMemoryBudget):
+        self.max_size = max_size
+        self.budget = budget
+        self.path: Optional[str] = None
+        self.size = 0
+        self.disk_seconds = 0.0
+        self._reserved = 0
+        self._digest = hashlib.sha256()
+        self._file: IO[bytes] = io.BytesIO()
+
+    @property
+    def content_hash(self) -> str:
+        return self._digest.hexdigest()
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        if self.path is None:
+            if self.size <= self.max_size and self.budget.reserve(len(data)):
+                self._reserved += len(data)
+                return self._file.write(data)
+            self._rollover()
+        disk_started = time.perf_counter()
+        written = self._file.write(data)
+        self.disk_seconds += time.perf_counter() - disk_started
+        return written
+
+    def _rollover(self) -> None:
+        disk_started = time.perf_counter()
+        memory = self._file
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+        temp_file.write(memory.getbuffer())
+        memory.close()
+        self.budget.release(self._reserved)
+        self._reserved = 0
+        self._file, self.path = temp_file, temp_file.name
+        self.disk_seconds += time.perf_counter() - disk_started
+
+    def getbuffer(self) -> memoryview:
+        """ข้อมูลของไฟล์ในหน่วยความจำโดยไม่คัดลอก (ต้อง release ก่อนปิด spool)"""
+        return self._file.getbuffer()
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.close()
+        self.budget.release(self._reserved)
+        self._reserved = 0
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                # ไฟล์อาจถูกย้ายไปแล้ว เช่น ส่งต่อให้คิวของงาน asynchronous
+                pass
+
+    def __getattr__(self, name):
+        # read, seek, tell และอื่นๆ ใช้ของไฟล์ที่เก็บข้อมูลอยู่
+        return getattr(self._file, name)
+
+
+class SpooledUploadRequest(Request):
+    """
+    Request class ที่เก็บไฟล์อัพโหลดไว้ในหน่วยความจำจนถึง UPLOAD_MEMORY_THRESHOLD_BYTES ต่อไฟล์
+    และ UPLOAD_REQUEST_MEMORY_BYTES รวมทุกไฟล์ในคำขอ (ค่าเริ่มต้นของ werkzeug จะเขียนลงดิสก์เมื่อไฟล์ใหญ่กว่า 500KB)
+    """
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None
+    ) -> IO[bytes]:
+        budget = getattr(self, "_upload_memory_budget", None)
+        if budget is None:
+            budget = self._upload_memory_budget = UploadMemoryBudget(config.UPLOAD_REQUEST_MEMORY_BYTES)
+        return UploadSpool(config.UPLOAD_MEMORY_THRESHOLD_BYTES, budget)
+
+
+class BufferedUpload:
+    """
+    ไฟล์อัพโหลดที่อ่านแล้ว
+    source เป็นข้อมูลในหน่วยความจำ (memoryview) ถ้าไฟล์มีขนาดไม่เกิน threshold หรือเป็นพาธของไฟล์ชั่วคราวถ้าใหญ่กว่า
+    """
+
+    def __init__(self):
+        self.source: Union[memoryview, str, None] = None
+        self.size = 0
+        self.content_hash = ""
+        self.read_seconds = 0.0
+        self.disk_seconds = 0.0
+
+    @property
+    def on_disk(self) -> bool:
+        return isinstance(self.source, str)
+
+
+@contextmanager
+def buffer_upload(
+    file: FileStorage,
+    memory_threshold: Optional[int] = None
+) -> Iterator[BufferedUpload]:
+    """
+    อ่านไฟล์อัพโหลดพร้อมคำนวณ SHA-256 ไปในตัว
+    ไฟล์ขนาดไม่เกิน memory_threshold ถูกเก็บในหน่วยความจำ ไฟล์ที่ใหญ่กว่าถูกเขียนลงไฟล์ชั่วคราว
+    ไฟล์ที่ SpooledUploadRequest พักไว้แล้วถูกส่งต่อโดยตรง (พาธของไฟล์ชั่วคราว หรือ buffer ในหน่วยความจำ) ไม่คัดลอกซ้ำ
+    ไฟล์ชั่วคราวจะถูกลบเสมอเมื่อออกจาก context ไม่ว่าจะเกิดข้อผิดพลาดหรือไม่
+
+    Args:
+        file: ไฟล์จาก request.files
+        memory_threshold: ขนาดสูงสุดที่เก็บในหน่วยความจำ (default: UPLOAD_MEMORY_THRESHOLD_BYTES)
+
+    Yields:
+        BufferedUpload ที่มี source, size และ content_hash
+    """
+    if memory_threshold is None:
+        memory_threshold = config.UPLOAD_MEMORY_THRESHOLD_BYTES
+
+    upload = BufferedUpload()
+    spool = file.stream
+    owns_spool = not isinstance(spool, UploadSpool)
+    if owns_spool:
+        # stream ที่ไม่ได้มาจาก SpooledUploadRequest: อ่านลง spool ของตัวเองซึ่งถูกปิดเมื่อออกจาก context
+        spool = UploadSpool(memory_threshold, UploadMemoryBudget(memory_threshold))
+
+    try:
+        if owns_spool:
+            started = time.perf_counter()
+            while True:
+                block = file.stream.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                spool.write(block)
+            upload.read_seconds = time.perf_counter() - started - spool.disk_seconds
+
+        upload.size = spool.size
+        upload.content_hash = spool.content_hash
+        upload.disk_seconds = spool.disk_seconds
+        if spool.path is None:
+            upload.source = spool.getbuffer()
+        else:
+            disk_started = time.perf_counter()
+            spool.flush()
+            upload.disk_seconds += time.perf_counter() - disk_started
+            upload.source = spool.path
+
+        storage = "disk" if upload.on_disk else "memory"
+        UPLOAD_READ_TIME.labels(storage=storage).observe(upload.read_seconds)
+        UPLOAD_BYTES.labels(storage=storage).inc(upload.size)
+
+        yield upload
+    finally:
+        if isinstance(upload.source, memoryview):
+            upload.source.release()
+        if owns_spool:
+            disk_started = time.perf_counter()
+            spool.close()
+            upload.disk_seconds += time.perf_counter() - disk_started
+        UPLOAD_DISK_IO_TIME.observe(upload.disk_seconds)